@@ -7,27 +7,34 @@ associated `config.json` describing its role and behaviour as well as a
 `training.md` file for human‑readable notes.  Uploaded training files are
 stored under `core/knowledge/{agent}/` and may be summarised into the
 agent’s training file.
+
+Uploads are processed as streams: the file is copied to disk in chunks,
+extracted to text incrementally and summarised from its most central
+sentences (see :mod:`core.summarise`), so memory use does not grow with
+the size of the upload.
 """
 
 from __future__ import annotations
 
+import hashlib
+import io
 import os
 import json
 from datetime import datetime
-from typing import List, Dict, Any
-
-from core import memory
+from typing import BinaryIO, List, Dict, Any, Tuple, Union
 
-try:
-    import docx  # type: ignore
-except ImportError:
-    docx = None  # fallback if python-docx is not installed
+from core import extract, memory, summarise as summariser
 
 
 CORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'core')
 AGENTS_DIR = os.path.join(CORE_DIR, 'agents')
 KNOWLEDGE_DIR = os.path.join(CORE_DIR, 'knowledge')
 
+# Bytes read per step when spooling and decoding uploads.
+CHUNK_SIZE = 1024 * 1024
+# Length of the summary written to training.md for each upload.
+SUMMARY_WORDS = 200
+
 
 def list_agents() -> List[str]:
     """Return the names of all configured agents."""
@@ -67,62 +74,83 @@ def create_agent(name: str, role: str, base_behavior: str) -> None:
     memory.add_task(description=f"Created agent '{name}'", status='done')
 
 
-def _extract_text_from_docx(content: bytes) -> str:
-    """Extract plain text from a DOCX file.  Requires python-docx.  If
-    python-docx is not available, returns an empty string."""
-    if docx is None:
-        return ''
-    from io import BytesIO
-    document = docx.Document(BytesIO(content))
-    paragraphs = [p.text for p in document.paragraphs]
-    return '\n'.join(paragraphs)
-
-
-def _summarise_text(text: str, max_words: int = 200) -> str:
-    """Very simple summarisation: return the first `max_words` words from
-    the provided text."""
-    words = text.split()
-    if len(words) <= max_words:
-        return text.strip()
-    return ' '.join(words[:max_words]).strip() + '...'
-
+def _spool(content: Union[bytes, BinaryIO], path: str) -> str:
+    """Copy an upload to ``path`` in ``CHUNK_SIZE`` pieces and return the
+    SHA‑256 of its bytes, which keys the extracted‑text cache."""
+    stream = io.BytesIO(content) if isinstance(content, (bytes, bytearray)) else content
+    sha = hashlib.sha256()
+    with open(path, 'wb') as f:
+        for block in iter(lambda: stream.read(CHUNK_SIZE), b''):
+            sha.update(block)
+            f.write(block)
+    return sha.hexdigest()
 
-def upload_training_file(agent_name: str, filename: str, content: bytes, summarise: bool = True) -> None:
-    """Store an uploaded training file for an agent.
 
-    The raw file is written into `core/knowledge/{agent}/`.  For supported
-    text formats (`.txt`, `.md`, `.docx`) the file is parsed into plain
-    text and optionally summarised.  The resulting summary is appended to
-    the agent’s `training.md` file under a heading with the filename.
-    """
+def _knowledge_path(agent_name: str) -> str:
     agent_path = os.path.join(AGENTS_DIR, agent_name)
-    knowledge_path = os.path.join(KNOWLEDGE_DIR, agent_name)
     if not os.path.isdir(agent_path):
         raise FileNotFoundError(f"Agent {agent_name} not found")
+    knowledge_path = os.path.join(KNOWLEDGE_DIR, agent_name)
     os.makedirs(knowledge_path, exist_ok=True)
-    # Save the raw file
-    file_path = os.path.join(knowledge_path, filename)
-    with open(file_path, 'wb') as f:
-        f.write(content)
-    # Determine text content
-    ext = os.path.splitext(filename)[1].lower()
-    text = ''
-    try:
-        if ext in {'.txt', '.md'}:
-            text = content.decode('utf-8', errors='ignore')
-        elif ext == '.docx':
-            text = _extract_text_from_docx(content)
-    except Exception:
-        text = ''
-    # Summarise if requested
+    return knowledge_path
+
+
+def _record_training(agent_name: str, filename: str, file_path: str, digest: str, summarise: bool) -> None:
+    """Summarise a stored training file into the agent’s `training.md`
+    and log the upload."""
     summary = ''
-    if text and summarise:
-        summary = _summarise_text(text)
-    # Append summary to training.md
-    training_md_path = os.path.join(agent_path, 'training.md')
+    if summarise:
+        try:
+            summary = summariser.summarise_file(file_path, digest, max_words=SUMMARY_WORDS)
+        except Exception:
+            summary = ''
     if summary:
+        training_md_path = os.path.join(AGENTS_DIR, agent_name, 'training.md')
         with open(training_md_path, 'a', encoding='utf-8') as f:
             f.write(f"\n## Summary of {filename}\n\n")
             f.write(summary + '\n')
-    # Log the upload event
-    memory.add_task(description=f"Training file received: {filename}", status='done')
\ No newline at end of file
+    memory.add_task(description=f"Training file received: {filename}", status='done')
+
+
+def upload_training_file(
+    agent_name: str,
+    filename: str,
+    content: Union[bytes, BinaryIO],
+    summarise: bool = True,
+) -> None:
+    """Store an uploaded training file for an agent.
+
+    ``content`` may be the raw bytes or a binary file object such as
+    the upload stream; streams are copied to
+    `core/knowledge/{agent}/` in chunks without being read into memory.
+    For supported formats (`.txt`, `.md`, `.docx`, `.html`, `.pdf`) the
+    stored file is extracted to plain text (see :mod:`core.extract`)
+    and optionally summarised.  The resulting summary is appended to
+    the agent’s `training.md` file under a heading with the filename.
+    """
+    file_path = os.path.join(_knowledge_path(agent_name), filename)
+    digest = _spool(content, file_path)
+    _record_training(agent_name, filename, file_path, digest, summarise)
+
+
+def upload_training_files(
+    agent_name: str,
+    files: List[Tuple[str, Union[bytes, BinaryIO]]],
+    summarise: bool = True,
+) -> List[str]:
+    """Store several ``(filename, content)`` uploads for an agent.
+
+    All files are spooled first and then extracted in parallel worker
+    processes before each one is summarised, so a batch of documents is
+    not parsed one after another.  Returns the stored filenames.
+    """
+    knowledge_path = _knowledge_path(agent_name)
+    stored: List[Tuple[str, str, str]] = []
+    for filename, content in files:
+        file_path = os.path.join(knowledge_path, filename)
+        stored.append((filename, file_path, _spool(content, file_path)))
+    if summarise:
+        extract.prefetch([(path, digest) for _, path, digest in stored])
+    for filename, file_path, digest in stored:
+        _record_training(agent_name, filename, file_path, digest, summarise)
+    return [filename for filename, _, _ in stored]
@@ -0,0 +1,351 @@
+"""
+Text extraction engine for training uploads.
+
+Every extractor is a generator of text chunks, so documents are never
+held in memory as a whole:
+
+* ``.txt`` / ``.md`` are decoded incrementally as UTF‑8;
+* ``.docx`` is read by stream‑parsing ``word/document.xml`` straight out
+  of the zip archive with ``iterparse`` instead of building the
+  python‑docx object model;
+* ``.html`` / ``.htm`` are fed to an incremental HTML parser that drops
+  scripts and styles;
+* ``.pdf`` uses ``pypdf`` when it is installed and otherwise a minimal
+  built‑in parser that decodes Flate content streams and collects the
+  strings shown by text operators.  The fallback handles simple PDFs
+  (standard fonts, literal strings) and is not a full PDF renderer.
+
+Extracted text of non‑plain files is cached on disk by the SHA‑256 of
+the uploaded bytes, so uploading the same document again skips the
+work.  :func:`prefetch` extracts a batch of files on a process pool
+that is started once and shared by every request.  Its workers come
+from a ``forkserver`` (or ``spawn``) context: forking the threaded web
+server, with its scheduler thread and SQLite connections, could copy a
+held lock into a child and deadlock it.
+"""
+
+from __future__ import annotations
+
+import codecs
+import hashlib
+import mmap
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from xml.etree.ElementTree import iterparse
+
+try:
+    import pypdf  # type: ignore
+except ImportError:
+    pypdf = None  # fall back to the minimal parser below
+
+
+CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(CORE_DIR, 'knowledge', '.cache', 'text')
+
+# Characters collected before a chunk is yielded, and bytes per read.
+CHUNK_CHARS = 256 * 1024
+READ_SIZE = 1024 * 1024
+
+PLAIN_EXTENSIONS = {'.txt', '.md'}
+
+# Size of the shared extraction pool.
+EXTRACT_WORKERS = os.cpu_count() or 1
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+def _batched(pieces: Iterable[str], size: int = CHUNK_CHARS) -> Iterator[str]:
+    """Join small text pieces into chunks of about ``size`` characters."""
+    buf: List[str] = []
+    length = 0
+    for piece in pieces:
+        buf.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield ''.join(buf)
+            buf, length = [], 0
+    if buf:
+        yield ''.join(buf)
+
+
+def _decode(path: str) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_SIZE), b''):
+            text = decoder.decode(block)
+            if text:
+                yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def iter_plain(path: str) -> Iterator[str]:
+    return _decode(path)
+
+
+def _docx_paragraphs(path: str) -> Iterator[str]:
+    with zipfile.ZipFile(path) as archive, archive.open('word/document.xml') as xml:
+        parts: List[str] = []
+        for _, elem in iterparse(xml, events=('end',)):
+            tag = elem.tag
+            if tag == _W + 't':
+                parts.append(elem.text or '')
+            elif tag == _W + 'tab':
+                parts.append('\t')
+            elif tag in (_W + 'br', _W + 'cr'):
+                parts.append('\n')
+            elif tag == _W + 'p':
+                yield ''.join(parts) + '\n'
+                parts = []
+                elem.clear()
+            elif tag == _W + 'tbl':
+                elem.clear()
+
+
+def iter_docx(path: str) -> Iterator[str]:
+    """Paragraph text of a DOCX, including tables, one line per paragraph."""
+    return _batched(_docx_paragraphs(path))
+
+
+class _HTMLText(HTMLParser):
+    BLOCK = {'p', 'div', 'br', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'section', 'article', 'pre'}
+    SKIP = {'script', 'style', 'noscript', 'template'}
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag in self.SKIP:
+            self._skip += 1
+        elif tag in self.BLOCK:
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self.SKIP:
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.BLOCK:
+            self.parts.append('\n')
+
+    def handle_data(self, data: str) -> None:
+        if not self._skip:
+            self.parts.append(data)
+
+
+def iter_html(path: str) -> Iterator[str]:
+    """Visible text of an HTML file, fed to the parser chunk by chunk."""
+    parser = _HTMLText()
+    for text in _decode(path):
+        parser.feed(text)
+        if parser.parts:
+            yield ''.join(parser.parts)
+            parser.parts = []
+    parser.close()
+    if parser.parts:
+        yield ''.join(parser.parts)
+
+
+# --- PDF ---
+_STREAM = re.compile(rb'<<(.{0,4096}?)>>\s*stream\r?\n', re.S)
+_SKIP_STREAM = re.compile(rb'/Subtype\s*/Image|/Length1|/Type\s*/(?:XRef|ObjStm|Metadata|EmbeddedFile)')
+_TEXT_TOKEN = re.compile(
+    rb'\((?:\\.|[^\\)])*\)'          # literal string (no nested parentheses)
+    rb'|\[(?:[^\]\\]|\\.)*\]\s*TJ'   # array shown with TJ
+    rb'|T\*|ET|Td|TD|\'|"|Tj',
+    re.S,
+)
+_LITERAL = re.compile(rb'\(((?:\\.|[^\\)])*)\)', re.S)
+_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f', b'(': b'(', b')': b')', b'\\': b'\\'}
+
+
+def _unescape(raw: bytes) -> str:
+    def sub(m: 're.Match[bytes]') -> bytes:
+        esc = m.group(1)
+        if esc[:1].isdigit():
+            return bytes([int(esc, 8) & 0xFF])
+        return _ESCAPES.get(esc, esc)
+    return re.sub(rb'\\([0-7]{1,3}|.)', sub, raw, flags=re.S).decode('latin-1')
+
+
+def _content_text(content: bytes) -> Iterator[str]:
+    """Strings drawn by the text operators of one content stream."""
+    pending: List[str] = []
+    for m in _TEXT_TOKEN.finditer(content):
+        token = m.group(0)
+        if token.startswith(b'('):
+            pending.append(_unescape(token[1:-1]))
+        elif token.startswith(b'['):
+            yield ''.join(_unescape(s) for s in _LITERAL.findall(token))
+        elif token in (b'Tj', b"'", b'"'):
+            if pending:
+                yield pending[-1]
+            if token != b'Tj':
+                yield '\n'
+            pending = []
+        elif token == b'T*':
+            yield '\n'
+        elif token in (b'Td', b'TD'):
+            yield ' '
+        elif token == b'ET':
+            yield '\n'
+            pending = []
+
+
+def _pdf_fallback(path: str) -> Iterator[str]:
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for m in _STREAM.finditer(data):
+            header = m.group(1)
+            if _SKIP_STREAM.search(header):
+                continue
+            end = data.find(b'endstream', m.end())
+            if end < 0:
+                break
+            raw = data[m.end():end]
+            if b'/FlateDecode' in header:
+                try:
+                    raw = zlib.decompressobj().decompress(raw)
+                except zlib.error:
+                    continue
+            elif b'/Filter' in header:
+                continue
+            if b'BT' in raw:
+                yield ''.join(_content_text(raw))
+
+
+def iter_pdf(path: str) -> Iterator[str]:
+    """Text of a PDF page by page (pypdf) or stream by stream (fallback)."""
+    if pypdf is not None:
+        reader = pypdf.PdfReader(path)
+        pages = (page.extract_text() + '\n' for page in reader.pages)
+    else:
+        pages = _pdf_fallback(path)
+    return _batched(pages)
+
+
+EXTRACTORS: Dict[str, Callable[[str], Iterator[str]]] = {
+    '.txt': iter_plain,
+    '.md': iter_plain,
+    '.docx': iter_docx,
+    '.html': iter_html,
+    '.htm': iter_html,
+    '.pdf': iter_pdf,
+}
+
+
+def supported(filename: str) -> bool:
+    return os.path.splitext(filename)[1].lower() in EXTRACTORS
+
+
+def file_digest(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_SIZE), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _cache_path(digest: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, digest[:2], digest + '.txt')
+
+
+def extract_to_cache(path: str, digest: Optional[str] = None, cache_dir: str = CACHE_DIR) -> Optional[str]:
+    """Extract ``path`` into the text cache unless it is already there.
+
+    Returns the cached text file, or None for plain text (which is its
+    own extracted form) and unsupported formats.  Safe to run in a
+    worker process.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in PLAIN_EXTENSIONS or ext not in EXTRACTORS:
+        return None
+    target = _cache_path(digest or file_digest(path), cache_dir)
+    if os.path.exists(target):
+        return target
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = f'{target}.{os.getpid()}.tmp'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for chunk in EXTRACTORS[ext](path):
+                f.write(chunk)
+        os.replace(tmp, target)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return target
+
+
+def iter_extracted(path: str, digest: Optional[str] = None, cache_dir: str = CACHE_DIR) -> Iterator[str]:
+    """Yield the text of ``path``, extracting it on first use.  Yields
+    nothing for unsupported formats."""
+    if not supported(path):
+        return
+    cached = extract_to_cache(path, digest, cache_dir)
+    yield from _decode(cached or path)
+
+
+def _extract_job(job: Tuple[str, Optional[str], str]) -> Optional[str]:
+    return extract_to_cache(*job)
+
+
+def _shared_pool() -> ProcessPoolExecutor:
+    """The long-lived extraction pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS,
+                                        mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop ``pool`` after a worker died so the next call starts afresh."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def prefetch(files: List[Tuple[str, Optional[str]]], cache_dir: str = CACHE_DIR) -> None:
+    """Extract ``(path, digest)`` pairs into the cache on the shared
+    process pool.
+
+    Files already cached or not needing extraction are skipped without
+    touching the pool.  Errors are left for :func:`iter_extracted` to
+    surface per file.
+    """
+    jobs = [
+        (path, digest, cache_dir) for path, digest in files
+        if supported(path)
+        and os.path.splitext(path)[1].lower() not in PLAIN_EXTENSIONS
+        and not (digest and os.path.exists(_cache_path(digest, cache_dir)))
+    ]
+    if len(jobs) < 2:
+        return
+    pool = _shared_pool()
+    try:
+        futures = [pool.submit(_extract_job, job) for job in jobs]
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        return
+    for future in futures:
+        try:
+            future.result()
+        except BrokenProcessPool:
+            _discard_pool(pool)
+        except Exception:
+            pass
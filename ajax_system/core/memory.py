@@ -11,7 +11,8 @@ from __future__ import annotations
 
 import os
 import json
-from typing import Any, Dict, List
+import threading
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 try:
     # Python 3.9+ includes zoneinfo
@@ -19,6 +20,8 @@ try:
 except ImportError:
     from tzdata import ZoneInfo  # type: ignore[assignment]
 
+from core.timeline import Timeline
+
 
 # Base directories
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -28,6 +31,7 @@ LOGS_DIR = os.path.join(ROOT_DIR, 'logs')
 # Paths to persistent files
 STATE_FILE = os.path.join(CORE_DIR, 'agent_state.json')
 TASKS_FILE = os.path.join(LOGS_DIR, 'tasks.json')
+TIMELINE_DB = os.path.join(LOGS_DIR, 'timeline.db')
 IDLE_BEHAVIORS_FILE = os.path.join(CORE_DIR, 'idle_behaviors.json')
 
 
@@ -71,26 +75,41 @@ def get_mode() -> str:
     return get_state().get('mode', 'Ajax')
 
 
+_timeline: Optional[Timeline] = None
+_timeline_lock = threading.Lock()
+
+
+def get_timeline() -> Timeline:
+    """Return the shared timeline store, creating it on first use.  The
+    legacy `tasks.json` file is migrated into the database once."""
+    global _timeline
+    if _timeline is None:
+        with _timeline_lock:
+            if _timeline is None:
+                timeline = Timeline(TIMELINE_DB)
+                timeline.migrate_json(TASKS_FILE)
+                _timeline = timeline
+    return _timeline
+
+
 def add_task(description: str, status: str = 'pending') -> Dict[str, Any]:
     """Append a new task to the tasks timeline and return it.  Each task
     includes an ID, description, status and timestamp in America/Chicago."""
-    tasks = get_tasks()
-    task_id = len(tasks) + 1
     timestamp = datetime.now(ZoneInfo('America/Chicago')).isoformat()
-    task = {
-        'id': task_id,
-        'description': description,
-        'status': status,
-        'timestamp': timestamp,
-    }
-    tasks.append(task)
-    _write_json(TASKS_FILE, tasks)
-    return task
-
-
-def get_tasks() -> List[Dict[str, Any]]:
-    """Return the list of all logged tasks."""
-    return _read_json(TASKS_FILE, [])
+    return get_timeline().add(description, status, timestamp)
+
+
+def get_tasks(
+    status: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Return logged tasks in ID order.  Optional filters select a status,
+    an ISO time range (`since` inclusive, `until` exclusive) or the tasks
+    following `after_id`, capped at `limit` entries."""
+    return get_timeline().query(status=status, since=since, until=until, after_id=after_id, limit=limit)
 
 
 def get_idle_behaviors() -> Dict[str, Any]:
@@ -0,0 +1,390 @@
+"""
+Scheduler for Ajax's idle behaviours.
+
+The idle worker used to sleep ``frequency_minutes`` and then run every
+enabled behaviour one after another, forgetting its place on every
+restart.  ``IdleScheduler`` keeps one schedule per behaviour instead:
+
+* each behaviour runs on its own interval or on a five-field cron
+  expression (``minute hour day-of-month month day-of-week``);
+* due times sit in a heap, and a single timer thread sleeps until the
+  earliest one (or until the configuration changes);
+* due behaviours run concurrently on a small worker pool.  A behaviour
+  still running when it comes due again is skipped for that round
+  rather than started twice;
+* an optional ``jitter_seconds`` spreads runs so behaviours sharing an
+  interval do not all fire in the same second;
+* next-run times are saved to ``logs/idle_schedule.json``, so a restart
+  keeps the schedule.  A run missed while the server was down happens
+  once, shortly after start;
+* :meth:`IdleScheduler.reload` applies a new configuration at once.
+
+The configuration in ``core/idle_behaviors.json`` keeps its original
+shape.  A behaviour set to ``true`` runs every ``frequency_minutes``.
+An object can give its own ``interval_minutes`` or ``cron`` and
+``jitter_seconds``:
+
+    {
+      "frequency_minutes": 30,
+      "max_workers": 4,
+      "scan_social_comments": true,
+      "review_spreadsheets": {"cron": "0 9 * * 1-5"},
+      "read_financial_sites": {"interval_minutes": 15, "jitter_seconds": 60}
+    }
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from random import randint
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from core import memory
+
+STATE_FILE = os.path.join(memory.LOGS_DIR, 'idle_schedule.json')
+DEFAULT_FREQUENCY_MINUTES = 30
+DEFAULT_WORKERS = 4
+
+logger = logging.getLogger(__name__)
+
+
+def scan_social_comments() -> str:
+    count = randint(1, 5)
+    return f"Ajax checked {count} social accounts"
+
+
+def review_spreadsheets() -> str:
+    return "Ajax reviewed Google Sheets for content performance"
+
+
+def read_financial_sites() -> str:
+    return "Ajax read financial news sites for investor training"
+
+
+# Behaviour name -> callable returning the timeline description.
+ACTIONS: Dict[str, Callable[[], str]] = {
+    'scan_social_comments': scan_social_comments,
+    'review_spreadsheets': review_spreadsheets,
+    'read_financial_sites': read_financial_sites,
+}
+
+
+class Cron:
+    """A five-field cron expression evaluated in local time.
+
+    Fields accept ``*``, numbers, ranges ``a-b``, steps ``*/n`` or
+    ``a-b/n`` and comma lists; day-of-week 0 and 7 are Sunday.  As in
+    Vixie cron, when both day fields are restricted a day matches if
+    either does.
+    """
+
+    _RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression: str) -> None:
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression {expression!r} must have 5 fields")
+        self.expression = expression
+        minutes, hours, days, months, weekdays = (
+            self._parse(f, lo, hi) for f, (lo, hi) in zip(fields, self._RANGES))
+        self.minutes = sorted(minutes)
+        self.hours = sorted(hours)
+        self.days = days
+        self.months = months
+        self.weekdays = {d % 7 for d in weekdays}
+        self.any_day = fields[2].startswith('*')
+        self.any_weekday = fields[4].startswith('*')
+        self.next_after(time.time())  # rejects expressions that never fire
+
+    @staticmethod
+    def _parse(field: str, lo: int, hi: int) -> Set[int]:
+        values: Set[int] = set()
+        for part in field.split(','):
+            span, _, step_text = part.partition('/')
+            try:
+                step = int(step_text) if step_text else 1
+                if span == '*':
+                    start, end = lo, hi
+                elif '-' in span:
+                    first, last = span.split('-', 1)
+                    start, end = int(first), int(last)
+                else:
+                    start = int(span)
+                    end = hi if step_text else start
+            except ValueError:
+                raise ValueError(f"invalid cron field {field!r}") from None
+            if step < 1 or not lo <= start <= end <= hi:
+                raise ValueError(f"invalid cron field {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, day: date) -> bool:
+        in_month = day.day in self.days
+        in_week = day.isoweekday() % 7 in self.weekdays
+        if self.any_day:
+            return in_week
+        if self.any_weekday:
+            return in_month
+        return in_month or in_week
+
+    def next_after(self, ts: float) -> float:
+        """Epoch time of the first match strictly after ``ts``."""
+        start = datetime.fromtimestamp(ts).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(366 * 8):
+            if day.month in self.months and self._day_matches(day):
+                for hour in self.hours:
+                    if day == start.date() and hour < start.hour:
+                        continue
+                    for minute in self.minutes:
+                        candidate = datetime(day.year, day.month, day.day, hour, minute)
+                        if candidate >= start:
+                            return candidate.timestamp()
+            day += timedelta(days=1)
+        raise ValueError(f"cron expression {self.expression!r} never fires")
+
+
+class _Job:
+    def __init__(
+        self,
+        name: str,
+        action: Callable[[], str],
+        interval: Optional[float] = None,
+        cron: Optional[Cron] = None,
+        jitter: float = 0.0,
+    ) -> None:
+        self.name = name
+        self.action = action
+        self.interval = interval
+        self.cron = cron
+        self.jitter = jitter
+        self.next_run = 0.0
+
+    @property
+    def signature(self) -> str:
+        """Identifies the schedule; a saved next run is only reused
+        while it is unchanged."""
+        return json.dumps([self.interval, self.cron.expression if self.cron else None, self.jitter])
+
+    def next_after(self, ts: float) -> float:
+        due = self.cron.next_after(ts) if self.cron else ts + self.interval
+        return due + random.uniform(0, self.jitter) if self.jitter else due
+
+    def describe(self) -> Dict[str, Any]:
+        if self.cron:
+            return {'cron': self.cron.expression, 'jitter_seconds': self.jitter}
+        return {'interval_minutes': self.interval / 60, 'jitter_seconds': self.jitter}
+
+
+def _number(value: Any, key: str, minimum: float) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < minimum:
+        raise ValueError(f"{key} must be a number >= {minimum}")
+    return float(value)
+
+
+def parse_config(config: Dict[str, Any], actions: Dict[str, Callable[[], str]] = ACTIONS) -> Tuple[Dict[str, _Job], int]:
+    """Build the enabled jobs and the pool size from an idle behaviours
+    configuration.  Raises ValueError for invalid settings; keys that
+    name no known behaviour are ignored."""
+    if not isinstance(config, dict):
+        raise ValueError("idle behaviours must be a JSON object")
+    frequency = _number(config.get('frequency_minutes', DEFAULT_FREQUENCY_MINUTES), 'frequency_minutes', 1)
+    default_jitter = _number(config.get('jitter_seconds', 0), 'jitter_seconds', 0)
+    workers = int(_number(config.get('max_workers', DEFAULT_WORKERS), 'max_workers', 1))
+    jobs: Dict[str, _Job] = {}
+    for name, action in actions.items():
+        setting = config.get(name)
+        if setting is True:
+            setting = {}
+        if not isinstance(setting, dict) or not setting.get('enabled', True):
+            continue
+        jitter = _number(setting.get('jitter_seconds', default_jitter), f"{name}.jitter_seconds", 0)
+        if setting.get('cron'):
+            jobs[name] = _Job(name, action, cron=Cron(str(setting['cron'])), jitter=jitter)
+        else:
+            minutes = _number(setting.get('interval_minutes', frequency), f"{name}.interval_minutes", 1)
+            jobs[name] = _Job(name, action, interval=minutes * 60, jitter=jitter)
+    return jobs, workers
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts).isoformat(timespec='seconds') if ts else None
+
+
+class IdleScheduler:
+    """Runs idle behaviours on their schedules (see module docstring)."""
+
+    def __init__(
+        self,
+        state_path: str = STATE_FILE,
+        actions: Optional[Dict[str, Callable[[], str]]] = None,
+        record: Callable[..., Any] = memory.add_task,
+    ) -> None:
+        self.state_path = state_path
+        self.actions = ACTIONS if actions is None else actions
+        self.record = record
+        self._jobs: Dict[str, _Job] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self._running: Set[str] = set()
+        self._cond = threading.Condition()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._workers = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self._loaded = False
+        self._state: Dict[str, Dict[str, Any]] = self._read_state()
+
+    # --- persisted state ---
+    def _read_state(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    def _save_state(self) -> None:
+        # Called with the lock held.
+        for name, job in self._jobs.items():
+            entry = self._state.setdefault(name, {})
+            entry['next_run'] = job.next_run
+            entry['signature'] = job.signature
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, indent=2)
+        os.replace(tmp, self.state_path)
+
+    # --- configuration ---
+    def reload(self, config: Optional[Dict[str, Any]] = None) -> None:
+        """Apply ``config`` (default: the saved idle behaviours) now.
+
+        Behaviours whose schedule is unchanged keep their next run; new
+        or changed ones are scheduled from now.  Raises ValueError
+        without changing anything if the configuration is invalid.
+        """
+        jobs, workers = parse_config(memory.get_idle_behaviors() if config is None else config, self.actions)
+        now = time.time()
+        with self._cond:
+            for name, job in jobs.items():
+                old = self._jobs.get(name)
+                saved = self._state.get(name, {})
+                if old is not None and old.signature == job.signature:
+                    job.next_run = old.next_run
+                elif saved.get('signature') == job.signature and saved.get('next_run'):
+                    # Restored after a restart; a run missed meanwhile
+                    # happens once, soon, rather than once per missed slot.
+                    job.next_run = max(float(saved['next_run']), now + random.uniform(0, 5))
+                else:
+                    job.next_run = job.next_after(now)
+            self._jobs = jobs
+            self._heap = [(job.next_run, next(self._seq), name) for name, job in jobs.items()]
+            heapq.heapify(self._heap)
+            if workers != self._workers:
+                self._workers = workers
+                # The pool only exists while the scheduler runs.
+                if self._pool is not None:
+                    old_pool, self._pool = self._pool, ThreadPoolExecutor(workers, thread_name_prefix='idle')
+                    old_pool.shutdown(wait=False)
+            self._loaded = True
+            self._save_state()
+            self._cond.notify()
+
+    # --- execution ---
+    def start(self) -> 'IdleScheduler':
+        """Load the saved configuration if needed and start the timer
+        thread and worker pool.  Does nothing if already running."""
+        if self._thread is not None:
+            return self
+        if not self._loaded:
+            self.reload()
+        with self._cond:
+            if self._thread is None:
+                self._stopped = False
+                self._pool = ThreadPoolExecutor(self._workers, thread_name_prefix='idle')
+                self._thread = threading.Thread(target=self._loop, name='idle-scheduler', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the timer thread and the worker pool; :meth:`start`
+        resumes the schedule."""
+        with self._cond:
+            self._stopped = True
+            thread, self._thread = self._thread, None
+            pool, self._pool = self._pool, None
+            self._cond.notify()
+        if thread is not None:
+            thread.join(timeout=5)
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def _loop(self) -> None:
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due, _, name = self._heap[0]
+                now = time.time()
+                if due > now:
+                    self._cond.wait(due - now)
+                    continue
+                heapq.heappop(self._heap)
+                job = self._jobs.get(name)
+                if job is None or job.next_run != due:
+                    continue  # superseded by a reload
+                stats = self._state.setdefault(name, {})
+                if name in self._running:
+                    stats['skipped'] = stats.get('skipped', 0) + 1
+                else:
+                    self._running.add(name)
+                    self._pool.submit(self._execute, job)
+                next_run = job.next_after(due)
+                job.next_run = next_run if next_run > now else job.next_after(now)
+                heapq.heappush(self._heap, (job.next_run, next(self._seq), name))
+                self._save_state()
+
+    def _execute(self, job: _Job) -> None:
+        started = time.time()
+        try:
+            description = job.action()
+            status, error = 'done', None
+        except Exception as e:
+            status, error = 'failed', str(e)
+            description = f"Idle behaviour {job.name} failed: {e}"
+        # A failure to log the run is not a failure of the behaviour.
+        try:
+            self.record(description=description, status=status)
+        except Exception:
+            logger.exception('cannot record idle behaviour %s', job.name)
+        with self._cond:
+            self._running.discard(job.name)
+            stats = self._state.setdefault(job.name, {})
+            stats.update(last_run=started, last_status=status, last_error=error,
+                         runs=stats.get('runs', 0) + 1)
+            self._save_state()
+
+    def status(self) -> List[Dict[str, Any]]:
+        """Schedule, next and last run and counters of each behaviour."""
+        with self._cond:
+            return [dict(
+                job.describe(),
+                name=name,
+                next_run=_iso(job.next_run),
+                running=name in self._running,
+                last_run=_iso(self._state.get(name, {}).get('last_run')),
+                last_status=self._state.get(name, {}).get('last_status'),
+                runs=self._state.get(name, {}).get('runs', 0),
+                skipped=self._state.get(name, {}).get('skipped', 0),
+            ) for name, job in sorted(self._jobs.items(), key=lambda item: item[1].next_run)]
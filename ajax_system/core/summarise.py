@@ -0,0 +1,345 @@
+"""
+Extractive summaries of training files.
+
+The summary of an upload is built from its most central sentences
+rather than its first words:
+
+1. the text is split into sentences as it streams in;
+2. every sentence becomes a TF‑IDF vector (log term frequency, smoothed
+   IDF, L2 normalised) held as flat ``(sentence, term, weight)``
+   arrays;
+3. sentences are ranked with TextRank over the cosine‑similarity graph.
+   The graph is never materialised: each power iteration multiplies by
+   ``X·Xᵀ`` as two sparse products, which NumPy does with ``bincount``
+   when it is installed;
+4. the best sentences that fit the length budget are returned in
+   document order.
+
+Without NumPy the same ranking runs in pure Python with fewer
+iterations.  Only term ids are kept while ranking; the chosen sentences
+are fetched in a second pass over the text, so memory does not grow
+with the document beyond ``MAX_SENTENCES`` sentences, after which the
+rest of the file is not read.
+
+Summaries of files are cached on disk by content hash and budget.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import re
+from array import array
+from collections import Counter
+from contextlib import closing
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core import extract
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:
+    np = None  # pure Python ranking below
+
+
+CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(CORE_DIR, 'knowledge', '.cache', 'summary')
+
+# Sentences ranked per document; text after this is not read.
+MAX_SENTENCES = 100_000
+# Sentences outside these word counts are ranked but never selected.
+MIN_WORDS = 5
+MAX_WORDS_PER_SENTENCE = 80
+DAMPING = 0.85
+ITERATIONS = 30
+PYTHON_ITERATIONS = 5
+TOLERANCE = 1e-6
+SUMMARY_VERSION = 1
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9']+")
+# Sentence ends, paragraph breaks, and list items, headings, table rows
+# and code fences on a new line.
+_BOUNDARY = re.compile(r'[.!?]+["\')\]]*\s+|\n\s*\n|\n(?=[ \t]*(?:(?:[-*•#>]|\d+[.)])\s|\||```))')
+_LAST_WORD = re.compile(r'[\w.]+$')
+_ABBREVIATIONS = frozenset('mr mrs ms dr prof st jr sr vs etc e.g i.e inc ltd co no'.split())
+STOPWORDS = frozenset(
+    'a an and are as at be but by for from has have in is it its of on or that the this to was were '
+    'will with you your i we our they them he she his her not no do does did so if then than '
+    'me my us been being am can could would should just also about into there their what which who'.split()
+)
+
+
+def _spans(chunks: Iterable[str], max_chars: int = 4096) -> Iterator[Tuple[int, int, str]]:
+    """Yield ``(start, end, sentence)`` for the sentences of a stream of
+    text chunks; offsets count characters from the start of the stream.
+    Text with no boundary for ``max_chars`` characters is cut there so a
+    single run‑on line cannot grow without bound."""
+    carry = ''
+    offset = 0  # stream position of carry[0]
+    for chunk in chunks:
+        buf = carry + chunk
+        start = 0
+        for m in _BOUNDARY.finditer(buf):
+            end = m.start()
+            if buf[end] == '.':
+                word = _LAST_WORD.search(buf, max(start, end - 8), end)
+                word = word.group() if word else ''
+                # "Dr.", "e.g.", "p.m." and initials do not end a sentence.
+                if word.lower() in _ABBREVIATIONS or '.' in word or (len(word) == 1 and word.isupper()):
+                    continue
+            sentence = buf[start:m.end()].strip()
+            if sentence:
+                yield offset + start, offset + m.end(), sentence
+            start = m.end()
+        while len(buf) - start > max_chars:
+            cut = buf.rfind(' ', start, start + max_chars)
+            cut = cut if cut > start else start + max_chars
+            sentence = buf[start:cut].strip()
+            if sentence:
+                yield offset + start, offset + cut, sentence
+            start = cut
+        carry = buf[start:]
+        offset += start
+    sentence = carry.strip()
+    if sentence:
+        yield offset, offset + len(carry), sentence
+
+
+def split_sentences(chunks: Iterable[str]) -> Iterator[str]:
+    """Yield the sentences of a stream of text chunks, stripped but
+    otherwise as written."""
+    for _, _, sentence in _spans(chunks):
+        yield sentence
+
+
+def tokenize(sentence: str) -> List[str]:
+    """Lower‑cased terms of two or more characters without stopwords."""
+    return [t for t in _TOKEN.findall(sentence.lower()) if t not in STOPWORDS]
+
+
+class _Matrix:
+    """Term ids and stream offsets of every sentence.
+
+    Stopwords are given the first ids so they can be masked out as a
+    block instead of being tested token by token.
+    """
+
+    def __init__(self) -> None:
+        self.vocab: Dict[str, int] = {word: i for i, word in enumerate(sorted(STOPWORDS))}
+        self.stop = len(self.vocab)
+        self.terms = array('i')
+        self.lengths = array('i')
+        self.words = array('i')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.n = 0
+
+    def add(self, start: int, end: int, sentence: str) -> None:
+        tokens = _TOKEN.findall(sentence.lower())
+        ids = list(map(self.vocab.get, tokens))
+        if None in ids:
+            vocab = self.vocab
+            ids = [vocab.setdefault(t, len(vocab)) for t in tokens]
+        self.terms.extend(ids)
+        self.lengths.append(len(ids))
+        self.words.append(len(sentence.split()))
+        self.starts.append(start)
+        self.ends.append(end)
+        self.n += 1
+
+
+def _rank_numpy(m: _Matrix, iterations: int) -> List[float]:
+    n, v = m.n, len(m.vocab)
+    rows = np.repeat(np.arange(n, dtype=np.int64), np.frombuffer(m.lengths, dtype=np.intc))
+    terms = np.frombuffer(m.terms, dtype=np.intc)
+    keep = terms >= m.stop
+    cells, counts = np.unique(rows[keep] * v + terms[keep], return_counts=True)
+    rows, cols = cells // v, cells % v
+    df = np.bincount(cols, minlength=v)
+    w = (1.0 + np.log(counts)) * (np.log((1.0 + n) / (1.0 + df)) + 1.0)[cols]
+    norms = np.sqrt(np.bincount(rows, w * w, minlength=n))
+    w /= norms[rows]
+    present = norms > 0
+
+    def similarity(vec):
+        # (X·Xᵀ − I)·vec without building the n × n matrix.
+        terms = np.bincount(cols, w * vec[rows], minlength=v)
+        return np.bincount(rows, w * terms[cols], minlength=n) - vec * present
+
+    degree = similarity(np.ones(n))
+    inv_degree = np.divide(1.0, degree, out=np.zeros(n), where=degree > 1e-12)
+    rank = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        new = (1 - DAMPING) / n + DAMPING * similarity(rank * inv_degree)
+        done = np.abs(new - rank).sum() < TOLERANCE
+        rank = new
+        if done:
+            break
+    return rank.tolist()
+
+
+def _rank_python(m: _Matrix, iterations: int) -> List[float]:
+    n, v = m.n, len(m.vocab)
+    rows: List[int] = []
+    cols: List[int] = []
+    counts: List[int] = []
+    pos = 0
+    for r, length in enumerate(m.lengths):
+        for c, count in Counter(m.terms[pos:pos + length]).items():
+            if c < m.stop:
+                continue
+            rows.append(r)
+            cols.append(c)
+            counts.append(count)
+        pos += length
+    df = [0] * v
+    for c in cols:
+        df[c] += 1
+    idf = [math.log((1.0 + n) / (1.0 + d)) + 1.0 for d in df]
+    w = [(1.0 + math.log(count)) * idf[c] for count, c in zip(counts, cols)]
+    norms = [0.0] * n
+    for r, x in zip(rows, w):
+        norms[r] += x * x
+    w = [x / math.sqrt(norms[r]) for r, x in zip(rows, w)]
+    present = [1.0 if x > 0 else 0.0 for x in norms]
+
+    def similarity(vec: List[float]) -> List[float]:
+        terms = [0.0] * v
+        for r, c, x in zip(rows, cols, w):
+            terms[c] += x * vec[r]
+        out = [-a * p for a, p in zip(vec, present)]
+        for r, c, x in zip(rows, cols, w):
+            out[r] += x * terms[c]
+        return out
+
+    degree = similarity([1.0] * n)
+    inv_degree = [1.0 / d if d > 1e-12 else 0.0 for d in degree]
+    rank = [1.0 / n] * n
+    base = (1 - DAMPING) / n
+    for _ in range(iterations):
+        spread = similarity([r * d for r, d in zip(rank, inv_degree)])
+        new = [base + DAMPING * s for s in spread]
+        done = sum(abs(a - b) for a, b in zip(new, rank)) < TOLERANCE
+        rank = new
+        if done:
+            break
+    return rank
+
+
+def rank_sentences(m: _Matrix, iterations: Optional[int] = None) -> List[float]:
+    """TextRank score of every sentence in ``m``."""
+    if not m.n:
+        return []
+    if np is not None:
+        return _rank_numpy(m, ITERATIONS if iterations is None else iterations)
+    return _rank_python(m, PYTHON_ITERATIONS if iterations is None else iterations)
+
+
+def _select(m: _Matrix, scores: List[float], max_words: int, max_sentences: Optional[int]) -> List[int]:
+    candidates = [i for i in range(m.n) if MIN_WORDS <= m.words[i] <= MAX_WORDS_PER_SENTENCE]
+    candidates.sort(key=lambda i: (-scores[i], i))
+    chosen: List[int] = []
+    used = 0
+    for i in candidates:
+        if used + m.words[i] > max_words:
+            continue
+        chosen.append(i)
+        used += m.words[i]
+        if (max_sentences and len(chosen) >= max_sentences) or max_words - used < MIN_WORDS:
+            break
+    return sorted(chosen)
+
+
+def _leading_words(chunks: Iterable[str], max_words: int) -> str:
+    words: List[str] = []
+    for sentence in split_sentences(chunks):
+        words.extend(sentence.split())
+        if len(words) > max_words:
+            return ' '.join(words[:max_words]) + '...'
+    return ' '.join(words)
+
+
+def _cut(chunks: Iterable[str], spans: List[Tuple[int, int]]) -> List[str]:
+    """Text of the sorted, non‑overlapping ``spans`` of a chunk stream."""
+    found: List[str] = []
+    parts: List[str] = []
+    base = 0
+    i = 0
+    for chunk in chunks:
+        top = base + len(chunk)
+        while i < len(spans) and spans[i][0] < top:
+            start, end = spans[i]
+            parts.append(chunk[max(start - base, 0):end - base])
+            if end > top:
+                break
+            found.append(' '.join(''.join(parts).split()))
+            parts = []
+            i += 1
+        if i == len(spans):
+            break
+        base = top
+    return found
+
+
+def _summarise(open_text: Callable[[], Iterable[str]], max_words: int, max_sentences: Optional[int]) -> str:
+    m = _Matrix()
+    with closing(_spans(open_text())) as sentences:
+        for span in sentences:
+            if m.n >= MAX_SENTENCES:
+                break
+            m.add(*span)
+    if not m.n:
+        return ''
+    wanted = _select(m, rank_sentences(m), max_words, max_sentences)
+    chunks = open_text()
+    try:
+        if not wanted:
+            # Nothing fits the budget (e.g. one long run‑on sentence).
+            return _leading_words(chunks, max_words)
+        return ' '.join(_cut(chunks, [(m.starts[i], m.ends[i]) for i in wanted]))
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def summarise_text(text: str, max_words: int = 200, max_sentences: Optional[int] = None) -> str:
+    """Summary of ``text`` in at most ``max_words`` words (and
+    ``max_sentences`` sentences, if given)."""
+    return _summarise(lambda: [text], max_words, max_sentences)
+
+
+def summarise_file(
+    path: str,
+    digest: Optional[str] = None,
+    max_words: int = 200,
+    max_sentences: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+) -> str:
+    """Summary of a training file, read through :mod:`core.extract`.
+
+    Summaries are cached under ``cache_dir`` by the file's SHA‑256 and
+    the budget, so re‑uploading a document does not rank it again.
+    """
+    if not extract.supported(path):
+        return ''
+    digest = digest or extract.file_digest(path)
+    key = hashlib.sha256(f'{SUMMARY_VERSION}:{max_words}:{max_sentences}'.encode()).hexdigest()[:12]
+    target = os.path.join(cache_dir or CACHE_DIR, digest[:2], f'{digest}-{key}.txt')
+    try:
+        with open(target, encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    def open_text() -> Iterator[str]:
+        return extract.iter_extracted(path, digest)
+
+    summary = _summarise(open_text, max_words, max_sentences)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = f'{target}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(summary)
+    os.replace(tmp, target)
+    return summary
@@ -0,0 +1,176 @@
+"""
+SQLite-backed task timeline for the AJAX platform.
+
+The timeline used to be a single JSON array that was reread and
+rewritten for every event.  This module keeps the same records in an
+SQLite database running in WAL mode so that appending an event is a
+single indexed insert and readers never block the writer.  IDs come
+from an ``AUTOINCREMENT`` primary key and therefore stay monotonic even
+if rows are ever deleted.
+
+Each thread gets its own connection; SQLite handles the locking
+between them (and between processes sharing the same file).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    description TEXT NOT NULL,
+    status TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_ts ON tasks (ts);
+CREATE INDEX IF NOT EXISTS tasks_status_ts ON tasks (status, ts);
+"""
+
+
+def _to_epoch(timestamp: str) -> float:
+    """Convert an ISO timestamp into seconds since the epoch.  Naive
+    timestamps are interpreted as local time."""
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _bound(name: str, timestamp: str) -> float:
+    """Parse a ``since``/``until`` filter, rejecting invalid values
+    instead of silently matching from the epoch."""
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be an ISO timestamp') from None
+
+
+class Timeline:
+    """Transactional store for timeline events."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def add(self, description: str, status: str, timestamp: str) -> Dict[str, Any]:
+        """Insert an event and return it with its assigned ID."""
+        cur = self._conn().execute(
+            'INSERT INTO tasks (description, status, timestamp, ts) VALUES (?, ?, ?, ?)',
+            (description, status, timestamp, _to_epoch(timestamp)),
+        )
+        return {
+            'id': cur.lastrowid,
+            'description': description,
+            'status': status,
+            'timestamp': timestamp,
+        }
+
+    def query(
+        self,
+        status: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Return events in ID order, optionally filtered by status,
+        ISO time range (``since`` inclusive, ``until`` exclusive) and
+        ``after_id`` for cursor-style paging.
+
+        Raises:
+            ValueError: If ``since`` or ``until`` is not an ISO timestamp.
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        if status:
+            clauses.append('status = ?')
+            params.append(status)
+        if since:
+            clauses.append('ts >= ?')
+            params.append(_bound('since', since))
+        if until:
+            clauses.append('ts < ?')
+            params.append(_bound('until', until))
+        if after_id is not None:
+            clauses.append('id > ?')
+            params.append(after_id)
+        sql = 'SELECT id, description, status, timestamp FROM tasks'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY id'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        return [dict(row) for row in self._conn().execute(sql, params)]
+
+    def count(self) -> int:
+        return self._conn().execute('SELECT COUNT(*) FROM tasks').fetchone()[0]
+
+    def migrate_json(self, json_path: str) -> int:
+        """Import a legacy ``tasks.json`` array into an empty timeline.
+
+        The original IDs are preserved when they are unique integers and
+        the JSON file is renamed to
+        ``<name>.migrated`` so the import only ever runs once.  Returns the
+        number of imported events.
+        """
+        if not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                tasks = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return 0
+        if not isinstance(tasks, list):
+            return 0
+        conn = self._conn()
+        imported = 0
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if self.count() == 0:
+                tasks = [t for t in tasks if isinstance(t, dict)]
+                ids = [t.get('id') for t in tasks]
+                # IDs from the JSON era were len(tasks)+1 and may collide
+                # after concurrent writes; renumber if they are not usable.
+                keep_ids = all(isinstance(i, int) for i in ids) and len(set(ids)) == len(ids)
+                rows = [
+                    (
+                        t.get('id') if keep_ids else None,
+                        t.get('description', ''),
+                        t.get('status', 'pending'),
+                        t.get('timestamp', ''),
+                        _to_epoch(t.get('timestamp', '')),
+                    )
+                    for t in tasks
+                ]
+                conn.executemany(
+                    'INSERT INTO tasks (id, description, status, timestamp, ts) VALUES (?, ?, ?, ?, ?)',
+                    rows,
+                )
+                imported = len(rows)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        os.replace(json_path, json_path + '.migrated')
+        return imported
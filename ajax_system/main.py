@@ -16,9 +16,19 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from core import ajax_ai, agent as agent_mgr, tasks as task_mgr, memory
+from core.scheduler import IdleScheduler
 
 app = Flask(__name__)
 CORS(app)
+idle_scheduler = IdleScheduler()
+
+
+@app.before_request
+def start_idle_scheduler():
+    """Start the idle behaviour scheduler with the first request, so it
+    runs in whichever process serves the app (the development server,
+    its reloader child or a WSGI server worker)."""
+    idle_scheduler.start()
 
 
 @app.route('/mode', methods=['GET'])
@@ -68,20 +78,25 @@ def create_agent():
 
 @app.route('/agents/<agent_name>/upload_training', methods=['POST'])
 def upload_training(agent_name):
-    """Upload a training file for a specific agent.  Accepts multipart
-    form data containing a file field named `file`.  Optionally accepts
-    a `summarise` query parameter to enable summarisation."""
-    if 'file' not in request.files:
+    """Upload training files for a specific agent.  Accepts multipart
+    form data containing one or more file fields named `file`.
+    Optionally accepts a `summarise` query parameter to enable
+    summarisation.  Uploads are streamed to disk rather than read into
+    memory; several files are extracted in parallel."""
+    files = [f for f in request.files.getlist('file') if f.filename]
+    if not files:
         return jsonify({'error': 'No file uploaded'}), 400
-    file = request.files['file']
-    file_content = file.read()
-    filename = file.filename
     summarise = request.args.get('summarise', 'true').lower() != 'false'
     try:
-        agent_mgr.upload_training_file(agent_name, filename, file_content, summarise)
+        if len(files) == 1:
+            filename = files[0].filename
+            agent_mgr.upload_training_file(agent_name, filename, files[0].stream, summarise)
+            return jsonify({'status': 'received', 'file': filename})
+        stored = agent_mgr.upload_training_files(
+            agent_name, [(f.filename, f.stream) for f in files], summarise)
     except FileNotFoundError:
         return jsonify({'error': f'Agent {agent_name} does not exist'}), 404
-    return jsonify({'status': 'received', 'file': filename})
+    return jsonify({'status': 'received', 'files': stored})
 
 
 @app.route('/projects', methods=['GET'])
@@ -139,10 +154,34 @@ def connect_platform():
     return jsonify({'status': 'saved', 'keys': list(env_updates.keys())})
 
 
+def _int_arg(name):
+    """Query parameter `name` as an int (None when absent).  Raises
+    ValueError for anything else, where `type=int` would return None."""
+    value = request.args.get(name)
+    return None if value is None else int(value)
+
+
 @app.route('/tasks', methods=['GET'])
 def list_tasks():
-    """Return the current task timeline."""
-    return jsonify({'tasks': memory.get_tasks()})
+    """Return the task timeline.  Optional query parameters filter by
+    `status`, ISO time range (`since`, `until`) and page with `after_id`
+    and `limit`."""
+    try:
+        after_id = _int_arg('after_id')
+        limit = _int_arg('limit')
+    except ValueError:
+        return jsonify({'error': 'after_id and limit must be integers'}), 400
+    try:
+        tasks = memory.get_tasks(
+            status=request.args.get('status'),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            after_id=after_id,
+            limit=limit,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'tasks': tasks})
 
 
 @app.route('/tasks/add', methods=['POST'])
@@ -166,12 +205,23 @@ def get_idle_behaviors():
 
 @app.route('/idle_behaviors', methods=['POST'])
 def update_idle_behaviors():
-    """Replace the idle behaviours configuration.  Expects JSON body."""
+    """Replace the idle behaviours configuration.  Expects JSON body.
+    The new schedule takes effect immediately."""
     data = request.get_json(force=True)
+    try:
+        idle_scheduler.reload(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     task_mgr.set_idle_behaviors(data)
     return jsonify({'status': 'updated'})
 
 
+@app.route('/idle_behaviors/schedule', methods=['GET'])
+def idle_schedule():
+    """Return each enabled behaviour's schedule, next and last run."""
+    return jsonify({'schedule': idle_scheduler.status()})
+
+
 @app.route('/respond', methods=['POST'])
 def respond_message():
     """Generate a reply for a given user message based on the current mode.
@@ -187,24 +237,10 @@ if __name__ == '__main__':
     # Ensure required directories exist at startup
     os.makedirs(os.path.join('core', 'projects'), exist_ok=True)
     os.makedirs(os.path.join('logs'), exist_ok=True)
-    # Start background idle behaviour thread
-    def idle_worker():
-        import time
-        from random import randint
-        while True:
-            config = task_mgr.get_idle_behaviors()
-            frequency = config.get('frequency_minutes', 30)
-            # Sleep for the configured period
-            time.sleep(max(1, int(frequency)) * 60)
-            # Perform configured idle tasks
-            if config.get('scan_social_comments'):
-                count = randint(1, 5)
-                memory.add_task(description=f"Ajax checked {count} social accounts", status='done')
-            if config.get('review_spreadsheets'):
-                memory.add_task(description="Ajax reviewed Google Sheets for content performance", status='done')
-            if config.get('read_financial_sites'):
-                memory.add_task(description="Ajax read financial news sites for investor training", status='done')
-    import threading
-    threading.Thread(target=idle_worker, daemon=True).start()
+    # Start the idle behaviour scheduler without waiting for a request.
+    # With the debug reloader the server runs in a child process; only
+    # that one schedules behaviours.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        idle_scheduler.start()
     # Start the development server
     app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
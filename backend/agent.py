@@ -18,13 +18,14 @@ from __future__ import annotations
 
 import os
 import json
-from flask import Flask, request, jsonify, Response, send_from_directory
+from flask import Flask, request, jsonify, Response
 from functools import wraps
 from datetime import datetime
 from typing import List
 
 from core.ajax_ai import build_default_ajax
 from .endpoints import register_api_endpoints
+from .static_assets import StaticAssets
 
 FRONTEND_DIST = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend', 'dist')
 
@@ -37,11 +38,16 @@ def create_app() -> Flask:
     loading issues with compiled assets (JS/CSS).  Static files are
     served from the `dist` directory without requiring credentials.
     """
-    app = Flask(__name__, static_folder=FRONTEND_DIST, static_url_path='')
+    # Static files are served by StaticAssets below rather than Flask's
+    # built-in static route.
+    app = Flask(__name__, static_folder=None)
+    assets = StaticAssets(FRONTEND_DIST)
+    app.config['static_assets'] = assets
 
     # Basic auth credentials from env or defaults
     BASIC_USER = os.getenv('BASIC_USER', 'logan')
     BASIC_PASS = os.getenv('BASIC_PASS', 'AllDay21!!!')
+    app.config['BASIC_AUTH'] = (BASIC_USER, BASIC_PASS)
 
     def require_auth(fn):
         """Decorator to enforce basic authentication on API routes."""
@@ -72,12 +78,13 @@ def create_app() -> Flask:
         This route does not require authentication so that the
         frontend can load JS and CSS assets without prompting the
         user multiple times.  Sensitive API calls remain protected
-        via the `require_auth` decorator.
+        via the `require_auth` decorator.  Unknown paths get
+        ``index.html`` so client-side routes work on reload.
         """
-        target = os.path.join(app.static_folder, path)
-        if path and os.path.exists(target):
-            return send_from_directory(app.static_folder, path)
-        return send_from_directory(app.static_folder, 'index.html')
+        response = (path and assets.response(path)) or assets.response('index.html')
+        if response is None:
+            return Response('Frontend not built', 404)
+        return response
 
     return app
 
@@ -0,0 +1,451 @@
+"""
+ASGI entry point for the GPT Agent backend.
+
+The Flask views in ``backend.endpoints`` are synchronous, so every slow
+tool call (a browser fetch, an image generation) holds a server thread
+for its full duration.  This module serves the same API as an ASGI
+application.  The chat, chat stream, image, agent-run and web tool
+routes are coroutines on the server's event loop that await the tools'
+non-blocking interfaces (chat replies come from
+``LLMClient.astream``), so in-flight requests are no longer capped by
+the number of threads; only SQLite writes go to the thread pool.  Every other route is forwarded to the Flask app
+through a WSGI bridge on a bounded thread pool.  Authentication, routes
+and JSON payloads are identical in both modes.
+
+Run it with any ASGI server, for example:
+
+    uvicorn --factory backend.asgi:create_asgi_app --port 8000
+
+or ``python -m backend.asgi``, which uses uvicorn when it is installed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import binascii
+import functools
+import inspect
+import json
+import os
+import re
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from flask import Flask
+
+from core.conversations import valid_project
+from core.plugins import PluginError
+
+from .endpoints import sse_event, wait_arg
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Request bodies larger than this are spooled to disk before being
+# handed to the WSGI app (CRM imports, uploads).
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+
+class Request:
+    """The parts of an ASGI HTTP request the async routes need."""
+
+    def __init__(self, scope: Scope, body: bytes) -> None:
+        self.method: str = scope['method']
+        self.path: str = scope['path']
+        self.body = body
+        self.headers = {
+            k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])
+        }
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        self.args = {k: v[-1] for k, v in query.items()}
+
+    def json(self) -> Dict[str, Any]:
+        """Decode the body like ``request.get_json(force=True)``.
+
+        Raises:
+            ValueError: If the body is not valid JSON.
+        """
+        return json.loads(self.body or b'{}')
+
+
+async def read_body(receive: Receive) -> bytes:
+    chunks: List[bytes] = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+def dumps(payload: Any) -> bytes:
+    """Serialise like Flask's ``jsonify`` so both modes return identical bytes."""
+    return (json.dumps(payload, sort_keys=True, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+async def send_response(
+    send: Send,
+    body: bytes,
+    status: int = 200,
+    content_type: str = 'application/json',
+    headers: Iterable[Tuple[str, str]] = (),
+) -> None:
+    raw = [(b'content-type', content_type.encode('latin-1')), (b'content-length', str(len(body)).encode())]
+    raw.extend((k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers)
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send: Send, payload: Any, status: int = 200) -> None:
+    await send_response(send, dumps(payload), status)
+
+
+def wsgi_environ(scope: Scope, body: Any) -> Dict[str, Any]:
+    """Build a PEP 3333 environ for an ASGI HTTP scope."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ: Dict[str, Any] = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name, value = name.decode('latin-1').lower(), value.decode('latin-1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class AsyncAPI:
+    """ASGI application serving the hot API routes natively and the rest
+    of the Flask app through a WSGI bridge."""
+
+    def __init__(self, flask_app: Flask, threads: int = 32) -> None:
+        self.flask_app = flask_app
+        self.config = flask_app.config
+        # Runs the bridged Flask views and the short blocking steps of
+        # the async routes (SQLite writes, synchronous agents).
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi-sync')
+        self.routes: List[Tuple[set, 're.Pattern[str]', Callable[..., Awaitable[None]]]] = [
+            ({'POST'}, re.compile(r'/api/chat'), self.chat),
+            ({'GET', 'POST'}, re.compile(r'/api/chat/stream'), self.chat_stream),
+            ({'POST'}, re.compile(r'/api/image'), self.image),
+            ({'GET'}, re.compile(r'/api/image/(?P<job_id>[^/]+)'), self.image_job),
+            ({'POST'}, re.compile(r'/api/agent/run'), self.agent_run),
+            ({'POST'}, re.compile(r'/api/web'), self.web),
+        ]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        for methods, pattern, handler in self.routes:
+            match = pattern.fullmatch(scope['path'])
+            if match and scope['method'] in methods:
+                request = Request(scope, await read_body(receive))
+                if not self._authorized(request):
+                    await send_response(
+                        send, b'Authentication required', 401, 'text/html; charset=utf-8',
+                        [('WWW-Authenticate', 'Basic realm=Login')],
+                    )
+                    return
+                await handler(request, send, **match.groupdict())
+                return
+        await self._call_wsgi(scope, receive, send)
+
+    # --- helpers ---
+    def _authorized(self, request: Request) -> bool:
+        scheme, _, token = request.headers.get('authorization', '').partition(' ')
+        if scheme.lower() != 'basic':
+            return False
+        try:
+            user, _, password = base64.b64decode(token).decode('utf-8').partition(':')
+        except (binascii.Error, UnicodeDecodeError):
+            return False
+        return (user, password) == tuple(self.config['BASIC_AUTH'])
+
+    async def _blocking(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a short blocking call on the thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args))
+
+    async def _call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Await coroutine functions directly; run plain ones on the pool."""
+        if inspect.iscoroutinefunction(fn):
+            return await fn(*args)
+        return await self._blocking(fn, *args)
+
+    async def _json(self, request: Request, send: Send) -> Optional[Dict[str, Any]]:
+        try:
+            return request.json()
+        except ValueError:
+            await send_json(send, {'error': 'Invalid JSON'}, 400)
+            return None
+
+    # --- async routes ---
+    async def chat(self, request: Request, send: Send) -> None:
+        data = await self._json(request, send)
+        if data is None:
+            return
+        message = (data.get('message') or '').strip()
+        if not message:
+            await send_json(send, {'error': 'Empty message'}, 400)
+            return
+        project = data.get('project') or 'general'
+        if not valid_project(project):
+            await send_json(send, {'error': 'invalid project'}, 400)
+            return
+        chunks = self.config['astream_chat_message'](message, self.config['ajax_agent'], self._blocking, project)
+        reply = ''.join([chunk async for chunk in chunks])
+        timestamp = await self._blocking(self.config['record_chat'], message, reply, project)
+        await send_json(send, {'response': reply, 'timestamp': timestamp})
+
+    async def chat_stream(self, request: Request, send: Send) -> None:
+        """SSE chat reply; each chunk is sent as soon as it exists."""
+        if request.method == 'POST':
+            data = await self._json(request, send)
+            if data is None:
+                return
+        else:
+            data = request.args
+        message = (data.get('message') or '').strip()
+        if not message:
+            await send_json(send, {'error': 'Empty message'}, 400)
+            return
+        project = data.get('project') or 'general'
+        if not valid_project(project):
+            await send_json(send, {'error': 'invalid project'}, 400)
+            return
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+
+        async def emit(payload: Dict[str, Any], event: Optional[str] = None, more: bool = True) -> None:
+            body = sse_event(payload, event).encode('utf-8')
+            await send({'type': 'http.response.body', 'body': body, 'more_body': more})
+
+        chunks = self.config['astream_chat_message'](message, self.config['ajax_agent'], self._blocking, project)
+        parts: List[str] = []
+        try:
+            async for chunk in chunks:
+                parts.append(chunk)
+                await emit({'delta': chunk})
+        except Exception as e:
+            await emit({'error': str(e)}, 'error', more=False)
+            return
+        reply = ''.join(parts)
+        timestamp = await self._blocking(self.config['record_chat'], message, reply, project)
+        await emit({'response': reply, 'timestamp': timestamp}, 'done', more=False)
+
+    async def image(self, request: Request, send: Send) -> None:
+        data = await self._json(request, send)
+        if data is None:
+            return
+        prompt = (data.get('prompt') or '').strip()
+        if not prompt:
+            await send_json(send, {'error': 'Empty prompt'}, 400)
+            return
+        image_jobs = self.config['image_jobs']
+        status_info = self.config['status_info']
+        job = image_jobs.submit(prompt, data.get('size') or '1024x1024')
+        if data.get('async'):
+            await send_json(send, job, 202)
+            return
+        try:
+            timeout = float(data.get('timeout', 60))
+        except (TypeError, ValueError):
+            timeout = 60.0
+        await self._blocking(status_info.set, 'live_status', 'working')
+        job_id = job['id']
+        job = await image_jobs.wait_async(job_id, timeout)
+        await self._blocking(status_info.set, 'live_status', 'idle')
+        if job is None:
+            # Evicted by newer jobs while waiting.
+            await send_json(send, {'error': 'unknown job', 'job_id': job_id}, 404)
+            return
+        if job['status'] == 'failed':
+            await send_json(send, {'error': job['error'], 'job_id': job['id']}, 500)
+            return
+        if job['status'] != 'done':
+            await send_json(send, job, 202)
+            return
+        await self._blocking(lambda: status_info.push('history', f"Generated image: {job['url']}", keep=5))
+        await send_json(send, {'url': job['url'], 'job_id': job['id'], 'cached': job['cached']})
+
+    async def image_job(self, request: Request, send: Send, job_id: str) -> None:
+        image_jobs = self.config['image_jobs']
+        try:
+            wait = wait_arg(request.args.get('wait'))
+        except ValueError:
+            await send_json(send, {'error': 'wait must be a number of seconds'}, 400)
+            return
+        job = await image_jobs.wait_async(job_id, wait) if wait else image_jobs.get(job_id)
+        if job is None:
+            await send_json(send, {'error': 'unknown job'}, 404)
+            return
+        await send_json(send, job)
+
+    async def agent_run(self, request: Request, send: Send) -> None:
+        """Run an agent action.  Agents may provide a coroutine
+        ``arun(action, payload)``; plain ``run`` is called on the pool."""
+        data = await self._json(request, send)
+        if data is None:
+            return
+        agent_name = (data.get('agent') or '').strip()
+        action = (data.get('action') or '').strip()
+        try:
+            agent = self.config['ajax_agent'].agent_registry.get(agent_name)
+        except PluginError as e:
+            await send_json(send, {'error': str(e)}, 500)
+            return
+        if not agent:
+            await send_json(send, {'error': 'unknown agent'}, 400)
+            return
+        try:
+            result = await self._call(getattr(agent, 'arun', agent.run), action or 'chat', data.get('input'))
+        except Exception as e:
+            await send_json(send, {'error': str(e)}, 500)
+            return
+        timestamp = datetime.now().isoformat()
+        await self._blocking(self.config['append_task_log'], {
+            'timestamp': timestamp, 'task': f'{agent_name}:{action}', 'response': result,
+        })
+        await send_json(send, {'response': result, 'timestamp': timestamp})
+
+    async def web(self, request: Request, send: Send) -> None:
+        data = await self._json(request, send)
+        if data is None:
+            return
+        if not (data.get('url') or data.get('query')):
+            await send_json(send, {'error': 'Empty query'}, 400)
+            return
+        try:
+            result = await self.config['tools']['web'].arun(data)
+        except Exception as e:
+            await send_json(send, {'error': str(e)}, 502)
+            return
+        await send_json(send, result)
+
+    # --- WSGI bridge ---
+    async def _call_wsgi(self, scope: Scope, receive: Receive, send: Send) -> None:
+        body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        while True:
+            message = await receive()
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+        environ = wsgi_environ(scope, body)
+        loop = asyncio.get_running_loop()
+        events: 'asyncio.Queue[Tuple[str, Any]]' = asyncio.Queue()
+
+        def put(kind: str, value: Any) -> None:
+            loop.call_soon_threadsafe(events.put_nowait, (kind, value))
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info: Any = None) -> Callable:
+            put('start', (int(status.split(' ', 1)[0]), headers))
+            return lambda data: put('body', data)
+
+        def run() -> None:
+            # The whole response is produced on one thread so generators
+            # wrapped in stream_with_context keep their app context.
+            try:
+                result = self.flask_app(environ, start_response)
+                try:
+                    for chunk in result:
+                        if chunk:
+                            put('body', chunk)
+                finally:
+                    if hasattr(result, 'close'):
+                        result.close()
+            except Exception as e:
+                put('error', e)
+            finally:
+                body.close()
+                put('end', None)
+
+        loop.run_in_executor(self.executor, run)
+        started = False
+        while True:
+            kind, value = await events.get()
+            if kind == 'start':
+                status, headers = value
+                await send({
+                    'type': 'http.response.start',
+                    'status': status,
+                    'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers],
+                })
+                started = True
+            elif kind == 'body':
+                await send({'type': 'http.response.body', 'body': value, 'more_body': True})
+            elif kind == 'error' and not started:
+                await send_response(send, b'Internal Server Error', 500, 'text/plain')
+                return
+            elif kind == 'end':
+                if started:
+                    await send({'type': 'http.response.body', 'body': b''})
+                return
+
+    # --- lifespan ---
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(None, self.close)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def close(self) -> None:
+        """Stop background workers, tools and the thread pool."""
+        if self.config.get('queue_workers') is not None:
+            self.config['queue_workers'].stop()
+        if self.config.get('image_jobs') is not None:
+            self.config['image_jobs'].shutdown()
+        if self.config.get('tools') is not None:
+            self.config['tools'].close()
+        self.executor.shutdown(wait=False)
+
+
+def create_asgi_app(flask_app: Optional[Flask] = None) -> AsyncAPI:
+    """Wrap ``flask_app`` (default: a new :func:`backend.agent.create_app`)."""
+    if flask_app is None:
+        from .agent import create_app
+
+        flask_app = create_app()
+    return AsyncAPI(flask_app, threads=int(os.getenv('ASGI_THREADS', '32')))
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit('python -m backend.asgi needs uvicorn: pip install uvicorn')
+    uvicorn.run(create_asgi_app(), host='0.0.0.0', port=int(os.environ.get('PORT', '8000')))
@@ -11,71 +11,185 @@ from __future__ import annotations
 
 import os
 import json
-import asyncio
+import time
 from datetime import datetime
-from flask import Flask, request, jsonify
-from typing import Callable, Any, Dict, List
-
-from tools.image_generator import ImageGeneratorTool
-from tools.web_browser import WebBrowserTool
-from core.crm import CRM
+from flask import Flask, Response, request, jsonify, stream_with_context
+from typing import AsyncIterator, Awaitable, Callable, Any, Dict, Iterator, List, Optional
+
+from tools.image_jobs import ImageJobManager
+from tools.registry import ToolRegistry
+from core.ajax_ai import merge_replies, parse_agent_names, parse_delegation
+from core.blobstore import BlobStore, is_digest, is_filename
+from core.conversations import ConversationStore, valid_project
+from core.crm import CRM, BRAND_SCHEMAS
+from core.crm_import import detect_format, import_stream
+from core.knowledge_index import KnowledgeBase
+from core.llm import LLMClient
+from core.plugins import PluginError
+from core.response_cache import ResponseCache
+from core.seglog import SegmentedLog
+from core.shared_state import SharedState
+from core.task_queue import QueueWorkerPool, TaskQueue
+
+
+# Canned chat replies, answered without the model.
+CANNED_REPLIES = {
+    **dict.fromkeys(('hey', 'hi', 'hello', "what's up", 'sup'), 'Hey there! How can I help you today?'),
+    **dict.fromkeys(("what can you do", "what can you do?"),
+                    'I can help with business automation, content creation, research, task tracking and more.'),
+}
+_END = object()
+# Longest ``?wait=`` long poll on /api/image/<job_id>, in seconds.
+MAX_IMAGE_WAIT = 60.0
+
+
+def sse_event(payload: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Format ``payload`` as one Server-Sent Events message."""
+    prefix = f'event: {event}\n' if event else ''
+    return f'{prefix}data: {json.dumps(payload)}\n\n'
+
+
+def int_arg(name: str, default: Optional[int] = None) -> Optional[int]:
+    """Query parameter ``name`` as an int, or ``default`` when absent.
+
+    Raises ValueError for a value that is not an integer, unlike
+    ``request.args.get(name, type=int)`` which quietly returns None.
+    """
+    value = request.args.get(name)
+    return default if value is None else int(value)
+
+
+def wait_arg(value: Optional[str]) -> Optional[float]:
+    """Parse a ``wait`` query value, capped at ``MAX_IMAGE_WAIT``.
+
+    Returns None when absent and raises ValueError for anything but a
+    non-negative number of seconds.
+    """
+    if value is None:
+        return None
+    wait = float(value)
+    if not wait >= 0:  # also rejects nan
+        raise ValueError(f'invalid wait: {value!r}')
+    return min(wait, MAX_IMAGE_WAIT)
 
 
 def register_api_endpoints(app: Flask, require_auth: Callable) -> None:
-    """Register all API routes on the given Flask app."""
-    # Tools available to Ajax
-    tools = {
-        'web': WebBrowserTool(),
-        ImageGeneratorTool.name: ImageGeneratorTool(),
-    }
+    """Register all API routes on the given Flask app.
+
+    Services and chat helpers shared with the async server in
+    ``backend.asgi`` are exposed through ``app.config``.
+    """
+    # Tools available to Ajax.  Each is imported and constructed on
+    # first use (see /api/tools for init times), so Playwright and the
+    # OpenAI SDK cost nothing at startup and a missing API key only
+    # fails the requests that need it.
+    tools = ToolRegistry()
+    tools.register('web', 'tools.web_browser:WebBrowserTool')
+    tools.register('image', 'tools.image_generator:ImageGeneratorTool')
+    app.config['tools'] = tools
+    # Image generation runs as jobs on a persistent background event
+    # loop; the OpenAI client is created on that loop on first use.
+    image_jobs = ImageJobManager(tools.factory('image'), max_concurrency=int(os.getenv('IMAGE_CONCURRENCY', '4')))
+    app.config['image_jobs'] = image_jobs
 
     crm = CRM()
 
-    # Persistent storage for chat and tasks
+    # Runtime state shared by every worker process: the status panel,
+    # Ajax's presence flag and the recent chat context live in SQLite
+    # rather than in this closure so multi-process servers stay
+    # consistent.
+    state_db = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'memory', 'runtime_state.db')
+
+    # Chat history per project: every message goes to an append-only log
+    # under memory/conversations/<project>/ and the newest ones are kept
+    # in a ring buffer.  The legacy short-term memory (runtime_state.db,
+    # or chat_memory.json before that) is imported once.
+    conversations = ConversationStore(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'memory', 'conversations'))
+    app.config['conversations'] = conversations
+    legacy_chat = SharedState(state_db, 'chat').all()
     memory_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'memory', 'chat_memory.json')
-    os.makedirs(os.path.dirname(memory_file), exist_ok=True)
-    if os.path.exists(memory_file):
+    if not legacy_chat and os.path.exists(memory_file):
         with open(memory_file, 'r', encoding='utf-8') as f:
-            chat_memory = json.load(f)
-    else:
-        chat_memory = {}
-
-    def save_memory() -> None:
-        with open(memory_file, 'w', encoding='utf-8') as f:
-            json.dump(chat_memory, f, indent=2)
+            legacy_chat = json.load(f)
+    for project, messages in legacy_chat.items():
+        if isinstance(messages, dict):  # {"messages": [...], "instructions": ...}
+            messages = messages.get('messages')
+        conversations.import_messages(project, messages)
 
     logs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs')
     os.makedirs(logs_dir, exist_ok=True)
     queue_path = os.path.join(logs_dir, 'queue.json')
     tasklog_path = os.path.join(logs_dir, 'tasklog.json')
 
-    def load_queue() -> List[Dict[str, Any]]:
-        if os.path.exists(queue_path):
-            with open(queue_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
-
-    def save_queue(queue: List[Dict[str, Any]]) -> None:
-        with open(queue_path, 'w', encoding='utf-8') as f:
-            json.dump(queue, f, indent=2)
+    # Task history is an append-only segmented log so that logging a
+    # chat or task costs the same no matter how long the history is.
+    # The legacy tasklog.json array is imported once on first start.
+    task_log = SegmentedLog(os.path.join(logs_dir, 'tasklog'))
+    task_log.import_json_list(tasklog_path)
+    app.config['task_log'] = task_log
 
     def append_task_log(entry: Dict[str, Any]) -> None:
-        if os.path.exists(tasklog_path):
-            with open(tasklog_path, 'r', encoding='utf-8') as f:
-                log = json.load(f)
-        else:
-            log = []
-        log.append(entry)
-        with open(tasklog_path, 'w', encoding='utf-8') as f:
-            json.dump(log, f, indent=2)
-
-    # Real‑time status dictionary exposed via /api/status
-    status_info: Dict[str, Any] = {
-        'mode': 'ajax',
+        task_log.append(entry)
+
+    app.config['append_task_log'] = append_task_log
+
+    skipped = {brand: m['skipped'] for brand, m in (crm.migration or {}).items() if m['skipped']}
+    if skipped:
+        append_task_log({
+            'timestamp': datetime.now().isoformat(),
+            'task': 'crm migration',
+            'response': 'skipped records without a key (still in crm.json.migrated): '
+                        + ', '.join(f'{brand} {count}' for brand, count in skipped.items()),
+        })
+
+    # Durable task queue drained by a pool of worker threads.  Tasks
+    # naming an agent are delegated to it; anything else is handled by
+    # Ajax itself.  The legacy queue.json is imported once.
+    task_queue = TaskQueue(os.path.join(logs_dir, 'queue.db'))
+    task_queue.migrate_json(queue_path)
+    app.config['task_queue'] = task_queue
+
+    def run_queued_task(task: Dict[str, Any]) -> str:
+        ajax_agent = app.config['ajax_agent']
+        names = parse_agent_names(task['agent'] or '')
+        if len(names) > 1:
+            results = ajax_agent.delegate_many(names, task['task'])
+            if all(r.status != 'ok' for r in results):
+                raise RuntimeError(merge_replies(results))
+            return merge_replies(results)
+        if names:
+            return ajax_agent.delegate(names[0], task['task'])
+        return ajax_agent.handle_task(task['task'])
+
+    def log_queued_task(task: Dict[str, Any]) -> None:
+        if task['status'] in ('done', 'failed'):
+            append_task_log({
+                'timestamp': task['finished_at'],
+                'task': task['task'],
+                'response': task['result'] if task['status'] == 'done' else f"failed: {task['error']}",
+            })
+
+    queue_workers = QueueWorkerPool(
+        task_queue,
+        run_queued_task,
+        workers=int(os.getenv('QUEUE_WORKERS', '2')),
+        on_finish=log_queued_task,
+    ).start()
+    app.config['queue_workers'] = queue_workers
+
+    # Real‑time status exposed via /api/status
+    status_info = SharedState(state_db, 'status', defaults={
+        'mode': 'ajax' if app.config['ajax_agent'].is_logan_present else 'logan',
         'current_task': '',
         'history': [],
         'live_status': 'idle',
-    }
+    })
+    app.config['status_info'] = status_info
+    # Image jobs run in the worker that accepted them; their states are
+    # mirrored here so a poll answered by another worker finds them.
+    image_jobs.attach_store(SharedState(state_db, 'image_jobs'))
+    app.config['ajax_agent'].attach_state(SharedState(state_db, 'agent'))
 
     # Directory for storing project metadata and files.  Projects live
     # under the memory folder to group related uploads, chat history
@@ -84,6 +198,110 @@ def register_api_endpoints(app: Flask, require_auth: Callable) -> None:
     # registered via the /api/projects POST endpoint.
     projects_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'memory')
 
+    # BM25 index over each agent's training files in core/knowledge/.
+    # Uploads are ingested incrementally on a background thread; on
+    # start every agent folder is checked for changes made while the
+    # server was down.
+    knowledge_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core', 'knowledge')
+    knowledge = KnowledgeBase(knowledge_root)
+    app.config['knowledge'] = knowledge
+    app.config['ajax_agent'].attach_knowledge(knowledge)
+
+    # Ajax and its sub-agents share one pooled model client when
+    # OPENAI_API_KEY or OPENAI_BASE_URL is set; otherwise they keep
+    # their offline replies.
+    llm = LLMClient.from_env()
+    app.config['llm'] = llm
+    if llm is not None:
+        app.config['ajax_agent'].attach_llm(llm)
+
+    # Replies to repeated prompts and /delegate tasks are cached in
+    # memory and in SQLite; an agent's entries are dropped as soon as a
+    # sync sees its training files change.
+    response_cache = ResponseCache(
+        os.path.join(projects_dir, 'response_cache.db'),
+        ttl=float(os.getenv('RESPONSE_CACHE_TTL', str(24 * 60 * 60))),
+    )
+    app.config['response_cache'] = response_cache
+    app.config['ajax_agent'].attach_cache(response_cache)
+    knowledge.on_change(response_cache.invalidate)
+    knowledge.schedule()
+
+    # Uploads are stored once per distinct content and hard-linked into
+    # memory/<project>/uploads and core/knowledge/<agent>/.
+    blobs = BlobStore(os.path.join(projects_dir, 'blobs'))
+    app.config['blobs'] = blobs
+
+    def save_uploads(view_dir: str) -> Any:
+        """Store the multipart ``file`` fields of the request, or the
+        ``{"files": [{"name", "sha256"}]}`` references of a JSON body,
+        under ``view_dir``.  Returns ``{name: sha256}`` or an error
+        response.  Every name and reference is checked before anything
+        is linked, so a bad entry leaves ``view_dir`` untouched."""
+        saved: Dict[str, str] = {}
+        uploads = request.files.getlist('file')
+        if uploads:
+            names = [os.path.basename(f.filename or '') for f in uploads]
+            bad = [name for name in names if not is_filename(name)]
+            if bad:
+                return jsonify({'error': f'invalid file name: {bad[0]!r}'}), 400
+            try:
+                for name, f in zip(names, uploads):
+                    saved[name] = blobs.store(f.stream, view_dir, name)[0]
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            return saved
+        body = request.get_json(silent=True)
+        refs = (body.get('files') if isinstance(body, dict) else None) or []
+        if not refs:
+            return jsonify({'error': 'no file provided'}), 400
+        if not isinstance(refs, list) or not all(isinstance(r, dict) for r in refs):
+            return jsonify({'error': 'files must be a list of {"name", "sha256"} objects'}), 400
+        wanted = {os.path.basename(str(r.get('name') or '')): str(r.get('sha256') or '') for r in refs}
+        invalid = [name for name in wanted if not is_filename(name)] + \
+                  [digest for digest in wanted.values() if not is_digest(digest)]
+        if invalid:
+            return jsonify({'error': 'invalid file reference', 'invalid': invalid}), 400
+        missing = sorted(set(wanted.values()) - set(blobs.have(wanted.values())))
+        if missing:
+            return jsonify({'error': 'unknown content, upload these files', 'missing': missing}), 404
+        try:
+            for name, digest in wanted.items():
+                blobs.link(digest, view_dir, name)
+        except (KeyError, ValueError) as e:
+            return jsonify({'error': f'cannot link {e}'}), 400
+        return wanted
+
+    @app.route('/api/blobs/check', methods=['POST'])
+    @require_auth
+    def api_blobs_check() -> Any:
+        """Tell a client which files it does not need to send.
+
+        Expects ``{"sha256": [hex digests]}`` and answers with the
+        digests already stored (``have``) and the ones to upload
+        (``missing``).  Stored content is then attached to a project or
+        agent by posting ``{"files": [{"name", "sha256"}]}`` to
+        ``/api/upload`` or ``/api/agents/<name>/train``.
+        """
+        digests = [str(d).lower() for d in (request.get_json(silent=True) or {}).get('sha256') or []]
+        have = blobs.have(digests)
+        stored = set(have)
+        return jsonify({'have': have, 'missing': [d for d in dict.fromkeys(digests) if d not in stored]})
+
+    @app.route('/api/blobs/<string:digest>', methods=['GET'])
+    @require_auth
+    def api_blob(digest: str) -> Any:
+        """Size and views of stored content; 404 if it is unknown.
+        ``HEAD`` gives a body-less "already have it" check."""
+        digest = digest.lower()
+        if not is_digest(digest) or not blobs.have([digest]):
+            return jsonify({'error': 'not found'}), 404
+        return jsonify({
+            'sha256': digest,
+            'size': os.path.getsize(blobs.path(digest)),
+            'views': [{'view': view, 'name': name} for view, name in blobs.views(digest)],
+        })
+
     @app.route('/api/agent/run', methods=['POST'])
     @require_auth
     def api_agent_run() -> Any:
@@ -92,7 +310,10 @@ def register_api_endpoints(app: Flask, require_auth: Callable) -> None:
         action = (data.get('action') or '').strip()
         payload = data.get('input')
         ajax_agent = app.config['ajax_agent']
-        agent = ajax_agent.agent_registry.get(agent_name)
+        try:
+            agent = ajax_agent.agent_registry.get(agent_name)
+        except PluginError as e:
+            return jsonify({'error': str(e)}), 500
         if not agent:
             return jsonify({'error': 'unknown agent'}), 400
         try:
@@ -106,69 +327,197 @@ def register_api_endpoints(app: Flask, require_auth: Callable) -> None:
     @app.route('/api/crm/<string:brand>', methods=['GET', 'POST'])
     @require_auth
     def api_crm(brand: str) -> Any:
+        """List or add CRM records for a brand.
+
+        * GET: returns ``{collection: [records]}`` for one page of
+          records.  ``cursor`` and ``limit`` page through the brand and
+          any other query parameter matching a schema field (e.g.
+          ``plan=pro``) filters on it.  The cursor for the next page is
+          sent in the ``X-Next-Cursor`` header.
+        * POST: upserts a record keyed by the brand's natural key
+          (email, contact or account) so duplicates are merged.
+        """
+        schema = BRAND_SCHEMAS.get(brand)
+        if schema is None:
+            return jsonify({'error': 'unknown brand'}), 400
         if request.method == 'GET':
-            return jsonify(crm.get_brand(brand))
+            try:
+                cursor = int_arg('cursor')
+                limit = min(int_arg('limit', 100), 1000)
+            except ValueError:
+                return jsonify({'error': 'invalid paging parameters'}), 400
+            filters = {k: v for k, v in request.args.items() if k in schema['fields']}
+            records, next_cursor = crm.list(brand, cursor=cursor, limit=limit, filters=filters)
+            response = jsonify({schema['collection']: records})
+            if next_cursor is not None:
+                response.headers['X-Next-Cursor'] = str(next_cursor)
+            return response
         data = request.get_json(force=True)
-        if brand == 'remote100k':
-            crm.add_remote100k_sub(
-                data.get('email', ''),
-                data.get('plan', ''),
-                data.get('entry_point', ''),
-            )
-        elif brand == 'tradeview_ai':
-            crm.add_tradeview_demo(
-                data.get('timestamp', ''),
-                data.get('contact', ''),
-            )
-        elif brand == 'app_304':
-            crm.add_tiktok_lead(
-                data.get('name', ''),
-                data.get('account', ''),
-                data.get('source', ''),
-            )
-        else:
-            return jsonify({'error': 'unknown brand'}), 400
-        return jsonify({'status': 'ok'})
+        try:
+            created = crm.upsert(brand, data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'status': 'ok', 'created': created})
 
-    # Handle chat messages with presence, slash commands and memory
-    def process_chat_message(message: str, ajax_agent) -> str:
+    @app.route('/api/crm/<string:brand>/import', methods=['POST'])
+    @require_auth
+    def api_crm_import(brand: str) -> Any:
+        """Bulk import CRM records from a CSV or JSON Lines export.
+
+        The export may be sent as a multipart ``file`` field or as the
+        raw request body.  ``format`` (csv or jsonl) overrides detection
+        from the filename or content type.  Rows are validated and
+        committed in batches while the upload is read, and the response
+        reports accepted/rejected counts and throughput.
+        """
+        if brand not in BRAND_SCHEMAS:
+            return jsonify({'error': 'unknown brand'}), 400
+        upload = request.files.get('file')
+        stream = upload.stream if upload else request.stream
+        fmt = request.args.get('format') or detect_format(
+            upload.filename if upload else None,
+            upload.content_type if upload else request.content_type,
+        )
+        try:
+            batch_size = max(1, int(request.args.get('batch_size', 1000)))
+            report = import_stream(crm, brand, stream, fmt, batch_size)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        append_task_log({
+            'timestamp': datetime.now().isoformat(),
+            'task': f'crm import {brand}',
+            'response': f'{report.accepted} accepted, {report.rejected} rejected',
+        })
+        return jsonify(report.to_dict())
+
+    # Handle chat messages with presence, slash commands and memory.
+    # Replies are produced as a stream of chunks; process_chat_message
+    # joins them for the non-streaming endpoint.
+    def stream_chat_message(message: str, ajax_agent, project: str = 'general') -> Iterator[str]:
         lowered = message.strip().lower()
         # Slash commands for presence
         if lowered.startswith('/loganin'):
             ajax_agent.is_logan_present = True
-            status_info['mode'] = 'ajax'
-            return "Logan is present. Switching to assistant mode."
+            status_info.set('mode', 'ajax')
+            yield "Logan is present. Switching to assistant mode."
+            return
         if lowered.startswith('/loganout'):
             ajax_agent.is_logan_present = False
-            status_info['mode'] = 'logan'
-            return "Logan is away. Speaking on his behalf."
-        # Delegate command
+            status_info.set('mode', 'logan')
+            yield "Logan is away. Speaking on his behalf."
+            return
+        # Delegate command; "/delegate growth+investor <task>" fans the
+        # task out to several agents and streams each reply as it lands.
         if lowered.startswith('/delegate'):
-            parts = message.split(None, 2)
-            if len(parts) < 3:
-                return 'Usage: /delegate <agent> <task>'
-            _, agent_name, task = parts
+            parsed = parse_delegation(message.strip()[len('/delegate'):])
+            if parsed is None:
+                yield 'Usage: /delegate <agent>[+<agent>…] <task>'
+                return
+            names, task = parsed
+            status_info.set_many(current_task=task, live_status='working')
+            if len(names) > 1:
+                sections: List[str] = []
+                try:
+                    for result in ajax_agent.iter_delegations(names, task):
+                        section = result.section()
+                        yield section if not sections else '\n\n' + section
+                        sections.append(section)
+                except KeyError as e:
+                    yield f'Delegation error: {e}'
+                    return
+                finally:
+                    status_info.set('live_status', 'idle')
+                status_info.push('history', '\n\n'.join(sections), keep=5)
+                return
+            agent_name = names[0]
+            chunks: List[str] = []
             try:
-                status_info['current_task'] = task
-                status_info['live_status'] = 'working'
-                result = ajax_agent.delegate(agent_name, task)
-                status_info['live_status'] = 'idle'
-                status_info['history'].append(result)
-                status_info['history'] = status_info['history'][-5:]
-                return result
+                for chunk in ajax_agent.delegate_stream(agent_name, task):
+                    chunks.append(chunk)
+                    yield chunk
             except Exception as e:
-                status_info['live_status'] = 'idle'
-                return f'Delegation error: {e}'
+                status_info.set('live_status', 'idle')
+                if chunks:
+                    # Part of the reply is out; let the caller report
+                    # the failure rather than end as if complete.
+                    raise
+                yield f'Delegation error: {e}'
+                return
+            status_info.set('live_status', 'idle')
+            status_info.push('history', ''.join(chunks), keep=5)
+            return
         # Greetings and basic queries
-        if lowered in {'hey', 'hi', 'hello', "what's up", 'sup'}:
-            return 'Hey there! How can I help you today?'
-        if lowered in {"what can you do", "what can you do?"}:
-            return 'I can help with business automation, content creation, research, task tracking and more.'
+        if lowered in CANNED_REPLIES:
+            yield CANNED_REPLIES[lowered]
+            return
         if lowered.startswith('log a task'):
-            return 'Sure! Please provide the task details so I can log it.'
-        # Normal conversation: generate response and remember last 10 messages
-        ajax_agent_response = ajax_agent.generate_response(message)
-        return ajax_agent_response
+            yield 'Sure! Please provide the task details so I can log it.'
+            return
+        # Normal conversation: reply with the project's recent messages
+        # as context.
+        yield from ajax_agent.stream_response(message, conversations.context(project))
+
+    async def astream_chat_message(
+        message: str, ajax_agent, blocking: Callable[..., Awaitable[Any]], project: str = 'general',
+    ) -> AsyncIterator[str]:
+        """Async counterpart of stream_chat_message for backend.asgi.
+
+        Normal conversation and single-agent ``/delegate`` replies are
+        awaited on the event loop (the model client's ``astream``), with
+        only the status writes sent to ``blocking`` (the server's thread
+        pool).  Presence commands, canned replies and fan-out delegation
+        are short or already run on their own pool; they reuse
+        stream_chat_message on ``blocking``.
+        """
+        lowered = message.strip().lower()
+        parsed = parse_delegation(message.strip()[len('/delegate'):]) if lowered.startswith('/delegate') else None
+        if parsed is not None and len(parsed[0]) == 1:
+            (agent_name,), task = parsed
+            await blocking(lambda: status_info.set_many(current_task=task, live_status='working'))
+            chunks: List[str] = []
+            try:
+                async for chunk in ajax_agent.adelegate_stream(agent_name, task):
+                    chunks.append(chunk)
+                    yield chunk
+            except Exception as e:
+                await blocking(status_info.set, 'live_status', 'idle')
+                if chunks:
+                    raise  # see stream_chat_message
+                yield f'Delegation error: {e}'
+                return
+            await blocking(status_info.set, 'live_status', 'idle')
+            await blocking(lambda: status_info.push('history', ''.join(chunks), keep=5))
+            return
+        if lowered.startswith(('/loganin', '/loganout', '/delegate', 'log a task')) or lowered in CANNED_REPLIES:
+            replies = stream_chat_message(message, ajax_agent, project)
+            while True:
+                chunk = await blocking(next, replies, _END)
+                if chunk is _END:
+                    return
+                yield chunk
+        context = await blocking(conversations.context, project)
+        async for chunk in ajax_agent.astream_response(message, context):
+            yield chunk
+
+    def process_chat_message(message: str, ajax_agent, project: str = 'general') -> str:
+        return ''.join(stream_chat_message(message, ajax_agent, project))
+
+    def record_chat(message: str, reply: str, project: str = 'general') -> str:
+        """Persist a finished exchange and return its timestamp."""
+        timestamp = datetime.now().isoformat()
+        conversations.extend(project, [
+            {'role': 'user', 'content': message, 'timestamp': timestamp},
+            {'role': 'assistant', 'content': reply, 'timestamp': timestamp},
+        ])
+        # Log conversation in tasklog
+        append_task_log({'timestamp': timestamp, 'task': message, 'response': reply})
+        status_info.push('history', reply, keep=5)
+        status_info.set('current_task', message)
+        return timestamp
+
+    app.config['stream_chat_message'] = stream_chat_message
+    app.config['astream_chat_message'] = astream_chat_message
+    app.config['record_chat'] = record_chat
 
     @app.route('/api/loganin', methods=['POST'])
     @require_auth
@@ -182,7 +531,7 @@ def register_api_endpoints(app: Flask, require_auth: Callable) -> None:
         """
         ajax_agent = app.config['ajax_agent']
         ajax_agent.is_logan_present = True
-        status_info['mode'] = 'ajax'
+        status_info.set('mode', 'ajax')
         return jsonify({'message': 'Logan is present. Switching to assistant mode.'})
 
     @app.route('/api/loganout', methods=['POST'])
@@ -196,7 +545,7 @@ def register_api_endpoints(app: Flask, require_auth: Callable) -> None:
         """
         ajax_agent = app.config['ajax_agent']
         ajax_agent.is_logan_present = False
-        status_info['mode'] = 'logan'
+        status_info.set('mode', 'logan')
         return jsonify({'message': 'Logan is away. Speaking on his behalf.'})
 
     @app.route('/api/projects', methods=['GET', 'POST'])
@@ -252,13 +601,13 @@ def register_api_endpoints(app: Flask, require_auth: Callable) -> None:
 
         * GET: returns a list of agent names currently registered
           with the Ajax agent.  These are keys from the agent
-          registry.
+          registry; listing them does not import any agent.
         * POST: accepts JSON payload with `name`, `role` and
           `base_behavior`.  Creates a folder under core/agents with
-          a config.json and an empty training.md.  The agent is not
-          auto‑registered; this endpoint simply scaffolds the
-          directories so that administrators can later supply
-          training materials.
+          a config.json and an empty training.md.  The plugin
+          registry picks the folder up at once; the agent is loaded
+          on its first task and reloaded whenever its config,
+          training.md or an agent.py placed there changes.
         """
         ajax_agent = app.config['ajax_agent']
         if request.method == 'GET':
@@ -291,124 +640,329 @@ def register_api_endpoints(app: Flask, require_auth: Callable) -> None:
             if not os.path.exists(training_path):
                 with open(training_path, 'w', encoding='utf-8') as f:
                     f.write('')
+            ajax_agent.agent_registry.refresh()
             return jsonify({'name': name, 'role': role, 'base_behavior': base_behavior})
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/api/plugins', methods=['GET'])
+    @require_auth
+    def api_plugins() -> Any:
+        """Return every agent plugin with its source (builtin, config,
+        entry_point, instance), whether it is loaded, load count and
+        time, and the last load error."""
+        return jsonify(app.config['ajax_agent'].agent_registry.describe())
+
     @app.route('/api/agents/<string:name>/train', methods=['POST'])
     @require_auth
     def api_agent_train(name: str) -> Any:
         """Upload training files for a given sub‑agent.
 
-        Files submitted here are stored under core/knowledge/{name}/.
-        The endpoint responds with the list of saved filenames and
-        logs a message indicating that the training file was
-        received.  No parsing or embedding is performed server‑side.
+        Files submitted here are stored under core/knowledge/{name}/
+        and indexed for search in the background.  Like ``/api/upload``
+        this also accepts a JSON body referring to content already in
+        the blob store.  The endpoint responds with the list of saved
+        filenames and logs a message indicating that the training file
+        was received.
         """
-        files = request.files.getlist('file')
-        if not files:
-            return jsonify({'error': 'no file provided'}), 400
         # Normalise agent name to match directory name
         agent_key = name.lower().replace(' ', '_')
         knowledge_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core', 'knowledge', agent_key)
-        os.makedirs(knowledge_dir, exist_ok=True)
-        saved = []
-        for f in files:
-            filename = f.filename
-            f.save(os.path.join(knowledge_dir, filename))
-            saved.append(filename)
+        stored = save_uploads(knowledge_dir)
+        if not isinstance(stored, dict):
+            return stored
+        saved = list(stored)
         # Log the upload in status history
         msg = f"Training file received: {', '.join(saved)}"
-        status_info['history'].append(msg)
-        status_info['history'] = status_info['history'][-5:]
-        return jsonify({'files': saved, 'message': msg})
+        status_info.push('history', msg, keep=5)
+        knowledge.schedule(agent_key)
+        return jsonify({'files': saved, 'message': msg, 'sha256': stored})
+
+    @app.route('/api/agents/<string:name>/knowledge', methods=['GET'])
+    @require_auth
+    def api_agent_knowledge(name: str) -> Any:
+        """Search a sub‑agent's training files.
+
+        ``q`` is the query and ``k`` (default 5, max 50) the number of
+        passages to return, best BM25 score first.
+        """
+        query = (request.args.get('q') or '').strip()
+        if not query:
+            return jsonify({'error': 'q parameter required'}), 400
+        try:
+            k = min(max(int_arg('k', 5), 1), 50)
+        except ValueError:
+            return jsonify({'error': 'k must be an integer'}), 400
+        agent_key = name.lower().replace(' ', '_')
+        start = time.perf_counter()
+        results = knowledge.search(agent_key, query, k)
+        return jsonify({
+            'results': results,
+            'took_ms': round((time.perf_counter() - start) * 1000, 3),
+            'index': knowledge.index(agent_key).stats(),
+        })
 
     @app.route('/api/chat', methods=['POST'])
     @require_auth
     def api_chat():
+        """Answer a chat message.  ``project`` (default ``general``)
+        selects the conversation the exchange is recorded in."""
         data = request.get_json(force=True)
         message = (data.get('message') or '').strip()
         if not message:
             return jsonify({'error': 'Empty message'}), 400
+        project = data.get('project') or 'general'
+        if not valid_project(project):
+            return jsonify({'error': 'invalid project'}), 400
         ajax_agent = app.config['ajax_agent']
-        reply = process_chat_message(message, ajax_agent)
-        timestamp = datetime.now().isoformat()
-        # Append to conversation memory per project (single project for now)
-        conversation = chat_memory.get('general', [])
-        conversation.append({'role': 'user', 'content': message, 'timestamp': timestamp})
-        conversation.append({'role': 'assistant', 'content': reply, 'timestamp': timestamp})
-        # Keep only the last 10 messages in memory for brevity
-        chat_memory['general'] = conversation[-10:]
-        save_memory()
-        # Log conversation in tasklog
-        append_task_log({'timestamp': timestamp, 'task': message, 'response': reply})
-        status_info['history'].append(reply)
-        status_info['history'] = status_info['history'][-5:]
-        status_info['current_task'] = message
+        reply = process_chat_message(message, ajax_agent, project)
+        timestamp = record_chat(message, reply, project)
         return jsonify({'response': reply, 'timestamp': timestamp})
 
+    @app.route('/api/chat/history', methods=['GET'])
+    @require_auth
+    def api_chat_history():
+        """Return a page of a project's conversation.
+
+        ``project`` defaults to ``general``.  Paging works like
+        ``/api/logs``: the newest ``limit`` messages by default,
+        ``before=<seq>`` to go further back and ``after=<seq>`` to
+        follow new ones, with the next cursor in ``X-Next-Cursor``.
+        """
+        project = request.args.get('project') or 'general'
+        if not valid_project(project):
+            return jsonify({'error': 'invalid project'}), 400
+        try:
+            limit = min(int_arg('limit', 100), 1000)
+            before = int_arg('before')
+            after = int_arg('after')
+        except ValueError:
+            return jsonify({'error': 'invalid paging parameters'}), 400
+        messages, cursor = conversations.history(project, before=before, after=after, limit=limit)
+        response = jsonify(messages)
+        if cursor is not None:
+            response.headers['X-Next-Cursor'] = str(cursor)
+        return response
+
+    @app.route('/api/chat/stream', methods=['GET', 'POST'])
+    @require_auth
+    def api_chat_stream():
+        """Stream a chat reply as Server-Sent Events.
+
+        Accepts the message and optional ``project`` as JSON (POST) or
+        as query parameters (GET, for ``EventSource``).  Each chunk is sent as a
+        ``data: {"delta": ...}`` event as soon as it is produced and a
+        final ``done`` event carries the full response and timestamp.
+        Memory and the task log are written once the stream completes.
+        """
+        if request.method == 'POST':
+            data = request.get_json(force=True)
+        else:
+            data = request.args
+        message = (data.get('message') or '').strip()
+        if not message:
+            return jsonify({'error': 'Empty message'}), 400
+        project = data.get('project') or 'general'
+        if not valid_project(project):
+            return jsonify({'error': 'invalid project'}), 400
+        ajax_agent = app.config['ajax_agent']
+
+        def generate() -> Iterator[str]:
+            chunks: List[str] = []
+            try:
+                for chunk in stream_chat_message(message, ajax_agent, project):
+                    chunks.append(chunk)
+                    yield sse_event({'delta': chunk})
+            except Exception as e:
+                yield sse_event({'error': str(e)}, 'error')
+                return
+            reply = ''.join(chunks)
+            timestamp = record_chat(message, reply, project)
+            yield sse_event({'response': reply, 'timestamp': timestamp}, 'done')
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+
     @app.route('/api/image', methods=['POST'])
     @require_auth
     def api_image():
+        """Submit an image generation job.
+
+        With ``"async": true`` the job is returned straight away (202)
+        and can be polled via ``/api/image/<job_id>``.  Otherwise the
+        request waits up to ``timeout`` seconds (default 60) and returns
+        ``{'url': ..., 'job_id': ...}`` as before.  Repeated prompts are
+        served from the result cache.
+        """
         data = request.get_json(force=True)
         prompt = (data.get('prompt') or '').strip()
         if not prompt:
             return jsonify({'error': 'Empty prompt'}), 400
+        job = image_jobs.submit(prompt, data.get('size') or '1024x1024')
+        if data.get('async'):
+            return jsonify(job), 202
         try:
-            status_info['live_status'] = 'working'
-            url = asyncio.run(tools[ImageGeneratorTool.name].run({'prompt': prompt}))
-            status_info['live_status'] = 'idle'
-            status_info['history'].append(f'Generated image: {url}')
-            status_info['history'] = status_info['history'][-5:]
-            return jsonify({'url': url})
+            timeout = float(data.get('timeout', 60))
+        except (TypeError, ValueError):
+            timeout = 60.0
+        status_info.set('live_status', 'working')
+        job_id = job['id']
+        job = image_jobs.wait(job_id, timeout)
+        status_info.set('live_status', 'idle')
+        if job is None:
+            # Evicted by newer jobs while waiting.
+            return jsonify({'error': 'unknown job', 'job_id': job_id}), 404
+        if job['status'] == 'failed':
+            return jsonify({'error': job['error'], 'job_id': job['id']}), 500
+        if job['status'] != 'done':
+            return jsonify(job), 202
+        status_info.push('history', f"Generated image: {job['url']}", keep=5)
+        return jsonify({'url': job['url'], 'job_id': job['id'], 'cached': job['cached']})
+
+    @app.route('/api/image/<string:job_id>', methods=['GET'])
+    @require_auth
+    def api_image_job(job_id: str):
+        """Return an image job.  ``wait=<seconds>`` long-polls until the
+        job completes or the wait elapses."""
+        try:
+            wait = wait_arg(request.args.get('wait'))
+        except ValueError:
+            return jsonify({'error': 'wait must be a number of seconds'}), 400
+        job = image_jobs.wait(job_id, wait) if wait else image_jobs.get(job_id)
+        if job is None:
+            return jsonify({'error': 'unknown job'}), 404
+        return jsonify(job)
+
+    @app.route('/api/web', methods=['POST'])
+    @require_auth
+    def api_web():
+        """Fetch a page with the pooled browser.
+
+        Accepts ``{'url': ...}`` or ``{'query': ...}`` plus the optional
+        ``fresh`` and ``timeout`` tool parameters and returns the page
+        title and text.
+        """
+        data = request.get_json(force=True)
+        if not (data.get('url') or data.get('query')):
+            return jsonify({'error': 'Empty query'}), 400
+        try:
+            result = tools['web'].run(data)
         except Exception as e:
-            status_info['live_status'] = 'idle'
-            return jsonify({'error': str(e)}), 500
+            return jsonify({'error': str(e)}), 502
+        return jsonify(result)
+
+    @app.route('/api/logs', methods=['GET'])
+    @require_auth
+    def api_logs():
+        """Return a page of the task history.
+
+        By default the newest ``limit`` entries are returned in
+        chronological order.  Pass ``before=<seq>`` to page further back
+        or ``after=<seq>`` to follow new entries.  The cursor for the
+        next page is sent in the ``X-Next-Cursor`` header so the body
+        stays a plain array for the dashboard.
+        """
+        try:
+            limit = min(int_arg('limit', 100), 1000)
+            before = int_arg('before')
+            after = int_arg('after')
+        except ValueError:
+            return jsonify({'error': 'invalid paging parameters'}), 400
+        entries, cursor = task_log.page(before=before, after=after, limit=limit)
+        response = jsonify(entries)
+        if cursor is not None:
+            response.headers['X-Next-Cursor'] = str(cursor)
+        return response
 
     @app.route('/api/queue', methods=['GET'])
     @require_auth
     def api_queue():
-        return jsonify(load_queue())
+        """Return the newest queued tasks, optionally filtered by
+        ``status`` and capped by ``limit``."""
+        try:
+            limit = min(int_arg('limit', 100), 1000)
+        except ValueError:
+            return jsonify({'error': 'invalid paging parameters'}), 400
+        return jsonify(task_queue.list(status=request.args.get('status'), limit=limit))
+
+    @app.route('/api/queue/stats', methods=['GET'])
+    @require_auth
+    def api_queue_stats():
+        """Return queue depth per status, throughput and latency."""
+        stats = task_queue.stats()
+        stats['workers'] = queue_workers.workers
+        return jsonify(stats)
+
+    @app.route('/api/cache/stats', methods=['GET'])
+    @require_auth
+    def api_cache_stats():
+        """Return hit/miss counts of the response cache per tier."""
+        return jsonify(response_cache.stats())
+
+    @app.route('/api/llm/stats', methods=['GET'])
+    @require_auth
+    def api_llm_stats():
+        """Return request, retry and connection counts of the model client."""
+        if llm is None:
+            return jsonify({'configured': False})
+        return jsonify(dict(llm.stats(), configured=True))
+
+    @app.route('/api/tools', methods=['GET'])
+    @require_auth
+    def api_tools():
+        """Return each tool's load state, init time and last init error."""
+        return jsonify(tools.stats())
 
     @app.route('/api/task', methods=['POST'])
     @require_auth
     def api_task():
-        """Log a new task into the queue."""
+        """Add a new task to the queue.
+
+        Accepts ``task`` plus optional ``priority`` (high, normal, low)
+        and ``agent``.  The worker pool delegates the task to that agent
+        (several joined with ``+`` run in parallel and their replies are
+        merged), or to Ajax when none is given.
+        """
         data = request.get_json(force=True)
         task = (data.get('task') or '').strip()
         if not task:
             return jsonify({'error': 'Empty task'}), 400
-        queue = load_queue()
-        entry = {
-            'id': len(queue) + 1,
-            'task': task,
-            'timestamp': datetime.now().isoformat(),
-            'status': 'pending',
-        }
-        queue.append(entry)
-        save_queue(queue)
+        agent = '+'.join(parse_agent_names(data.get('agent') or '')) or None
+        ajax_agent = app.config['ajax_agent']
+        if agent and any(name not in ajax_agent.agent_registry for name in agent.split('+')):
+            return jsonify({'error': 'unknown agent'}), 400
+        try:
+            entry = task_queue.enqueue(task, priority=data.get('priority') or 'normal', agent=agent)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         append_task_log({'timestamp': entry['timestamp'], 'task': task, 'response': 'queued'})
         return jsonify(entry)
 
     @app.route('/api/upload', methods=['POST'])
     @require_auth
     def api_upload():
-        files = request.files.getlist('file')
-        if not files:
-            return jsonify({'error': 'no file provided'}), 400
-        saved = []
-        project = request.form.get('project', 'general')
-        target = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'memory', project, 'uploads')
-        os.makedirs(target, exist_ok=True)
-        for f in files:
-            name = f.filename
-            f.save(os.path.join(target, name))
-            saved.append(name)
-        status_info['history'].append(f'Uploaded files: {", ".join(saved)}')
-        status_info['history'] = status_info['history'][-5:]
-        return jsonify({'files': saved})
+        """Store uploads for a project under memory/<project>/uploads.
+
+        Accepts multipart ``file`` fields (and a ``project`` form
+        field), or a JSON body ``{"project", "files": [{"name",
+        "sha256"}]}`` referring to content already stored; see
+        ``/api/blobs/check``.
+        """
+        body = request.get_json(silent=True)
+        body = body if isinstance(body, dict) else {}
+        project = os.path.basename(request.form.get('project') or body.get('project') or 'general')
+        target = os.path.join(projects_dir, project, 'uploads')
+        stored = save_uploads(target)
+        if not isinstance(stored, dict):
+            return stored
+        saved = list(stored)
+        status_info.push('history', f'Uploaded files: {", ".join(saved)}', keep=5)
+        return jsonify({'files': saved, 'sha256': stored})
 
     @app.route('/api/status', methods=['GET'])
     @require_auth
     def api_status():
-        return jsonify(status_info)
+        return jsonify(status_info.all())
@@ -0,0 +1,245 @@
+"""
+Static asset serving for the compiled frontend.
+
+``serve_frontend`` used to stat the requested path and hand it to
+``send_from_directory`` on every request, with no compression and no
+long-lived caching.  ``StaticAssets`` builds a manifest of
+``frontend/dist`` once at startup instead:
+
+* every file gets a strong ETag derived from its content;
+* text assets are compressed once (gzip, plus brotli when the
+  ``brotli`` package is installed) and the variant matching the
+  request's ``Accept-Encoding`` is served.  ``.gz``/``.br`` files
+  produced by the frontend build are used as-is;
+* content-hashed build output such as ``assets/index-D0ail4gG.js`` (a
+  file in Vite's ``assets/`` directory ending in an 8 character hash)
+  is served with ``Cache-Control: immutable`` and a one year max-age,
+  while ``index.html``, icons and other files copied from ``public/``
+  are revalidated by ETag;
+* ``If-None-Match`` is answered with ``304 Not Modified``;
+* files up to ``max_memory_size`` bytes are kept in memory.
+
+Files added to the directory after startup are picked up on first
+request; call :meth:`StaticAssets.reload` after rebuilding the frontend
+in place.  ``python -m backend.static_assets [dist]`` writes the
+compressed variants next to the files so startup does not have to.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from flask import Response, request
+from werkzeug.security import safe_join
+from werkzeug.wsgi import wrap_file
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# Vite writes build output to ``assets/<name>-<8 char hash>.<ext>``.
+HASHED_DIR = 'assets/'
+HASHED_NAME = re.compile(r'-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$')
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml', 'application/xml')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+# Encodings in order of preference and their precompressed file suffix.
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+
+@dataclass
+class Asset:
+    """One file of the manifest and its encoded variants."""
+
+    path: str
+    content_type: str
+    etag: str
+    size: int
+    immutable: bool
+    data: Optional[bytes] = None
+    variants: Dict[str, bytes] = field(default_factory=dict)
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Return ``{coding: q}`` for an ``Accept-Encoding`` header."""
+    accepted: Dict[str, float] = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def is_hashed(rel: str) -> bool:
+    """Whether ``rel`` is content-hashed build output that never changes."""
+    return rel.startswith(HASHED_DIR) and '/' not in rel[len(HASHED_DIR):] and bool(HASHED_NAME.search(rel))
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class StaticAssets:
+    """Manifest-backed server for a directory of built frontend files."""
+
+    def __init__(
+        self,
+        root: str,
+        max_memory_size: int = 256 * 1024,
+        max_compress_size: int = 8 * 1024 * 1024,
+        min_compress_size: int = 512,
+    ) -> None:
+        self.root = os.path.abspath(root)
+        self.max_memory_size = max_memory_size
+        self.max_compress_size = max_compress_size
+        self.min_compress_size = min_compress_size
+        self._lock = threading.Lock()
+        self.manifest: Dict[str, Asset] = {}
+        self.reload()
+
+    def reload(self) -> None:
+        """Rebuild the manifest from the files on disk."""
+        manifest: Dict[str, Asset] = {}
+        if os.path.isdir(self.root):
+            for dirpath, _, filenames in os.walk(self.root):
+                for name in filenames:
+                    rel = os.path.relpath(os.path.join(dirpath, name), self.root).replace(os.sep, '/')
+                    base, ext = os.path.splitext(name)
+                    if ext in ENCODINGS.values() and base in filenames:
+                        continue  # precompressed sibling of another file
+                    asset = self._build(rel)
+                    if asset is not None:
+                        manifest[rel] = asset
+        with self._lock:
+            self.manifest = manifest
+
+    def _build(self, rel: str) -> Optional[Asset]:
+        path = os.path.join(self.root, rel)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        content_type = mimetypes.guess_type(rel)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+        asset = Asset(
+            path=path,
+            content_type=content_type,
+            etag=hashlib.blake2b(data, digest_size=12).hexdigest(),
+            size=len(data),
+            immutable=is_hashed(rel),
+            data=data if len(data) <= self.max_memory_size else None,
+        )
+        if content_type.startswith(COMPRESSIBLE_TYPES) and self.min_compress_size <= len(data) <= self.max_compress_size:
+            for encoding, suffix in ENCODINGS.items():
+                try:
+                    with open(path + suffix, 'rb') as f:
+                        variant = f.read()
+                except OSError:
+                    if encoding == 'br' and brotli is None:
+                        continue
+                    variant = compress(data, encoding)
+                if len(variant) < len(data):
+                    asset.variants[encoding] = variant
+        return asset
+
+    def get(self, rel: str) -> Optional[Asset]:
+        """Return the asset for ``rel``, adding files created since startup."""
+        asset = self.manifest.get(rel)
+        if asset is not None:
+            return asset
+        path = safe_join(self.root, rel)
+        if not rel or path is None or not os.path.isfile(path):
+            return None
+        asset = self._build(rel)
+        if asset is not None:
+            with self._lock:
+                self.manifest[rel] = asset
+        return asset
+
+    def response(self, rel: str) -> Optional[Response]:
+        """Build the response for ``rel`` within the current request, or
+        return None if there is no such file."""
+        asset = self.get(rel)
+        if asset is None:
+            return None
+        accepted = parse_accept_encoding(request.headers.get('Accept-Encoding', ''))
+        encoding = next(
+            (e for e in ENCODINGS if e in asset.variants and accepted.get(e, accepted.get('*', 0)) > 0), None)
+        etag = f'"{asset.etag}-{encoding}"' if encoding else f'"{asset.etag}"'
+        headers = {
+            'ETag': etag,
+            'Cache-Control': IMMUTABLE if asset.immutable else REVALIDATE,
+        }
+        if asset.variants:
+            headers['Vary'] = 'Accept-Encoding'
+        if etag_matches(request.headers.get('If-None-Match', ''), etag):
+            return Response(status=304, headers=headers)
+        headers['Content-Type'] = asset.content_type
+        if encoding:
+            headers['Content-Encoding'] = encoding
+            body = asset.variants[encoding]
+        elif asset.data is not None:
+            body = asset.data
+        else:
+            headers['Content-Length'] = str(asset.size)
+            stream = wrap_file(request.environ, open(asset.path, 'rb'))
+            return Response(stream, headers=headers, direct_passthrough=True)
+        return Response(body, headers=headers)
+
+    def stats(self) -> Dict[str, int]:
+        manifest = self.manifest
+        return {
+            'files': len(manifest),
+            'bytes': sum(a.size for a in manifest.values()),
+            'memory_bytes': sum(len(a.data or b'') + sum(map(len, a.variants.values())) for a in manifest.values()),
+        }
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    tags = [t.strip() for t in header.split(',')]
+    return etag in tags or f'W/{etag}' in tags
+
+
+def write_precompressed(root: str) -> int:
+    """Write ``.gz`` (and ``.br``) files next to compressible assets
+    under ``root`` and return how many were written."""
+    assets = StaticAssets(root, max_memory_size=0)
+    written = 0
+    for asset in assets.manifest.values():
+        for encoding, variant in asset.variants.items():
+            target = asset.path + ENCODINGS[encoding]
+            if not os.path.exists(target):
+                with open(target, 'wb') as f:
+                    f.write(variant)
+                written += 1
+    return written
+
+
+if __name__ == '__main__':
+    dist = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend', 'dist')
+    print(f'Wrote {write_precompressed(dist)} precompressed files')
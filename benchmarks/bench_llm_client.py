@@ -0,0 +1,99 @@
+"""
+Benchmark the pooled LLM client against the local fake OpenAI server.
+
+Compares opening a new connection per request (``urllib``, what a
+naive client does) with ``core.llm.LLMClient``'s keep-alive pool, for
+plain completions and for streams (time to first token).  Upstream
+latency is simulated by the fake server, so the numbers do not depend
+on the network or an API key.
+
+    python -m benchmarks.bench_llm_client --requests 500 --concurrency 16 --delay 0.01
+
+Point ``--base-url`` at a real OpenAI-compatible endpoint (with
+``OPENAI_API_KEY`` set) to measure it instead.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+from core.llm import LLMClient
+from tools.fake_openai import FakeOpenAIServer
+
+
+def _per_request(base_url: str, api_key: str) -> Callable[[int], object]:
+    def call(i: int) -> object:
+        body = json.dumps({'model': 'gpt-4o-mini', 'messages': [{'role': 'user', 'content': f'question {i}'}]})
+        req = urllib.request.Request(base_url + '/chat/completions', body.encode('utf-8'), {
+            'Content-Type': 'application/json', 'Authorization': f'Bearer {api_key}'})
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            return json.loads(resp.read())['choices'][0]['message']['content']
+    return call
+
+
+def _measure(label: str, fn: Callable[[int], object], count: int, concurrency: int) -> None:
+    latencies: List[float] = []
+
+    def timed(i: int) -> None:
+        start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(count)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f'{label:<22} {count / wall:8.1f} req/s  p50 {statistics.median(latencies) * 1000:8.2f} ms  '
+          f'p99 {p99 * 1000:8.2f} ms')
+
+
+def _first_token(llm: LLMClient, i: int) -> float:
+    start = time.perf_counter()
+    stream = llm.stream([{'role': 'user', 'content': f'stream question number {i} with a few more words'}])
+    next(stream)
+    first = time.perf_counter() - start
+    for _ in stream:
+        pass
+    return first
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--delay', type=float, default=0.01, help='simulated upstream latency per request')
+    parser.add_argument('--token-delay', type=float, default=0.002, help='simulated time between streamed words')
+    parser.add_argument('--base-url', help='measure this endpoint instead of the fake server')
+    args = parser.parse_args()
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server = FakeOpenAIServer(delay=args.delay, token_delay=args.token_delay).start()
+        base_url = server.base_url
+    api_key = os.getenv('OPENAI_API_KEY', 'fake')
+    llm = LLMClient(base_url, api_key=api_key, max_connections=args.concurrency)
+    try:
+        _measure('connection per request', _per_request(base_url, api_key), args.requests, args.concurrency)
+        _measure('pooled client', lambda i: llm.complete([{'role': 'user', 'content': f'question {i}'}]),
+                 args.requests, args.concurrency)
+        firsts = sorted(_first_token(llm, i) for i in range(min(args.requests, 50)))
+        print(f'stream first token     p50 {statistics.median(firsts) * 1000:8.2f} ms')
+        stats = llm.stats()
+        print(f"pooled connections opened: {stats['connections_opened']}, retries: {stats['retries']}")
+    finally:
+        llm.close()
+        if server is not None:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Measure cold start of the API server.
+
+Each run is a fresh interpreter that imports ``backend.agent`` and calls
+``create_app()``, which is what every autoscaled instance pays before
+serving its first request.  Reported per run: import time, app
+construction time, peak RSS and which heavy optional packages
+(OpenAI SDK, Playwright, numpy, pypdf) got imported although no request
+needed them.  ``tests/test_startup.py`` enforces :data:`BUDGET_SECONDS`
+and :data:`BUDGET_RSS_MB`.
+
+    python -m benchmarks.bench_startup --runs 5
+
+The app starts in a throwaway copy of ``backend/``, ``core/`` and
+``tools/`` so the queue, logs and memory of the checkout are left
+alone.  The first run also compiles bytecode; the later ones match an
+image with bytecode already built.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+BUDGET_SECONDS = 1.0
+BUDGET_RSS_MB = 50.0
+HEAVY_MODULES = ('openai', 'playwright', 'numpy', 'pypdf')
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+_PACKAGES = ('backend', 'core', 'tools')
+
+_PROBE = r'''
+import json, os, resource, sys, time
+start = time.perf_counter()
+from backend.agent import create_app
+imported = time.perf_counter()
+create_app()
+done = time.perf_counter()
+# ru_maxrss survives exec on Linux and would include the parent's
+# footprint (e.g. pytest's); VmHWM belongs to this address space only.
+try:
+    with open('/proc/self/status') as f:
+        rss_mb = next(int(l.split()[1]) for l in f if l.startswith('VmHWM:')) / 1024
+except (OSError, StopIteration):
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+print(json.dumps({
+    'import_s': imported - start,
+    'create_s': done - imported,
+    'total_s': done - start,
+    'rss_mb': rss_mb,
+    'modules': len(sys.modules),
+    'heavy_modules': [m for m in %r if m in sys.modules],
+}))
+sys.stdout.flush()
+# Skip joining the app's worker threads and atexit flushes.
+os._exit(0)
+''' % (HEAVY_MODULES,)
+
+
+def measure_startup(runs: int = 3) -> List[Dict[str, Any]]:
+    """Start the app ``runs`` times in fresh interpreters and return the
+    measurements of each run."""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for package in _PACKAGES:
+            shutil.copytree(os.path.join(ROOT, package), os.path.join(tmp, package),
+                            ignore=shutil.ignore_patterns('__pycache__', 'knowledge'))
+        env = dict(os.environ, PYTHONPATH=tmp)
+        for _ in range(runs):
+            out = subprocess.run([sys.executable, '-c', _PROBE], cwd=tmp, env=env,
+                                 capture_output=True, text=True, timeout=120, check=True).stdout
+            results.append(json.loads(out.strip().splitlines()[-1]))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    results = measure_startup(max(2, args.runs))
+    first, warm = results[0], results[1:]
+    print(f"first run (compiles bytecode) {first['total_s'] * 1000:8.1f} ms")
+    for key, label in (('import_s', 'import'), ('create_s', 'create_app()'), ('total_s', 'total')):
+        print(f'{label:<29} {statistics.median(r[key] for r in warm) * 1000:8.1f} ms (median)')
+    print(f"peak RSS                      {statistics.median(r['rss_mb'] for r in warm):8.1f} MB")
+    print(f"modules loaded                {warm[-1]['modules']:8d}")
+    print(f"heavy modules imported        {', '.join(warm[-1]['heavy_modules']) or 'none'}")
+    print(f'budget                        {BUDGET_SECONDS * 1000:8.0f} ms, {BUDGET_RSS_MB:.0f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark peak memory of ajax_system training uploads versus file size.
+
+Each measurement runs in a fresh interpreter and reports how far peak
+RSS rose while ingesting one generated text transcript:
+
+* ``legacy``    – the previous behaviour: read the whole upload into
+  bytes, decode it and split it into words;
+* ``streaming`` – ``upload_training_file`` fed the upload as a stream.
+
+    python -m benchmarks.bench_training_ingest --sizes 10 50 200
+
+Sizes are in MB.  Linux/macOS only (uses ``resource``).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+AJAX_SYSTEM = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ajax_system')
+
+# Runs inside the child interpreter with ajax_system on sys.path and the
+# agent folders and timeline redirected into a temporary directory.
+_CHILD = r'''
+import json, os, resource, sys, time
+sys.path.insert(0, sys.argv[1])
+from core import agent as agent_mgr, memory
+
+mode, path, tmp = sys.argv[2], sys.argv[3], sys.argv[4]
+agent_mgr.AGENTS_DIR = os.path.join(tmp, 'agents')
+agent_mgr.KNOWLEDGE_DIR = os.path.join(tmp, 'knowledge')
+memory.TIMELINE_DB = os.path.join(tmp, 'timeline.db')
+os.makedirs(os.path.join(agent_mgr.AGENTS_DIR, 'bench'), exist_ok=True)
+
+def peak_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+before = peak_kb()
+start = time.perf_counter()
+with open(path, 'rb') as upload:
+    if mode == 'legacy':
+        content = upload.read()
+        text = content.decode('utf-8', errors='ignore')
+        words = text.split()
+        summary = ' '.join(words[:200])
+        agent_mgr.upload_training_file('bench', 'transcript.txt', content, summarise=False)
+    else:
+        agent_mgr.upload_training_file('bench', 'transcript.txt', upload)
+print(json.dumps({'peak_mb': (peak_kb() - before) / 1024, 'seconds': time.perf_counter() - start}))
+'''
+
+
+def _make_transcript(path: str, size_mb: int) -> None:
+    line = ('Logan: we grew the list to ten thousand subscribers by posting daily. '
+            'Ajax: noted, scheduling the follow up campaign for tomorrow morning.\n').encode('utf-8')
+    target = size_mb * 1024 * 1024
+    block = line * (1024 * 1024 // len(line) + 1)
+    with open(path, 'wb') as f:
+        while f.tell() < target:
+            f.write(block[:target - f.tell()])
+
+
+def _run(mode: str, path: str, tmp: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, '-c', _CHILD, AJAX_SYSTEM, mode, path, tmp],
+        check=True, capture_output=True, text=True, cwd=tmp,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 200], help='file sizes in MB')
+    args = parser.parse_args()
+    print(f'{"size":>8} {"legacy peak":>12} {"stream peak":>12} {"legacy s":>9} {"stream s":>9}')
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'upload.txt')
+            _make_transcript(path, size)
+            legacy = _run('legacy', path, tmp)
+            streaming = _run('streaming', path, tmp)
+        print(f'{size:>6}MB {legacy["peak_mb"]:>10.1f}MB {streaming["peak_mb"]:>10.1f}MB '
+              f'{legacy["seconds"]:>9.2f} {streaming["seconds"]:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
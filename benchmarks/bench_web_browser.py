@@ -0,0 +1,84 @@
+"""
+Benchmark WebBrowserTool against local pages.
+
+Compares the old behaviour (launch Chromium for every fetch) with the
+pooled browser and with URL cache hits.  Pages are generated as local
+``file://`` documents so the numbers do not depend on the network.
+
+    python -m benchmarks.bench_web_browser --pages 20 --pool-size 2
+
+Requires Playwright's Chromium (``playwright install chromium``).
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+from tools.web_browser import WebBrowserTool
+
+
+def _make_pages(directory: str, count: int) -> List[str]:
+    urls = []
+    for i in range(count):
+        path = os.path.join(directory, f'page{i}.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'<html><head><title>Page {i}</title></head><body>' + '<p>lorem ipsum</p>' * 200 + '</body></html>')
+        urls.append('file://' + path)
+    return urls
+
+
+def _fetch_per_launch(url: str) -> dict:
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page()
+        page.goto(url, wait_until='domcontentloaded')
+        result = {'title': page.title(), 'body': page.inner_text('body')}
+        browser.close()
+    return result
+
+
+def _measure(label: str, fn: Callable[[str], object], urls: List[str], concurrency: int) -> None:
+    latencies: List[float] = []
+
+    def timed(url: str) -> None:
+        start = time.perf_counter()
+        fn(url)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, urls))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f'{label:<16} {len(urls) / wall:8.1f} pages/s  p50 {statistics.median(latencies) * 1000:8.1f} ms  '
+          f'p99 {p99 * 1000:8.1f} ms')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--pool-size', type=int, default=2)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        urls = _make_pages(tmp, args.pages)
+        _measure('launch per call', _fetch_per_launch, urls, args.pool_size)
+        tool = WebBrowserTool(pool_size=args.pool_size)
+        try:
+            _measure('pooled', lambda u: tool.run({'url': u, 'fresh': True}), urls, args.pool_size)
+            _measure('cached', lambda u: tool.run({'url': u}), urls, args.pool_size)
+            print(f'browser restarts: {tool.pool.restarts}')
+        finally:
+            tool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -8,9 +8,42 @@ within the Ajax system must extend.  Each agent must implement the
 and returns a string response.  Using a common interface allows Ajax
 to delegate tasks to registered agents without knowing their internal
 details.
+
+When a :class:`core.llm.LLMClient` is attached (see :meth:`BaseAgent.use_llm`)
+:meth:`BaseAgent.respond` and :meth:`BaseAgent.respond_stream` answer
+through the model, with the agent's system prompt and training
+passages as context, plus any earlier turns of the conversation the
+caller passes in; without one they fall back to ``handle_task``.
+:meth:`BaseAgent.arespond_stream` is the asyncio counterpart used by
+the async server.
 """
 
+import asyncio
 from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+_END = object()
+
+
+async def iterate_in_thread(chunks: Iterator[str]) -> AsyncIterator[str]:
+    """Yield the items of a blocking iterator, each ``next`` running on
+    the event loop's default executor."""
+    loop = asyncio.get_running_loop()
+    while True:
+        chunk = await loop.run_in_executor(None, next, chunks, _END)
+        if chunk is _END:
+            return
+        yield chunk
+
+
+def history_messages(context: Sequence[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """The ``role``/``content`` pairs of the user and assistant turns in
+    ``context``, the form both the model and the cache key use."""
+    return [
+        {"role": m["role"], "content": m["content"]}
+        for m in context
+        if m.get("role") in ("user", "assistant") and isinstance(m.get("content"), str)
+    ]
 
 
 class BaseAgent(ABC):
@@ -22,6 +55,22 @@ class BaseAgent(ABC):
     make it clear when the interface has not been properly extended.
     """
 
+    #: Search index over the agent's training files, attached by
+    #: ``AjaxAI.attach_knowledge`` (see :mod:`core.knowledge_index`).
+    knowledge: Any = None
+
+    #: Settings that shape the agent's replies (model name, temperature
+    #: …).  They are part of the response cache key, so changing them
+    #: never serves replies produced under the old settings.
+    model_params: Dict[str, Any] = {}
+
+    #: Shared :class:`core.llm.LLMClient`, attached by ``use_llm``.
+    llm: Any = None
+
+    #: Instructions sent ahead of every task when answering through the
+    #: model.  Defaults to the first line of the class docstring.
+    system_prompt: str = ""
+
     @abstractmethod
     def handle_task(self, task: str) -> str:
         """Process a task and return a response.
@@ -33,3 +82,81 @@ class BaseAgent(ABC):
             A string containing the result of the task.
         """
         raise NotImplementedError("Subclasses must implement handle_task().")
+
+    def stream_task(self, task: str) -> Iterator[str]:
+        """Process a task and yield the response in chunks.
+
+        Agents that can produce partial output should override this so
+        callers can forward text as soon as it exists.  The default
+        yields the complete :meth:`handle_task` result as one chunk.
+        """
+        yield self.handle_task(task)
+
+    def recall_knowledge(self, query: str, k: int = 3) -> List[str]:
+        """Return up to ``k`` training passages relevant to ``query``.
+
+        Returns an empty list when no knowledge index is attached.
+        """
+        if self.knowledge is None:
+            return []
+        return [hit["text"] for hit in self.knowledge.search(query, k)]
+
+    def use_llm(self, client: Optional[Any]) -> None:
+        """Answer through ``client`` (None restores the offline replies).
+
+        The client's model and default settings become part of
+        :attr:`model_params`, so replies cached for another model are
+        never served.
+        """
+        self.llm = client
+        params = type(self).model_params
+        self.model_params = dict(client.settings(), **params) if client is not None else dict(params)
+
+    def llm_messages(self, task: str, context: Sequence[Dict[str, Any]] = ()) -> List[Dict[str, str]]:
+        """Chat messages sent to the model for ``task``.
+
+        ``context`` holds earlier turns of the conversation, oldest
+        first, as stored by :class:`core.conversations.ConversationStore`;
+        their user and assistant messages go between the system prompt
+        and the task.
+        """
+        system = self.system_prompt or (type(self).__doc__ or "").strip().split("\n")[0]
+        passages = self.recall_knowledge(task)
+        if passages:
+            system += "\n\nRelevant notes from your training files:\n\n" + "\n\n".join(passages)
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.extend(history_messages(context))
+        messages.append({"role": "user", "content": task})
+        return messages
+
+    def respond(self, task: str) -> str:
+        """Answer ``task`` through the attached model, or via
+        :meth:`handle_task` when none is attached."""
+        if self.llm is None:
+            return self.handle_task(task)
+        return self.llm.complete(self.llm_messages(task), **self.model_params)
+
+    def respond_stream(self, task: str) -> Iterator[str]:
+        """Streaming counterpart of :meth:`respond`."""
+        if self.llm is None:
+            return self.stream_task(task)
+        return self.llm.stream(self.llm_messages(task), **self.model_params)
+
+    async def arespond_stream(self, task: str, context: Sequence[Dict[str, Any]] = ()) -> AsyncIterator[str]:
+        """Async counterpart of :meth:`respond_stream`.
+
+        With a model attached the deltas are awaited through
+        :meth:`core.llm.LLMClient.astream`, so no thread is held while
+        the model writes; only the knowledge lookup for the prompt runs
+        on the default executor.  Offline replies come from
+        :meth:`stream_task`, iterated on the executor.  ``context`` is
+        passed to :meth:`llm_messages`.
+        """
+        if self.llm is None:
+            async for chunk in iterate_in_thread(self.stream_task(task)):
+                yield chunk
+            return
+        loop = asyncio.get_running_loop()
+        messages = await loop.run_in_executor(None, self.llm_messages, task, context)
+        async for delta in self.llm.astream(messages, **self.model_params):
+            yield delta
@@ -0,0 +1,40 @@
+"""
+ConfigAgent
+===========
+
+Agent built from a scaffolded ``core/agents/<name>/config.json`` (see
+``POST /api/agents``) that has no code of its own.  The configured
+role, base behaviour and ``training.md`` notes form its system prompt
+when a model is attached; offline it acknowledges the task like the
+other placeholder agents.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from .base_agent import BaseAgent
+
+#: Characters of ``training.md`` included in the system prompt.
+MAX_TRAINING_CHARS = 8000
+
+
+class ConfigAgent(BaseAgent):
+    """Agent defined only by configuration."""
+
+    def __init__(self, name: str, config: Dict[str, Any], training: str = "") -> None:
+        self.name = name
+        self.config = config
+        self.role = str(config.get("role") or "")
+        parts = [f"You are {config.get('name') or name}."]
+        if self.role:
+            parts.append(f"Your role: {self.role}.")
+        if config.get("base_behavior"):
+            parts.append(str(config["base_behavior"]))
+        if training.strip():
+            parts.append("Training notes:\n" + training.strip()[:MAX_TRAINING_CHARS])
+        self.system_prompt = "\n\n".join(parts)
+
+    def handle_task(self, task: str) -> str:
+        role = f" as {self.role}" if self.role else ""
+        return f"[{self.config.get('name') or self.name}] Processing task{role}: {task}"
@@ -37,10 +37,16 @@ Feel free to extend this class or register additional agents using
 
 from __future__ import annotations
 
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
-import json
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+import asyncio
 import os
+import re
+import threading
+import time
+
+from .persistence import JournaledState
 
 
 @dataclass
@@ -65,14 +71,72 @@ class Personality:
         return self.example_phrases[0] if self.example_phrases else ""
 
 
-# Import the abstract base class and concrete agents from the agents package.
-from .agents.base_agent import BaseAgent
-from .agents.investor_agent import InvestorAgent
-from .agents.fanpage_agent import FanpageAgent
-from .agents.growth import GrowthAgent
-from .agents.dev import DevAgent
-from .agents.support import SupportAgent
-from .agents.ops import OpsAgent
+@dataclass
+class Delegation:
+    """Outcome of one agent's share of a fan‑out delegation.
+
+    ``status`` is ``"ok"`` (``response`` holds the reply), ``"error"``
+    (``error`` holds the message) or ``"timeout"`` when the agent missed
+    its deadline.  ``elapsed`` is measured from the moment the agent
+    started working on the task.
+    """
+    agent: str
+    status: str
+    response: str = ""
+    error: str = ""
+    elapsed: float = 0.0
+
+    def section(self) -> str:
+        """This result as a labelled block of the merged reply."""
+        if self.status == "ok":
+            body = self.response
+        elif self.status == "timeout":
+            body = f"(no reply within {self.elapsed:.1f}s)"
+        else:
+            body = f"(failed: {self.error})"
+        return f"**{self.agent}**\n{body}"
+
+
+_DELEGATION = re.compile(r"\s*([\w.-]+(?:\s*[+,]\s*[\w.-]+)*)\s+(\S.*)", re.S)
+
+
+def parse_agent_names(spec: str) -> List[str]:
+    """Split ``"growth+investor"`` (or ``"growth, investor"``) into agent
+    names, dropping blanks and repeats."""
+    return list(dict.fromkeys(n.strip() for n in re.split(r"[+,]", spec) if n.strip()))
+
+
+def parse_delegation(text: str) -> Optional[Tuple[List[str], str]]:
+    """Parse the arguments of ``/delegate <agent>[+<agent>…] <task>``
+    into agent names and task, or None when malformed."""
+    match = _DELEGATION.fullmatch(text)
+    if not match:
+        return None
+    return parse_agent_names(match.group(1)), match.group(2).strip()
+
+
+def merge_replies(results: Iterable[Delegation]) -> str:
+    """One reply made of every agent's labelled section."""
+    return "\n\n".join(result.section() for result in results)
+
+
+# Only the base class is imported here; concrete agents are loaded by
+# the plugin registry when first used (see core.plugins).
+from .agents.base_agent import BaseAgent, history_messages
+from .plugins import ENTRY_POINT_GROUP, PluginRegistry
+
+#: Agents every Ajax starts with, as ``"module:Class"`` specs.
+DEFAULT_AGENTS: Dict[str, str] = {
+    "investor": "core.agents.investor_agent:InvestorAgent",
+    "fanpage": "core.agents.fanpage_agent:FanpageAgent",
+    "growth": "core.agents.growth:GrowthAgent",
+    "dev": "core.agents.dev:DevAgent",
+    "support": "core.agents.support:SupportAgent",
+    "ops": "core.agents.ops:OpsAgent",
+}
+
+#: Where ``POST /api/agents`` scaffolds agents (``<name>/config.json``).
+AGENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agents")
 
 
 class AjaxAI(BaseAgent):
@@ -89,11 +153,26 @@ class AjaxAI(BaseAgent):
     delegate tasks in future extensions.
     """
 
-    def __init__(self, is_logan_present: bool = True) -> None:
+    #: Agents working at once in one :meth:`delegate_many` fan-out.
+    max_parallel_delegations: int = 8
+
+    #: Seconds each agent gets in :meth:`delegate_many`, from the moment
+    #: it starts, before its share is reported as timed out.
+    delegation_timeout: float = 60.0
+
+    def __init__(
+        self,
+        is_logan_present: bool = True,
+        memory_path: Optional[str] = None,
+        plugin_dirs: Optional[List[str]] = None,
+        entry_point_group: Optional[str] = None,
+    ) -> None:
         # Presence flag.  Set to True when Logan is actively engaging
         # with the agent, and False when the agent is acting on Logan’s
-        # behalf.
-        self.is_logan_present: bool = is_logan_present
+        # behalf.  Kept locally unless a shared state store is attached
+        # (see attach_state) so every server process sees the same mode.
+        self._presence_state: Any = None
+        self._is_logan_present: bool = is_logan_present
 
         # Define personalities for each mode.
         # Personalities for each mode.  These reflect Logan’s voice
@@ -129,61 +208,132 @@ class AjaxAI(BaseAgent):
             ),
         }
 
-        # Agent registry for future specialised agents.  Keys are
-        # agent names; values are callables that take a task string
-        # and return a response string.
-        self.agent_registry: Dict[str, BaseAgent] = {}
-
-        # Persistent memory store tracking brand information and past actions
-        self._memory_path = os.path.join(
+        # Optional core.knowledge_index.KnowledgeBase supplying each
+        # registered agent's training material (see attach_knowledge).
+        self.knowledge_base: Any = None
+        # Agent registry for specialised agents.  Keys are agent names;
+        # values are BaseAgent instances, imported on first lookup and
+        # reloaded when their code or config changes.  Agents are also
+        # discovered from entry points and from <name>/config.json in
+        # the plugin directories.
+        self._loaded_agents: set = set()
+        self.agent_registry = PluginRegistry(
+            config_dirs=plugin_dirs,
+            entry_point_group=entry_point_group,
+            on_load=self._prepare_agent,
+        )
+        # Optional core.response_cache.ResponseCache for replies and
+        # delegated tasks (see attach_cache).
+        self.response_cache: Any = None
+        # Delegations that timed out but whose thread is still running
+        # (threads cannot be interrupted); see abandoned_delegations.
+        self._abandoned: Set[Future] = set()
+        self._abandoned_lock = threading.Lock()
+
+        # Persistent memory store tracking brand information and past
+        # actions.  Brand state is snapshotted to agent_memory.json while
+        # recent actions go to an append-only journal that each snapshot
+        # compacts; writes are coalesced and flushed in the background.
+        # Worker processes share both files under a file lock (see
+        # core.persistence).
+        self._memory_path = memory_path or os.path.join(
             os.path.dirname(os.path.abspath(__file__)),
             "..",
             "memory",
             "agent_memory.json",
         )
-        if os.path.exists(self._memory_path):
-            with open(self._memory_path, "r", encoding="utf-8") as f:
-                self.memory: Dict[str, Any] = json.load(f)
-        else:
-            self.memory = {
-                "brands": {
-                    "remote100k": {},
-                    "tradeview_ai": {},
-                    "app_304": {},
-                },
-                "actions": [],
-            }
-            self._save_memory()
-
-    def register_agent(self, name: str, agent: BaseAgent) -> None:
+        self._store = JournaledState(self._memory_path)
+        self.memory: Dict[str, Any] = self._store.load({
+            "remote100k": {},
+            "tradeview_ai": {},
+            "app_304": {},
+        })
+
+    @property
+    def is_logan_present(self) -> bool:
+        if self._presence_state is not None:
+            return self._presence_state.get("is_logan_present", self._is_logan_present)
+        return self._is_logan_present
+
+    @is_logan_present.setter
+    def is_logan_present(self, value: bool) -> None:
+        self._is_logan_present = bool(value)
+        if self._presence_state is not None:
+            self._presence_state.set("is_logan_present", bool(value))
+
+    def attach_state(self, state: Any) -> None:
+        """Keep the presence flag in a shared store.
+
+        ``state`` must offer ``get(key, default)`` and ``set(key, value)``,
+        e.g. :class:`core.shared_state.SharedState`.  An existing shared
+        value wins over the local one.
+        """
+        self._presence_state = state
+        if state.get("is_logan_present") is None:
+            state.set("is_logan_present", self._is_logan_present)
+
+    def register_agent(self, name: str, agent: Any) -> None:
         """Register a subordinate agent for task delegation.
 
         Args:
             name: Unique identifier for the agent.
-            agent: An instance of BaseAgent (or subclass).
+            agent: An instance of BaseAgent (or subclass), or a
+                ``"module:Class"`` spec imported on first use.
 
         Raises:
             ValueError: If an agent with the same name is already registered.
         """
         if name in self.agent_registry:
             raise ValueError(f"Agent '{name}' is already registered.")
-        self.agent_registry[name] = agent
+        self.agent_registry.add(name, agent)
+
+    def _prepare_agent(self, name: str, agent: BaseAgent) -> None:
+        # Called by the registry whenever an agent is (re)loaded.  A
+        # reload means new code or config, so its cached replies go.
+        if name in self._loaded_agents and self.response_cache is not None:
+            self.response_cache.invalidate(name)
+        self._loaded_agents.add(name)
+        if self.knowledge_base is not None:
+            agent.knowledge = self.knowledge_base.index(name)
+        if self.llm is not None:
+            agent.use_llm(self.llm)
+
+    def attach_knowledge(self, knowledge_base: Any) -> None:
+        """Give every registered agent its index from ``knowledge_base``
+        so it can call :meth:`BaseAgent.recall_knowledge`."""
+        self.knowledge_base = knowledge_base
+        for name, agent in self.agent_registry.loaded().items():
+            agent.knowledge = knowledge_base.index(name)
+
+    def attach_llm(self, client: Any) -> None:
+        """Generate replies for Ajax and every registered agent through
+        ``client`` (a :class:`core.llm.LLMClient`); None goes back to
+        the offline echo replies."""
+        self.use_llm(client)
+        for agent in self.agent_registry.loaded().values():
+            agent.use_llm(client)
+
+    def attach_cache(self, cache: Any) -> None:
+        """Serve repeated prompts and delegated tasks from ``cache``
+        (a :class:`core.response_cache.ResponseCache`)."""
+        self.response_cache = cache
 
     def remember(self, brand: str, key: str, value: Any) -> None:
-        brand_mem = self.memory.setdefault("brands", {}).setdefault(brand, {})
-        brand_mem[key] = value
-        self.memory.setdefault("actions", []).append(
-            {"brand": brand, "key": key, "value": value}
-        )
-        self._save_memory()
+        """Store ``value`` under ``brand``/``key`` and log the action.
+
+        The change is visible to :meth:`recall` immediately; persisting
+        it is deferred so a burst of calls costs a single write.  Call
+        :meth:`flush` to force it to disk.
+        """
+        self._store.record({"brand": brand, "key": key, "value": value})
 
     def recall(self, brand: str, key: str) -> Any:
+        self._store.refresh()  # values other worker processes stored
         return self.memory.get("brands", {}).get(brand, {}).get(key)
 
-    def _save_memory(self) -> None:
-        os.makedirs(os.path.dirname(self._memory_path), exist_ok=True)
-        with open(self._memory_path, "w", encoding="utf-8") as f:
-            json.dump(self.memory, f, indent=2)
+    def flush(self) -> None:
+        """Write any pending memory changes to disk and snapshot them."""
+        self._store.snapshot()
 
     def delegate(self, name: str, task: str) -> str:
         """Delegate a task to a registered agent.
@@ -200,18 +350,158 @@ class AjaxAI(BaseAgent):
         """
         if name not in self.agent_registry:
             raise KeyError(f"No agent registered under name '{name}'.")
-        # Use the agent's handle_task method to process the task
-        return self.agent_registry[name].handle_task(task)
+        agent = self.agent_registry[name]
+        if self.response_cache is None:
+            # The agent answers through the model when one is attached,
+            # otherwise through its handle_task method.
+            return agent.respond(task)
+        reply = self.response_cache.get(task, agent=name, params=agent.model_params)
+        if reply is None:
+            reply = agent.respond(task)
+            self.response_cache.set(task, reply, agent=name, params=agent.model_params)
+        return reply
+
+    def delegate_stream(self, name: str, task: str) -> Iterator[str]:
+        """Delegate a task and yield the agent's response in chunks.
+
+        Raises:
+            KeyError: If the specified agent is not registered.
+        """
+        if name not in self.agent_registry:
+            raise KeyError(f"No agent registered under name '{name}'.")
+        agent = self.agent_registry[name]
+        if self.response_cache is None:
+            return agent.respond_stream(task)
+        return self.response_cache.stream(
+            task, lambda: agent.respond_stream(task), agent=name, params=agent.model_params)
+
+    async def adelegate_stream(self, name: str, task: str) -> AsyncIterator[str]:
+        """Async counterpart of :meth:`delegate_stream`; the agent's
+        reply is awaited through :meth:`BaseAgent.arespond_stream`.
+
+        Raises:
+            KeyError: If the specified agent is not registered.
+        """
+        loop = asyncio.get_running_loop()
+        # The first lookup may import the agent.
+        agent = await loop.run_in_executor(None, self.agent_registry.get, name)
+        if agent is None:
+            raise KeyError(f"No agent registered under name '{name}'.")
+        if self.response_cache is None:
+            chunks = agent.arespond_stream(task)
+        else:
+            chunks = self.response_cache.astream(
+                task, lambda: agent.arespond_stream(task), agent=name, params=agent.model_params)
+        async for chunk in chunks:
+            yield chunk
+
+    @property
+    def abandoned_delegations(self) -> int:
+        """Timed-out delegations whose agent is still running."""
+        with self._abandoned_lock:
+            return len(self._abandoned)
+
+    def _abandon(self, future: Future) -> None:
+        with self._abandoned_lock:
+            self._abandoned.add(future)
+        future.add_done_callback(self._release)
+
+    def _release(self, future: Future) -> None:
+        with self._abandoned_lock:
+            self._abandoned.discard(future)
+
+    def _run_delegation(self, name: str, task: str, started: Dict[str, float]) -> Delegation:
+        start = started[name] = time.monotonic()
+        try:
+            reply = self.delegate(name, task)
+        except Exception as e:  # reported per agent, the others still answer
+            return Delegation(name, "error", error=str(e), elapsed=time.monotonic() - start)
+        return Delegation(name, "ok", response=reply, elapsed=time.monotonic() - start)
+
+    def iter_delegations(
+        self,
+        names: Iterable[str],
+        task: str,
+        timeout: Optional[float] = None,
+        timeouts: Optional[Dict[str, float]] = None,
+    ) -> Iterator[Delegation]:
+        """Hand ``task`` to several agents at once and yield each
+        agent's :class:`Delegation` as soon as it is known.
+
+        Agents run concurrently on a pool of at most
+        ``max_parallel_delegations`` threads started for this fan‑out,
+        so the whole fan‑out takes about as long as the slowest agent.
+        Each agent has ``timeouts[name]`` (default ``timeout``, then
+        ``delegation_timeout``) seconds from the moment it starts
+        running, so agents queued for a thread are not charged for the
+        wait.  One that misses its deadline or raises is reported as
+        such while the others still answer.  A timed‑out agent's thread
+        cannot be stopped; it finishes in the background without holding
+        up later fan‑outs and is counted in
+        :attr:`abandoned_delegations` until it does.
+
+        Raises:
+            KeyError: If any of the agents is not registered.
+        """
+        names = list(dict.fromkeys(names))
+        for name in names:
+            if name not in self.agent_registry:
+                raise KeyError(f"No agent registered under name '{name}'.")
+        if not names:
+            return
+        default = self.delegation_timeout if timeout is None else timeout
+        limits = {name: (timeouts or {}).get(name, default) for name in names}
+        started: Dict[str, float] = {}
+        pool = ThreadPoolExecutor(max_workers=min(len(names), self.max_parallel_delegations),
+                                  thread_name_prefix="ajax-delegate")
+        futures = {pool.submit(self._run_delegation, name, task, started): name for name in names}
+        pending = set(futures)
+        try:
+            while pending:
+                # An agent still queued has at least its full limit left
+                # once it starts, so waking up after that is early enough.
+                now = time.monotonic()
+                wake = [started[futures[f]] + limits[futures[f]] if futures[f] in started
+                        else now + limits[futures[f]] for f in pending]
+                done, pending = wait(pending, timeout=max(0.0, min(wake) - now), return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+                now = time.monotonic()
+                for future in list(pending):
+                    name = futures[future]
+                    if name in started and now - started[name] >= limits[name]:
+                        pending.discard(future)
+                        if not future.cancel():
+                            self._abandon(future)
+                        yield Delegation(name, "timeout", elapsed=now - started[name])
+        finally:
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+    def delegate_many(
+        self,
+        names: Iterable[str],
+        task: str,
+        timeout: Optional[float] = None,
+        timeouts: Optional[Dict[str, float]] = None,
+    ) -> List[Delegation]:
+        """Run :meth:`iter_delegations` to the end and return the
+        results in the order of ``names``.  :func:`merge_replies` turns
+        them into a single reply."""
+        names = list(dict.fromkeys(names))
+        results = {r.agent: r for r in self.iter_delegations(names, task, timeout, timeouts)}
+        return [results[name] for name in names]
 
     def generate_response(self, prompt: str) -> str:
         """Generate a response based on the current mode and user prompt.
 
-        This method embodies the core dual‑mode logic.  It selects
-        appropriate starter phrases and constructs a reply that reflects
-        either the Ajax personality or the Logan personality.  The
-        prompt itself is not analysed for meaning; it is echoed back
-        alongside the personality‑specific framing to illustrate how
-        the system might wrap user input.
+        This method embodies the core dual‑mode logic.  With a model
+        attached (see :meth:`attach_llm`) the reply is generated with
+        the current personality as system prompt.  Without one the
+        prompt is not analysed for meaning; it is echoed back alongside
+        the personality‑specific framing to illustrate how the system
+        might wrap user input.
 
         Args:
             prompt: The user’s raw input string.
@@ -219,6 +509,69 @@ class AjaxAI(BaseAgent):
         Returns:
             A response string that reflects the current mode.
         """
+        return "".join(self.stream_response(prompt))
+
+    def stream_response(self, prompt: str, context: Sequence[Dict[str, Any]] = ()) -> Iterator[str]:
+        """Yield the reply to ``prompt`` chunk by chunk.
+
+        Joining the chunks gives exactly :meth:`generate_response`.  The
+        lead‑in is produced first so a client sees output immediately.
+        ``context`` holds the earlier turns of the conversation (see
+        :meth:`core.conversations.ConversationStore.context`) and is
+        sent to the model with the prompt.  With a response cache
+        attached, a prompt already answered in the same mode and after
+        the same turns is replayed from the cache as a single chunk.
+        """
+        if self.response_cache is None:
+            return self._stream_reply(prompt, context)
+        mode = "ajax" if self.is_logan_present else "logan"
+        return self.response_cache.stream(
+            prompt, lambda: self._stream_reply(prompt, context), mode=mode, agent="ajax",
+            params=self._cache_params(context))
+
+    def astream_response(self, prompt: str, context: Sequence[Dict[str, Any]] = ()) -> AsyncIterator[str]:
+        """Async counterpart of :meth:`stream_response`, awaiting the
+        model through :meth:`core.llm.LLMClient.astream`."""
+        if self.response_cache is None:
+            return self._astream_reply(prompt, context)
+        mode = "ajax" if self.is_logan_present else "logan"
+        return self.response_cache.astream(
+            prompt, lambda: self._astream_reply(prompt, context), mode=mode, agent="ajax",
+            params=self._cache_params(context))
+
+    def _cache_params(self, context: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+        """Cache key parameters for a reply given ``context``."""
+        history = history_messages(context)
+        return dict(self.model_params, context=history) if history else self.model_params
+
+    async def _astream_reply(self, prompt: str, context: Sequence[Dict[str, Any]] = ()) -> AsyncIterator[str]:
+        if self.llm is not None:
+            async for chunk in self.arespond_stream(prompt, context):
+                yield chunk
+            return
+        # The offline reply does no I/O.
+        for chunk in self._stream_reply(prompt):
+            yield chunk
+
+    @property
+    def system_prompt(self) -> str:  # type: ignore[override]
+        """Instructions for the model in the current mode."""
+        if self.is_logan_present:
+            personality = self.personalities["ajax"]
+            role = "You are Ajax, Logan Alvarez’s assistant, talking to Logan."
+        else:
+            personality = self.personalities["logan"]
+            role = "You are replying on behalf of Logan Alvarez, in his own voice."
+        phrases = " ".join(f"“{p}”" for p in personality.example_phrases)
+        return (
+            f"{role} {personality.description}  Typical phrases: {phrases}"
+            "  Never mention being an AI or a language model."
+        )
+
+    def _stream_reply(self, prompt: str, context: Sequence[Dict[str, Any]] = ()) -> Iterator[str]:
+        if self.llm is not None:
+            yield from self.llm.stream(self.llm_messages(prompt, context), **self.model_params)
+            return
         # Choose the appropriate personality based on presence
         if self.is_logan_present:
             personality = self.personalities["ajax"]
@@ -229,10 +582,11 @@ class AjaxAI(BaseAgent):
         # conversational manner.  Keep it succinct and avoid overly
         # formal language.  If Logan is away, the message should still
         # feel like him speaking directly.
-        if self.is_logan_present:
-            return f"{lead_in} — {prompt}"
-        else:
-            return f"{lead_in} {prompt}"
+        yield lead_in
+        yield " — " if self.is_logan_present else " "
+        words = prompt.split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
 
     # Implementation of BaseAgent interface
     def handle_task(self, task: str) -> str:
@@ -246,6 +600,9 @@ class AjaxAI(BaseAgent):
         """
         return self.generate_response(task)
 
+    def stream_task(self, task: str) -> Iterator[str]:
+        return self.stream_response(task)
+
 
 # Example skeletons for future specialised agents
 
@@ -254,17 +611,15 @@ class AjaxAI(BaseAgent):
 def build_default_ajax() -> AjaxAI:
     """Factory function to build an AjaxAI instance with some agents.
 
-    Registers placeholder agents to illustrate how the registry works.
+    Registers the placeholder agents in :data:`DEFAULT_AGENTS` and
+    discovers further agents from entry points and ``core/agents/*/``
+    config directories; none of them is imported before first use.
     This function can be used by clients to instantiate a pre‑configured
     Ajax agent.
     """
-    ajax = AjaxAI()
-    ajax.register_agent("investor", InvestorAgent())
-    ajax.register_agent("fanpage", FanpageAgent())
-    ajax.register_agent("growth", GrowthAgent())
-    ajax.register_agent("dev", DevAgent())
-    ajax.register_agent("support", SupportAgent())
-    ajax.register_agent("ops", OpsAgent())
+    ajax = AjaxAI(plugin_dirs=[AGENTS_DIR], entry_point_group=ENTRY_POINT_GROUP)
+    for name, spec in DEFAULT_AGENTS.items():
+        ajax.register_agent(name, spec)
     return ajax
 
 
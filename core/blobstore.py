@@ -0,0 +1,257 @@
+"""
+Content-addressed, deduplicating store for uploaded files.
+
+Uploads used to be written by client filename into every project or
+agent folder they were sent to, so the same media uploaded for three
+brands was stored (and indexed) three times.  ``BlobStore`` keeps each
+distinct content once, named by its SHA-256 under ``objects/ab/<hash>``,
+and exposes it in the familiar folders as *views*: a view entry is a
+hard link to the object (a copy where hard links are not supported), so
+code reading ``memory/<project>/uploads`` or ``core/knowledge/<agent>``
+keeps working unchanged.
+
+A SQLite database records which view names point at which object and
+how many references each object has; objects whose last reference goes
+away are deleted by :meth:`BlobStore.gc`.  :meth:`BlobStore.have` answers
+"is this content already stored?" from the database without touching
+the objects, so clients can hash a file locally and skip re-sending it.
+
+Objects are made read-only because every view of them shares the same
+bytes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Dict, Iterable, List, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refs INTEGER NOT NULL DEFAULT 0,
+    touched REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS views (
+    view TEXT NOT NULL,
+    name TEXT NOT NULL,
+    digest TEXT NOT NULL REFERENCES blobs(digest),
+    PRIMARY KEY (view, name)
+);
+CREATE INDEX IF NOT EXISTS views_digest ON views (digest);
+"""
+
+
+def is_digest(value: str) -> bool:
+    """True for a lower-case hex SHA-256."""
+    return len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+
+def is_filename(name: str) -> bool:
+    """True for a plain file name that :meth:`BlobStore.link` accepts."""
+    return bool(name) and name == os.path.basename(name) and name not in ('.', '..')
+
+
+class BlobStore:
+    """SHA-256 addressed objects with reference-counted views."""
+
+    def __init__(self, root: str) -> None:
+        self.root = os.path.abspath(root)
+        self.objects_dir = os.path.join(self.root, 'objects')
+        self.tmp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, 'blobs.db'), timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _view_key(self, view_dir: str) -> str:
+        # Relative to the store so the tree can be moved as a whole.
+        return os.path.relpath(os.path.abspath(view_dir), self.root).replace(os.sep, '/')
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    # --- objects ---
+    def put(self, stream: BinaryIO) -> Tuple[str, int]:
+        """Store the bytes of ``stream`` and return ``(digest, size)``.
+
+        The stream is hashed while it is spooled to a temporary file;
+        if the content is already stored the temporary file is simply
+        discarded.  The object has no references until it is linked.
+        """
+        sha = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=self.tmp_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for block in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    sha.update(block)
+                    f.write(block)
+                size = f.tell()
+            digest = sha.hexdigest()
+            target = self.path(digest)
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.chmod(tmp, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+                os.replace(tmp, target)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._conn().execute(
+            'INSERT INTO blobs (digest, size, refs, touched) VALUES (?, ?, 0, ?) '
+            'ON CONFLICT (digest) DO UPDATE SET touched = excluded.touched',
+            (digest, size, time.time()),
+        )
+        return digest, size
+
+    def have(self, digests: Iterable[str]) -> List[str]:
+        """Return the subset of ``digests`` already stored."""
+        wanted = [d for d in dict.fromkeys(digests) if is_digest(d)]
+        found: List[str] = []
+        conn = self._conn()
+        for i in range(0, len(wanted), 500):
+            batch = wanted[i:i + 500]
+            rows = conn.execute(
+                f'SELECT digest FROM blobs WHERE digest IN ({",".join("?" * len(batch))})', batch
+            ).fetchall()
+            found.extend(r[0] for r in rows)
+        stored = set(found)
+        return [d for d in wanted if d in stored]
+
+    # --- views ---
+    def link(self, digest: str, view_dir: str, name: str) -> str:
+        """Expose object ``digest`` as ``view_dir/name`` and return the path.
+
+        An existing entry of that name is replaced and its old object
+        loses a reference.  Raises KeyError for unknown content and
+        ValueError for names that are not plain filenames.
+        """
+        if not is_filename(name):
+            raise ValueError(f'invalid file name: {name!r}')
+        source = self.path(digest)
+        view = self._view_key(view_dir)
+        target = os.path.join(view_dir, name)
+        os.makedirs(view_dir, exist_ok=True)
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute('SELECT 1 FROM blobs WHERE digest = ?', (digest,)).fetchone() is None \
+                    or not os.path.exists(source):
+                raise KeyError(digest)
+            row = conn.execute('SELECT digest FROM views WHERE view = ? AND name = ?', (view, name)).fetchone()
+            if row and row[0] == digest and os.path.exists(target):
+                conn.execute('COMMIT')
+                return target
+            _place(source, target)
+            if row:
+                conn.execute('UPDATE blobs SET refs = refs - 1 WHERE digest = ?', (row[0],))
+            conn.execute('INSERT OR REPLACE INTO views (view, name, digest) VALUES (?, ?, ?)', (view, name, digest))
+            conn.execute('UPDATE blobs SET refs = refs + 1 WHERE digest = ?', (digest,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return target
+
+    def store(self, stream: BinaryIO, view_dir: str, name: str) -> Tuple[str, str]:
+        """Put ``stream`` and link it as ``view_dir/name``; returns
+        ``(digest, path)``."""
+        digest, _ = self.put(stream)
+        return digest, self.link(digest, view_dir, name)
+
+    def unlink(self, view_dir: str, name: str) -> bool:
+        """Remove a view entry and drop its reference."""
+        view = self._view_key(view_dir)
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT digest FROM views WHERE view = ? AND name = ?', (view, name)).fetchone()
+            if row:
+                conn.execute('DELETE FROM views WHERE view = ? AND name = ?', (view, name))
+                conn.execute('UPDATE blobs SET refs = refs - 1 WHERE digest = ?', (row[0],))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        if row:
+            try:
+                os.remove(os.path.join(view_dir, name))
+            except FileNotFoundError:
+                pass
+        return row is not None
+
+    def views(self, digest: str) -> List[Tuple[str, str]]:
+        """``(view, name)`` entries that point at ``digest``."""
+        return self._conn().execute(
+            'SELECT view, name FROM views WHERE digest = ? ORDER BY view, name', (digest,)
+        ).fetchall()
+
+    def gc(self, min_age: float = 3600.0) -> int:
+        """Delete objects unreferenced and not put for ``min_age`` seconds,
+        and stale temporary files; returns the number of objects removed.
+        The age guard keeps objects that were just put but not yet linked."""
+        cutoff = time.time() - min_age
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            dead = [r[0] for r in conn.execute(
+                'SELECT digest FROM blobs WHERE refs <= 0 AND touched < ?', (cutoff,))]
+            conn.executemany('DELETE FROM blobs WHERE digest = ?', [(d,) for d in dead])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        for digest in dead:
+            try:
+                os.remove(self.path(digest))
+            except FileNotFoundError:
+                pass
+        for name in os.listdir(self.tmp_dir):
+            path = os.path.join(self.tmp_dir, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+        return len(dead)
+
+    def stats(self) -> Dict[str, int]:
+        blobs, stored, refs = self._conn().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(refs), 0) FROM blobs').fetchone()
+        logical = self._conn().execute(
+            'SELECT COALESCE(SUM(b.size), 0) FROM views v JOIN blobs b ON b.digest = v.digest').fetchone()[0]
+        return {'blobs': blobs, 'bytes': stored, 'refs': refs, 'view_bytes': logical}
+
+
+def _place(source: str, target: str) -> None:
+    """Make ``target`` a hard link to ``source`` (a copy when linking is
+    not possible), replacing whatever is there atomically."""
+    # Dot-prefixed so folder scanners skip the half-placed entry.
+    directory, name = os.path.split(target)
+    tmp = os.path.join(directory, f'.{name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    try:
+        os.replace(tmp, target)
+    except BaseException:
+        os.remove(tmp)
+        raise
@@ -0,0 +1,149 @@
+"""
+Per-project conversation history.
+
+Chat used to keep a single ``general`` list of the last ten messages and
+drop everything older.  ``ConversationStore`` keeps every message of
+every project (brand) instead:
+
+* the full history of a project is an append-only
+  :class:`~core.seglog.SegmentedLog` under ``<root>/<project>/``, so
+  appending a message is O(1) and older messages are read a page at a
+  time with a sequence-number cursor;
+* the most recent ``window`` messages are held in a ``deque`` ring
+  buffer per project for the hot context window.  Opening a project
+  only reads the tail of its newest segment, so a brand with a year of
+  chats loads as fast as a new one.
+
+Several worker processes may share the store: before the context is
+returned the buffer picks up messages other processes appended since,
+reading only those.
+
+Usage example:
+
+    >>> store = ConversationStore('memory/conversations')
+    >>> store.append('remote100k', 'user', 'Draft the launch email')
+    1
+    >>> store.context('remote100k')
+    [{'role': 'user', 'content': 'Draft the launch email', ...}]
+    >>> messages, cursor = store.history('remote100k', limit=50)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from core.seglog import SegmentedLog
+
+_PROJECT = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+
+def valid_project(name: str) -> bool:
+    """True for names usable as a project directory."""
+    return bool(_PROJECT.match(name)) and '..' not in name
+
+
+class _Conversation:
+    def __init__(self, log: SegmentedLog, window: int) -> None:
+        self.log = log
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=window)
+        self.lock = threading.Lock()
+        entries, _ = log.page(limit=window)
+        self.recent.extend(entries)
+
+    def _last_seq(self) -> int:
+        return self.recent[-1]['seq'] if self.recent else self.log.first_seq - 1
+
+    def catch_up(self) -> None:
+        """Pull in messages appended by other processes."""
+        last = self._last_seq()
+        newest = self.log.refresh()
+        if newest > last:
+            self.recent.extend(self.log.iter_from(max(last + 1, newest - self.recent.maxlen + 1)))
+
+
+class ConversationStore:
+    """Segmented message log plus in-memory window for each project."""
+
+    def __init__(self, root: str, window: int = 20, **log_options: Any) -> None:
+        self.root = root
+        self.window = window
+        self.log_options = log_options
+        self._conversations: Dict[str, _Conversation] = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _get(self, project: str) -> _Conversation:
+        if not valid_project(project):
+            raise ValueError(f'invalid project name: {project!r}')
+        with self._lock:
+            conversation = self._conversations.get(project)
+            if conversation is None:
+                log = SegmentedLog(os.path.join(self.root, project), **self.log_options)
+                conversation = _Conversation(log, self.window)
+                self._conversations[project] = conversation
+            return conversation
+
+    def projects(self) -> List[str]:
+        """Projects that have a conversation log."""
+        return sorted(d for d in os.listdir(self.root)
+                      if valid_project(d) and os.path.isdir(os.path.join(self.root, d)))
+
+    def append(self, project: str, role: str, content: str, timestamp: Optional[str] = None, **extra: Any) -> int:
+        """Append one message and return its sequence number."""
+        return self.extend(project, [dict(extra, role=role, content=content, timestamp=timestamp)])[-1]
+
+    def extend(self, project: str, messages: Iterable[Dict[str, Any]]) -> List[int]:
+        """Append several messages in order; returns their sequence numbers."""
+        conversation = self._get(project)
+        seqs = []
+        with conversation.lock:
+            conversation.catch_up()
+            for message in messages:
+                entry = dict(message)
+                entry['timestamp'] = entry.get('timestamp') or datetime.now().isoformat()
+                entry['seq'] = conversation.log.append(entry)
+                if entry['seq'] == conversation._last_seq() + 1:
+                    conversation.recent.append(entry)
+                else:
+                    # Another process appended in between; reload the gap.
+                    conversation.catch_up()
+                seqs.append(entry['seq'])
+        return seqs
+
+    def context(self, project: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """The newest ``limit`` (default: ``window``) messages, oldest first."""
+        conversation = self._get(project)
+        with conversation.lock:
+            conversation.catch_up()
+            recent = list(conversation.recent)
+        return recent if limit is None else recent[-limit:] if limit > 0 else []
+
+    def history(
+        self,
+        project: str,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        limit: int = 100,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """A page of the full history; see :meth:`SegmentedLog.page`."""
+        return self._get(project).log.page(before=before, after=after, limit=limit)
+
+    def import_messages(self, project: str, messages: List[Dict[str, Any]]) -> int:
+        """One-shot migration of a legacy message list into an empty
+        project; returns the number of imported messages."""
+        if not valid_project(project) or not isinstance(messages, list):
+            return 0
+        if len(self._get(project).log):
+            return 0
+        return len(self.extend(project, [m for m in messages if isinstance(m, dict)]))
+
+    def close(self) -> None:
+        with self._lock:
+            for conversation in self._conversations.values():
+                conversation.log.close()
+            self._conversations.clear()
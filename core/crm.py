@@ -1,53 +1,233 @@
+"""
+CRM storage for the three brands.
+
+Records live in an SQLite database (WAL mode) with one table per brand.
+Each brand has a natural key that doubles as a unique secondary index,
+so adding a record is an indexed upsert rather than a rewrite of the
+whole store, and duplicates merge into the existing row:
+
+* ``remote100k`` subscribers are keyed by ``email``.
+* ``tradeview_ai`` demo requests are keyed by ``contact``.
+* ``app_304`` TikTok leads are keyed by ``account``.
+
+Listings are cursor paginated on the row ID and can be filtered by any
+schema field.  A legacy ``crm.json`` next to the database is imported
+once and renamed to ``crm.json.migrated``; rows without a natural key
+cannot be stored, so they are counted in :attr:`CRM.migration` and
+remain only in that file.
+"""
+
 from __future__ import annotations
 
 import json
 import os
-from typing import Any, Dict, List
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Brand -> collection name used in API payloads, natural key and fields.
+BRAND_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "remote100k": {"collection": "subs", "key": "email", "fields": ("email", "plan", "entry_point")},
+    "tradeview_ai": {"collection": "demos", "key": "contact", "fields": ("contact", "timestamp")},
+    "app_304": {"collection": "leads", "key": "account", "fields": ("account", "name", "source")},
+}
+
+
+def normalize_key(brand: str, value: Any) -> str:
+    """Canonical form of a brand's natural key used for deduplication."""
+    key = str(value or "").strip().lower()
+    if brand == "app_304":
+        key = key.lstrip("@")
+    return key
 
 
 class CRM:
-    """Simple CRM storage backed by a JSON file."""
+    """Indexed CRM storage backed by SQLite."""
 
     def __init__(self, path: str | None = None) -> None:
         self.path = path or os.path.join(
-            os.path.dirname(os.path.abspath(__file__)), "..", "memory", "crm.json"
+            os.path.dirname(os.path.abspath(__file__)), "..", "memory", "crm.db"
         )
-        if os.path.exists(self.path):
-            with open(self.path, "r", encoding="utf-8") as f:
-                self.data: Dict[str, Any] = json.load(f)
-        else:
-            self.data = {
-                "remote100k": {"subs": []},
-                "tradeview_ai": {"demos": []},
-                "app_304": {"leads": []},
-            }
-            self._save()
-
-    def _save(self) -> None:
         os.makedirs(os.path.dirname(self.path), exist_ok=True)
-        with open(self.path, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, indent=2)
+        self._local = threading.local()
+        # {brand: {"imported": n, "skipped": n}} when this instance
+        # migrated a legacy crm.json, else None.
+        self.migration: Optional[Dict[str, Dict[str, int]]] = None
+        conn = self._conn()
+        for brand, schema in BRAND_SCHEMAS.items():
+            columns = ", ".join(f"{f} TEXT NOT NULL DEFAULT ''" for f in schema["fields"])
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {brand} ("
+                f"id INTEGER PRIMARY KEY AUTOINCREMENT, {columns}, "
+                f"created_at TEXT NOT NULL, updated_at TEXT NOT NULL)"
+            )
+            conn.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {brand}_{schema['key']} ON {brand} ({schema['key']})"
+            )
+            for field in schema["fields"]:
+                if field != schema["key"]:
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {brand}_{field} ON {brand} ({field}, id)")
+        self._migrate_json(os.path.splitext(self.path)[0] + ".json")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _migrate_json(self, json_path: str) -> None:
+        if not os.path.exists(json_path):
+            return
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        migration = {}
+        for brand, schema in BRAND_SCHEMAS.items():
+            rows = data.get(brand, {}).get(schema["collection"], [])
+            valid = [r for r in rows if isinstance(r, dict) and normalize_key(brand, r.get(schema["key"]))]
+            if valid:
+                self.upsert_many(brand, valid)
+            migration[brand] = {"imported": len(valid), "skipped": len(rows) - len(valid)}
+        os.replace(json_path, json_path + ".migrated")
+        self.migration = migration
+
+    @staticmethod
+    def _schema(brand: str) -> Dict[str, Any]:
+        try:
+            return BRAND_SCHEMAS[brand]
+        except KeyError:
+            raise ValueError(f"unknown brand '{brand}'") from None
+
+    # --- writes ---
+    def upsert_many(self, brand: str, records: Iterable[Dict[str, Any]]) -> Tuple[int, int]:
+        """Insert or merge ``records`` in one transaction.
+
+        Records sharing a natural key with an existing row update it;
+        empty fields never overwrite stored values.  Returns a tuple of
+        ``(inserted, updated)`` counts.
+
+        Raises:
+            ValueError: If the brand is unknown or a record has no key.
+        """
+        schema = self._schema(brand)
+        fields = schema["fields"]
+        key_field = schema["key"]
+        now = datetime.now().isoformat()
+        rows: Dict[str, Tuple[Any, ...]] = {}
+        for record in records:
+            key = normalize_key(brand, record.get(key_field))
+            if not key:
+                raise ValueError(f"{key_field} is required")
+            values = {f: str(record.get(f) or "").strip() for f in fields}
+            values[key_field] = key
+            if key in rows:
+                previous = dict(zip(fields, rows[key]))
+                values = {f: values[f] or previous[f] for f in fields}
+            rows[key] = tuple(values[f] for f in fields)
+        if not rows:
+            return 0, 0
+        conn = self._conn()
+        placeholders = ", ".join("?" for _ in fields)
+        updates = ", ".join(
+            f"{f} = CASE WHEN excluded.{f} = '' THEN {brand}.{f} ELSE excluded.{f} END"
+            for f in fields if f != key_field
+        )
+        sql = (
+            f"INSERT INTO {brand} ({', '.join(fields)}, created_at, updated_at) "
+            f"VALUES ({placeholders}, ?, ?) "
+            f"ON CONFLICT({key_field}) DO UPDATE SET "
+            f"{updates + ', ' if updates else ''}updated_at = excluded.updated_at"
+        )
+        keys = list(rows)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = 0
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                existing += conn.execute(
+                    f"SELECT COUNT(*) FROM {brand} WHERE {key_field} IN ({', '.join('?' for _ in chunk)})",
+                    chunk,
+                ).fetchone()[0]
+            conn.executemany(sql, [row + (now, now) for row in rows.values()])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(rows) - existing, existing
+
+    def upsert(self, brand: str, record: Dict[str, Any]) -> bool:
+        """Insert or merge a single record.  Returns True if it was new."""
+        inserted, _ = self.upsert_many(brand, [record])
+        return inserted == 1
 
     # --- Remote100K subscribers ---
     def add_remote100k_sub(self, email: str, plan: str, entry_point: str) -> None:
-        self.data.setdefault("remote100k", {}).setdefault("subs", []).append(
-            {"email": email, "plan": plan, "entry_point": entry_point}
-        )
-        self._save()
+        self.upsert("remote100k", {"email": email, "plan": plan, "entry_point": entry_point})
 
     # --- Tradeview demo requests ---
     def add_tradeview_demo(self, timestamp: str, contact: str) -> None:
-        self.data.setdefault("tradeview_ai", {}).setdefault("demos", []).append(
-            {"timestamp": timestamp, "contact": contact}
-        )
-        self._save()
+        self.upsert("tradeview_ai", {"timestamp": timestamp, "contact": contact})
 
     # --- TikTok DM leads for 304 App ---
     def add_tiktok_lead(self, name: str, account: str, source: str) -> None:
-        self.data.setdefault("app_304", {}).setdefault("leads", []).append(
-            {"name": name, "account": account, "source": source}
-        )
-        self._save()
+        self.upsert("app_304", {"name": name, "account": account, "source": source})
+
+    # --- reads ---
+    def find(self, brand: str, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a record by its natural key."""
+        schema = self._schema(brand)
+        row = self._conn().execute(
+            f"SELECT * FROM {brand} WHERE {schema['key']} = ?", (normalize_key(brand, key),)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def list(
+        self,
+        brand: str,
+        cursor: Optional[int] = None,
+        limit: int = 100,
+        filters: Optional[Dict[str, str]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Return a page of records ordered by ID and the next cursor.
+
+        ``filters`` maps schema fields to exact values; unknown fields
+        are ignored.  The cursor is None on the last page.
+        """
+        schema = self._schema(brand)
+        clauses = ["id > ?"]
+        params: List[Any] = [cursor or 0]
+        for field, value in (filters or {}).items():
+            if field in schema["fields"]:
+                if field == schema["key"]:
+                    value = normalize_key(brand, value)
+                clauses.append(f"{field} = ?")
+                params.append(value)
+        params.append(max(1, limit) + 1)
+        rows = self._conn().execute(
+            f"SELECT * FROM {brand} WHERE {' AND '.join(clauses)} ORDER BY id LIMIT ?", params
+        ).fetchall()
+        records = [dict(r) for r in rows[:max(1, limit)]]
+        next_cursor = records[-1]["id"] if len(rows) > len(records) else None
+        return records, next_cursor
+
+    def count(self, brand: str) -> int:
+        self._schema(brand)
+        return self._conn().execute(f"SELECT COUNT(*) FROM {brand}").fetchone()[0]
 
     def get_brand(self, brand: str) -> Any:
-        return self.data.get(brand, {})
+        """Return every record of a brand as ``{collection: [...]}``.
+
+        Prefer :meth:`list` for large brands; this loads all rows.
+        """
+        schema = BRAND_SCHEMAS.get(brand)
+        if schema is None:
+            return {}
+        rows = self._conn().execute(f"SELECT * FROM {brand} ORDER BY id").fetchall()
+        return {schema["collection"]: [dict(r) for r in rows]}
@@ -0,0 +1,207 @@
+"""
+Streaming bulk import for the CRM.
+
+Exported lead lists (CSV with a header row, or JSON Lines) are parsed
+one row at a time, validated and normalised against the brand schema
+in :data:`core.crm.BRAND_SCHEMAS`, and committed to the CRM in batches
+through :meth:`core.crm.CRM.upsert_many`.  Only the current batch and a
+capped sample of rejected rows are ever held in memory, so importing a
+file of any size uses bounded memory.
+
+The module doubles as a command line tool:
+
+    python -m core.crm_import remote100k subscribers.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+from .crm import BRAND_SCHEMAS, CRM, normalize_key
+
+FORMATS = ('csv', 'jsonl')
+
+
+@dataclass
+class ImportReport:
+    """Outcome of a bulk import.
+
+    ``inserted`` and ``updated`` count distinct records written; rows
+    repeating a key within one batch are merged before they are counted.
+    """
+
+    brand: str
+    inserted: int = 0
+    updated: int = 0
+    rejected: int = 0
+    rejected_rows: List[Dict[str, Any]] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def accepted(self) -> int:
+        return self.inserted + self.updated
+
+    @property
+    def rows_per_sec(self) -> float:
+        total = self.accepted + self.rejected
+        return total / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'brand': self.brand,
+            'accepted': self.accepted,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'rejected': self.rejected,
+            'rejected_rows': self.rejected_rows,
+            'elapsed_sec': round(self.elapsed, 3),
+            'rows_per_sec': round(self.rows_per_sec, 1),
+        }
+
+
+def detect_format(filename: Optional[str] = None, content_type: Optional[str] = None) -> str:
+    """Guess the upload format from its filename or content type."""
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext in {'.jsonl', '.ndjson'} or 'ndjson' in (content_type or '') or 'jsonl' in (content_type or ''):
+        return 'jsonl'
+    return 'csv'
+
+
+def _text(stream: IO[Any]) -> IO[str]:
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    if not hasattr(stream, 'read1'):
+        stream = io.BufferedReader(stream)  # type: ignore[arg-type]
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+
+
+def iter_rows(stream: IO[Any], fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield ``(line_number, row)`` pairs from a CSV or JSONL stream.
+
+    Rows that cannot be parsed are yielded as :class:`ValueError`
+    instances so the caller can count them as rejected.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unsupported format '{fmt}'")
+    text = _text(stream)
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        if reader.fieldnames:
+            reader.fieldnames = [(name or '').strip().lower() for name in reader.fieldnames]
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                # e.g. a field over csv.field_size_limit(); the reader
+                # carries on with the next line.
+                yield reader.line_num, ValueError(f'invalid CSV: {e}')
+                continue
+            yield reader.line_num, row
+    for line_no, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, ValueError(f'invalid JSON: {e.msg}')
+            continue
+        if not isinstance(row, dict):
+            yield line_no, ValueError('row is not an object')
+            continue
+        yield line_no, {str(k).strip().lower(): v for k, v in row.items()}
+
+
+def normalize_row(brand: str, row: Dict[str, Any]) -> Dict[str, str]:
+    """Validate a raw row against the brand schema and return the
+    normalised record.
+
+    Raises:
+        ValueError: If the natural key is missing or malformed.
+    """
+    schema = BRAND_SCHEMAS[brand]
+    record = {f: str(row.get(f) if row.get(f) is not None else '').strip() for f in schema['fields']}
+    key = normalize_key(brand, record[schema['key']])
+    if not key:
+        raise ValueError(f"{schema['key']} is required")
+    if schema['key'] == 'email' and ('@' not in key or key.startswith('@') or ' ' in key):
+        raise ValueError(f'invalid email: {key}')
+    record[schema['key']] = key
+    return record
+
+
+def import_stream(
+    crm: CRM,
+    brand: str,
+    stream: IO[Any],
+    fmt: str = 'csv',
+    batch_size: int = 1000,
+    max_rejected_samples: int = 100,
+) -> ImportReport:
+    """Import every row of ``stream`` into ``crm`` for ``brand``.
+
+    Rows are committed ``batch_size`` at a time.  Rejected rows are
+    counted and the first ``max_rejected_samples`` are kept, with their
+    line number and reason, for the report.
+    """
+    if brand not in BRAND_SCHEMAS:
+        raise ValueError(f"unknown brand '{brand}'")
+    report = ImportReport(brand=brand)
+    start = time.perf_counter()
+    batch: List[Dict[str, str]] = []
+
+    def commit() -> None:
+        inserted, updated = crm.upsert_many(brand, batch)
+        report.inserted += inserted
+        report.updated += updated
+        batch.clear()
+
+    for line_no, row in iter_rows(stream, fmt):
+        try:
+            if isinstance(row, ValueError):
+                raise row
+            batch.append(normalize_row(brand, row))
+        except ValueError as e:
+            report.rejected += 1
+            if len(report.rejected_rows) < max_rejected_samples:
+                report.rejected_rows.append({'line': line_no, 'error': str(e)})
+            continue
+        if len(batch) >= batch_size:
+            commit()
+    if batch:
+        commit()
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Bulk import CRM records from CSV or JSONL.')
+    parser.add_argument('brand', choices=sorted(BRAND_SCHEMAS))
+    parser.add_argument('file', help="path to the export, or '-' for stdin")
+    parser.add_argument('--format', choices=FORMATS, help='defaults to the file extension')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--db', help='CRM database path (defaults to memory/crm.db)')
+    args = parser.parse_args(argv)
+    fmt = args.format or detect_format(args.file)
+    crm = CRM(args.db)
+    if args.file == '-':
+        report = import_stream(crm, args.brand, sys.stdin.buffer, fmt, args.batch_size)
+    else:
+        with open(args.file, 'rb') as f:
+            report = import_stream(crm, args.brand, f, fmt, args.batch_size)
+    json.dump(report.to_dict(), sys.stdout, indent=2)
+    sys.stdout.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,480 @@
+"""
+Per-agent BM25 knowledge index.
+
+Training files uploaded through ``/api/agents/<name>/train`` land in
+``core/knowledge/<agent>/``.  ``KnowledgeIndex`` splits each file into
+passages of roughly ``passage_words`` words, tokenises them and keeps an
+inverted index (term → {passage: term frequency}) that is scored with
+Okapi BM25 at query time.  Ingestion is incremental: a sync only reads
+files whose size or modification time changed since the last one and
+drops passages of deleted files.
+
+Files are read in chunks and split into passages as the text streams
+in, so a large upload is never held in memory as one string.
+
+Each index is persisted as a directory of segments, one gzip-compressed
+JSON file per knowledge file holding its passages and term counts.  A
+sync rewrites only the segments of the files it ingested and deletes
+those of removed files, so its cost follows the upload rather than the
+corpus; a restart loads the segments without rescanning or re-parsing
+the knowledge folder.  Segments are written through a unique temporary
+file and ``os.replace``, so worker processes syncing the same agent
+never see a torn one.  ``KnowledgeBase`` manages one index per agent
+and runs syncs on a background thread.
+
+Usage example:
+
+    >>> kb = KnowledgeBase('core/knowledge')
+    >>> kb.sync('investor')
+    >>> kb.search('investor', 'dividend growth stocks', k=3)
+"""
+
+from __future__ import annotations
+
+import codecs
+import contextlib
+import gzip
+import hashlib
+import heapq
+import html
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from core.cache import TTLCache
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+_TAG = re.compile(r'<[^>]+>')
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+STOPWORDS = frozenset(
+    'a an and are as at be but by for from has have in is it its of on or that the this to was were '
+    'will with you your i we our they them he she his her not no do does did so if then than'.split()
+)
+TEXT_EXTENSIONS = {
+    '.txt', '.md', '.markdown', '.rst', '.csv', '.tsv', '.json', '.jsonl', '.yaml', '.yml',
+    '.html', '.htm', '.xml', '.py', '.js', '.ts',
+}
+INDEX_VERSION = 2
+SEGMENT_SUFFIX = '.json.gz'
+# Bytes read from a knowledge file at a time.
+READ_CHUNK = 1024 * 1024
+# Longest run of text without a blank line buffered before it is split.
+MAX_PARAGRAPH_CHARS = 64 * 1024
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case alphanumeric tokens without stopwords."""
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _decode(f: IO[bytes]) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    for block in iter(lambda: f.read(READ_CHUNK), b''):
+        yield decoder.decode(block)
+    yield decoder.decode(b'', final=True)
+
+
+def _strip_markup(chunks: Iterable[str], docx: bool = False) -> Iterator[str]:
+    """Drop tags and unescape entities chunk by chunk, holding back a tag
+    or entity cut off at the end of a chunk until the next one."""
+    def clean(text: str) -> str:
+        if docx:
+            return html.unescape(_TAG.sub('', text.replace('</w:p>', '\n\n')))
+        return html.unescape(_TAG.sub(' ', text))
+
+    pending = ''
+    for chunk in chunks:
+        text = pending + chunk
+        cut = len(text)
+        lt = text.rfind('<')
+        if lt >= 0 and '>' not in text[lt:]:
+            cut = lt
+        amp = text.rfind('&', max(0, cut - 32), cut)
+        if amp >= 0 and ';' not in text[amp:cut]:
+            cut = amp
+        text, pending = text[:cut], text[cut:]
+        yield clean(text)
+    if pending:
+        yield clean(pending)
+
+
+def iter_text(path: str) -> Iterator[str]:
+    """Yield the text of a knowledge file in chunks; nothing for
+    unsupported types.  Raises OSError (or ``zipfile.BadZipFile`` /
+    KeyError for a broken DOCX) if the file cannot be read."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.docx':
+        with zipfile.ZipFile(path) as z, z.open('word/document.xml') as f:
+            yield from _strip_markup(_decode(f), docx=True)
+        return
+    if ext not in TEXT_EXTENSIONS:
+        return
+    with open(path, 'rb') as f:
+        if ext in ('.html', '.htm', '.xml'):
+            yield from _strip_markup(_decode(f))
+        else:
+            yield from _decode(f)
+
+
+def read_text(path: str) -> Optional[str]:
+    """Return the whole text of a knowledge file, or None for
+    unsupported or unreadable files.  Indexing uses :func:`iter_text`."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext != '.docx' and ext not in TEXT_EXTENSIONS:
+        return None
+    try:
+        return ''.join(iter_text(path))
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return None
+
+
+def _paragraphs(chunks: Iterable[str]) -> Iterator[Tuple[str, bool]]:
+    """``(text, ends_paragraph)`` pieces of a chunk stream split at blank
+    lines.  A paragraph longer than ``MAX_PARAGRAPH_CHARS`` comes in
+    several pieces, cut at whitespace."""
+    buf = ''
+    for chunk in chunks:
+        buf += chunk
+        start = 0
+        for m in _PARAGRAPH_BREAK.finditer(buf):
+            if m.end() == len(buf):
+                break  # the break may continue in the next chunk
+            yield buf[start:m.start()], True
+            start = m.end()
+        buf = buf[start:]
+        if len(buf) > MAX_PARAGRAPH_CHARS:
+            cut = max(buf.rfind(' '), buf.rfind('\n'))
+            if cut > 0:
+                yield buf[:cut], False
+                buf = buf[cut:]
+    yield buf, True
+
+
+def split_passages(text: Union[str, Iterable[str]], passage_words: int = 120) -> List[str]:
+    """Group paragraphs into passages of about ``passage_words`` words;
+    longer paragraphs are cut into windows of that size.  ``text`` may
+    be a string or an iterable of chunks (see :func:`iter_text`)."""
+    passages: List[str] = []
+    current: List[str] = []
+    words: List[str] = []
+    for piece, ends in _paragraphs([text] if isinstance(text, str) else text):
+        words.extend(piece.split())
+        while len(words) > passage_words:
+            if current:
+                passages.append(' '.join(current))
+                current = []
+            passages.append(' '.join(words[:passage_words]))
+            words = words[passage_words:]
+        if not ends:
+            continue
+        current.extend(words)
+        words = []
+        if len(current) >= passage_words // 2:
+            passages.append(' '.join(current))
+            current = []
+    if current:
+        passages.append(' '.join(current))
+    return passages
+
+
+class KnowledgeIndex:
+    """BM25 inverted index over the files of one directory, persisted as
+    one segment per file under ``index_dir``."""
+
+    def __init__(
+        self,
+        directory: str,
+        index_dir: str,
+        passage_words: int = 120,
+        k1: float = 1.5,
+        b: float = 0.75,
+        prepared_cache: Optional[TTLCache] = None,
+    ) -> None:
+        self.directory = directory
+        self.index_dir = index_dir
+        self.passage_words = passage_words
+        self.k1 = k1
+        self.b = b
+        self.prepared_cache = prepared_cache
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        # file -> {'mtime_ns', 'size', 'docs': [doc ids]}
+        self.files: Dict[str, Dict[str, Any]] = {}
+        # doc id -> (file, passage number, token count, text)
+        self.docs: Dict[int, Tuple[str, int, int, str]] = {}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self._next_id = 0
+        self._total_len = 0
+        self.load()
+
+    # --- persistence ---
+    def _segment_path(self, rel: str) -> str:
+        name = hashlib.sha1(rel.encode('utf-8')).hexdigest()
+        return os.path.join(self.index_dir, name + SEGMENT_SUFFIX)
+
+    def load(self) -> None:
+        """Load the persisted segments, if there are any."""
+        try:
+            names = sorted(os.listdir(self.index_dir))
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.endswith(SEGMENT_SUFFIX):
+                continue
+            try:
+                with gzip.open(os.path.join(self.index_dir, name), 'rt', encoding='utf-8') as f:
+                    segment = json.load(f)
+            except (OSError, EOFError, json.JSONDecodeError):
+                continue  # re-ingested by the next sync
+            if segment.get('version') != INDEX_VERSION:
+                continue
+            prepared = [(number, passage, Counter(counts)) for number, passage, counts in segment['passages']]
+            with self._lock:
+                self._add_file(segment['file'], segment['mtime_ns'], segment['size'], prepared)
+
+    def _write_segment(self, rel: str, st: os.stat_result, prepared: List[Tuple[int, str, Counter]]) -> None:
+        """Persist one file's passages atomically."""
+        raw = json.dumps({
+            'version': INDEX_VERSION,
+            'file': rel,
+            'mtime_ns': st.st_mtime_ns,
+            'size': st.st_size,
+            'passages': [[number, passage, counts] for number, passage, counts in prepared],
+        }, separators=(',', ':')).encode('utf-8')
+        os.makedirs(self.index_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.index_dir, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(gzip.compress(raw, compresslevel=6))
+            os.replace(tmp, self._segment_path(rel))
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp)
+            raise
+
+    def _delete_segment(self, rel: str) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._segment_path(rel))
+
+    # --- ingestion ---
+    def _scan(self) -> Iterator[Tuple[str, os.stat_result]]:
+        for dirpath, dirnames, filenames in os.walk(self.directory):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for name in filenames:
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield os.path.relpath(path, self.directory).replace(os.sep, '/'), st
+
+    def _remove_file(self, rel: str) -> None:
+        for doc_id in self.files.pop(rel, {}).get('docs', []):
+            _, _, length, text = self.docs.pop(doc_id)
+            self._total_len -= length
+            for term in set(tokenize(text)):
+                plist = self.postings.get(term)
+                if plist is not None:
+                    plist.pop(doc_id, None)
+                    if not plist:
+                        del self.postings[term]
+
+    def _prepare(self, rel: str, st: os.stat_result) -> List[Tuple[int, str, Counter]]:
+        """Read and tokenise a file; runs without holding the index lock.
+
+        Files hard-linked from the blob store share an inode with every
+        other view of the same upload, so their passages are parsed
+        once and reused through ``prepared_cache``.
+        """
+        key = None
+        if self.prepared_cache is not None and st.st_nlink > 1:
+            key = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size, self.passage_words)
+            cached = self.prepared_cache.get(key)
+            if cached is not None:
+                return cached
+        try:
+            passages = split_passages(iter_text(os.path.join(self.directory, rel)), self.passage_words)
+        except (OSError, KeyError, zipfile.BadZipFile):
+            passages = []
+        prepared = []
+        for number, passage in enumerate(passages):
+            counts = Counter(tokenize(passage))
+            if counts:
+                prepared.append((number, passage, counts))
+        if key is not None:
+            self.prepared_cache.set(key, prepared)
+        return prepared
+
+    def _add_file(self, rel: str, mtime_ns: int, size: int, prepared: List[Tuple[int, str, Counter]]) -> None:
+        doc_ids = []
+        for number, passage, counts in prepared:
+            doc_id = self._next_id
+            self._next_id += 1
+            length = sum(counts.values())
+            self.docs[doc_id] = (rel, number, length, passage)
+            self._total_len += length
+            for term, tf in counts.items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+            doc_ids.append(doc_id)
+        self.files[rel] = {'mtime_ns': mtime_ns, 'size': size, 'docs': doc_ids}
+
+    def sync(self) -> Dict[str, int]:
+        """Ingest new and changed files and drop deleted ones, updating
+        only their segments.  Returns counts of each.
+
+        Files are parsed outside the index lock so searches keep being
+        answered while a large upload is ingested.
+        """
+        with self._sync_lock:
+            seen: Set[str] = set()
+            added = changed = 0
+            for rel, st in self._scan():
+                seen.add(rel)
+                known = self.files.get(rel)
+                if known and known['mtime_ns'] == st.st_mtime_ns and known['size'] == st.st_size:
+                    continue
+                prepared = self._prepare(rel, st)
+                with self._lock:
+                    if known:
+                        self._remove_file(rel)
+                    self._add_file(rel, st.st_mtime_ns, st.st_size, prepared)
+                self._write_segment(rel, st, prepared)
+                if known:
+                    changed += 1
+                else:
+                    added += 1
+            with self._lock:
+                removed = [rel for rel in self.files if rel not in seen]
+                for rel in removed:
+                    self._remove_file(rel)
+            for rel in removed:
+                self._delete_segment(rel)
+        return {'added': added, 'changed': changed, 'removed': len(removed)}
+
+    # --- retrieval ---
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Return the ``k`` best passages for ``query`` by BM25 score."""
+        with self._lock:
+            n = len(self.docs)
+            if not n:
+                return []
+            avgdl = self._total_len / n
+            scores: Dict[int, float] = {}
+            for term in set(tokenize(query)):
+                plist = self.postings.get(term)
+                if not plist:
+                    continue
+                idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+                for doc_id, tf in plist.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.docs[doc_id][2] / avgdl)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [
+                {'file': self.docs[d][0], 'passage': self.docs[d][1], 'score': round(s, 4), 'text': self.docs[d][3]}
+                for d, s in best
+            ]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'files': len(self.files), 'passages': len(self.docs), 'terms': len(self.postings)}
+
+
+class KnowledgeBase:
+    """One :class:`KnowledgeIndex` per agent folder under ``root``, kept
+    up to date by a background thread."""
+
+    def __init__(self, root: str, index_dir: Optional[str] = None) -> None:
+        self.root = root
+        self.index_dir = index_dir or os.path.join(root, '.index')
+        self._indexes: Dict[str, KnowledgeIndex] = {}
+        # Parsed passages of hard-linked uploads, shared across agents.
+        self.prepared = TTLCache(maxsize=32, ttl=None)
+        self._listeners: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._wakeup = threading.Condition(self._lock)
+        self._busy = False
+        self._thread: Optional[threading.Thread] = None
+
+    def agents(self) -> List[str]:
+        """Names of the agent folders under ``root``."""
+        try:
+            return sorted(d for d in os.listdir(self.root)
+                          if not d.startswith('.') and os.path.isdir(os.path.join(self.root, d)))
+        except FileNotFoundError:
+            return []
+
+    def index(self, agent: str) -> KnowledgeIndex:
+        with self._lock:
+            index = self._indexes.get(agent)
+            if index is None:
+                index = KnowledgeIndex(
+                    os.path.join(self.root, agent),
+                    os.path.join(self.index_dir, agent),
+                    prepared_cache=self.prepared,
+                )
+                # Single-file index written by earlier versions.
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(self.index_dir, f'{agent}.json.gz'))
+                self._indexes[agent] = index
+            return index
+
+    def on_change(self, callback: Callable[[str], None]) -> None:
+        """Call ``callback(agent)`` whenever a sync finds new, changed or
+        deleted files for that agent."""
+        self._listeners.append(callback)
+
+    def sync(self, agent: str) -> Dict[str, int]:
+        """Bring ``agent``'s index up to date on the calling thread."""
+        counts = self.index(agent).sync()
+        if any(counts.values()):
+            for callback in list(self._listeners):
+                callback(agent)
+        return counts
+
+    def search(self, agent: str, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        return self.index(agent).search(query, k)
+
+    def schedule(self, *agents: str) -> None:
+        """Sync the given agents (default: all) in the background."""
+        with self._lock:
+            self._pending.update(agents or self.agents())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='knowledge-index', daemon=True)
+                self._thread.start()
+            self._wakeup.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._busy = False
+                    self._wakeup.notify_all()
+                    self._wakeup.wait()
+                agent = self._pending.pop()
+                self._busy = True
+            try:
+                self.sync(agent)
+            except Exception:
+                # A broken file must not stop indexing of later uploads.
+                pass
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until scheduled syncs have finished."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while self._pending or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._wakeup.wait(remaining)
+        return True
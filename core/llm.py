@@ -0,0 +1,492 @@
+"""
+Pooled client for OpenAI-compatible chat completion APIs.
+
+Every reply Ajax or a sub-agent generates goes through one
+``LLMClient`` so the process keeps a handful of warm connections to the
+model endpoint instead of paying a TCP/TLS handshake per message:
+
+* idle HTTP/1.1 keep-alive connections are kept in a pool and reused
+  most-recently-used first; a connection the server closed while idle
+  is replaced transparently;
+* at most ``max_connections`` requests are in flight at once; further
+  callers wait for a slot (up to their timeout) instead of flooding the
+  upstream rate limit;
+* every call takes a ``timeout`` covering the wait for a slot, the
+  connect and each read;
+* connection errors, timeouts and 408/409/429/5xx answers are retried
+  with jittered exponential backoff (``Retry-After`` is honoured).  A
+  stream is only retried before its first chunk arrived;
+* :meth:`LLMClient.stream` yields content deltas of a server-sent event
+  stream as they arrive;
+* :meth:`LLMClient.astream` does the same on an asyncio event loop over
+  its own pool of non-blocking connections, so the async server can
+  hold many model streams open without a thread per reply.
+
+Only the standard library is used.  :meth:`LLMClient.from_env` builds a
+client from ``OPENAI_API_KEY``/``OPENAI_BASE_URL`` and returns None when
+neither is set, in which case the agents keep their offline replies.
+``tools.fake_openai`` serves the same API locally for tests and
+benchmarks.
+
+Usage example:
+
+    >>> llm = LLMClient('http://127.0.0.1:8100/v1', model='gpt-4o-mini')
+    >>> llm.complete([{'role': 'user', 'content': 'Hi'}], temperature=0.2)
+    'Echo: Hi'
+    >>> for delta in llm.stream([{'role': 'user', 'content': 'Hi'}]):
+    ...     print(delta, end='')
+    >>> async for delta in llm.astream([{'role': 'user', 'content': 'Hi'}]):
+    ...     print(delta, end='')
+"""
+
+from __future__ import annotations
+
+import asyncio
+import http.client
+import json
+import os
+import random
+import ssl
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+DEFAULT_BASE_URL = 'https://api.openai.com/v1'
+DEFAULT_MODEL = 'gpt-4o-mini'
+_RETRY_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+# Raised when a pooled connection turns out to have been closed by the
+# server while it sat idle; such a request is resent at once.
+_STALE = (http.client.RemoteDisconnected, http.client.CannotSendRequest, ConnectionResetError, BrokenPipeError)
+
+Messages = List[Dict[str, str]]
+AsyncConnection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class LLMError(RuntimeError):
+    """The model endpoint failed or kept failing after all retries."""
+
+    def __init__(self, message: str, status: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class LLMClient:
+    """Thread-safe chat completion client with a keep-alive pool."""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        model: str = DEFAULT_MODEL,
+        timeout: float = 60.0,
+        max_connections: int = 8,
+        max_retries: int = 2,
+        backoff: float = 0.5,
+        **defaults: Any,
+    ) -> None:
+        url = urlsplit((base_url or DEFAULT_BASE_URL).rstrip('/'))
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            raise ValueError(f'unsupported base URL: {base_url!r}')
+        self.base_url = url.geturl()
+        self.model = model
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff = backoff
+        #: Request fields sent with every call (temperature …).
+        self.defaults = defaults
+        self._https = url.scheme == 'https'
+        self._host = url.hostname
+        self._port = url.port
+        self._path = url.path + '/chat/completions'
+        self._headers = {'Content-Type': 'application/json'}
+        if api_key:
+            self._headers['Authorization'] = f'Bearer {api_key}'
+        self._ssl = ssl.create_default_context() if self._https else None
+        self._idle: Deque[http.client.HTTPConnection] = deque()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        # Non-blocking connections used by astream, bound to the event
+        # loop that opened them.
+        self._aloop: Optional[asyncio.AbstractEventLoop] = None
+        self._aidle: Deque[AsyncConnection] = deque()
+        self._aslots: Optional[asyncio.Semaphore] = None
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.opened = 0
+
+    @classmethod
+    def from_env(cls) -> Optional['LLMClient']:
+        """Client configured from the environment, or None when neither
+        ``OPENAI_API_KEY`` nor ``OPENAI_BASE_URL`` is set."""
+        api_key = os.getenv('OPENAI_API_KEY')
+        base_url = os.getenv('OPENAI_BASE_URL')
+        if not api_key and not base_url:
+            return None
+        return cls(
+            base_url=base_url,
+            api_key=api_key,
+            model=os.getenv('LLM_MODEL', DEFAULT_MODEL),
+            timeout=float(os.getenv('LLM_TIMEOUT', '60')),
+            max_connections=int(os.getenv('LLM_MAX_CONNECTIONS', '8')),
+            max_retries=int(os.getenv('LLM_MAX_RETRIES', '2')),
+        )
+
+    def settings(self) -> Dict[str, Any]:
+        """Model name and default request fields; agents fold these into
+        their ``model_params`` so cached replies are keyed by them."""
+        return dict(self.defaults, model=self.model)
+
+    # --- connection pool ---
+    @contextmanager
+    def _slot(self, timeout: float) -> Iterator[None]:
+        if not self._slots.acquire(timeout=timeout):
+            raise LLMError(f'no free connection to {self.base_url} within {timeout}s')
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def _checkout(self, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                self.opened += 1
+        if conn is None:
+            if self._https:
+                conn = http.client.HTTPSConnection(self._host, self._port, timeout=timeout, context=self._ssl)
+            else:
+                conn = http.client.HTTPConnection(self._host, self._port, timeout=timeout)
+            return conn, False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def _checkin(self, conn: http.client.HTTPConnection, resp: http.client.HTTPResponse) -> None:
+        if resp.will_close:
+            conn.close()
+            return
+        with self._lock:
+            self._idle.append(conn)
+
+    # --- requests ---
+    def _body(self, messages: Messages, params: Dict[str, Any], stream: bool) -> bytes:
+        payload = dict(self.defaults, model=self.model)
+        payload.update(params)
+        payload['messages'] = messages
+        payload['stream'] = stream
+        return json.dumps(payload).encode('utf-8')
+
+    def _delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        try:
+            if retry_after is not None:
+                return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    def _send(self, body: bytes, timeout: float, stream: bool) -> Tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        """POST ``body`` and return the connection and a 200 response
+        whose body is still unread; retries per the class policy."""
+        headers = dict(self._headers, Accept='text/event-stream' if stream else 'application/json')
+        with self._lock:
+            self.requests += 1
+        attempt = 0
+        while True:
+            conn, reused = self._checkout(timeout)
+            retry_after = None
+            try:
+                conn.request('POST', self._path, body, headers)
+                resp = conn.getresponse()
+            except _STALE as e:
+                conn.close()
+                if reused:
+                    continue
+                error = LLMError(f'{self.base_url}: {e!r}')
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                error = LLMError(f'{self.base_url}: {e!r}')
+            else:
+                if resp.status == 200:
+                    return conn, resp
+                try:
+                    detail = json.loads(resp.read() or b'{}').get('error', {}).get('message', '')
+                except (ValueError, AttributeError):
+                    detail = ''
+                self._checkin(conn, resp)
+                error = LLMError(f'{self.base_url} answered {resp.status} {resp.reason}: {detail}'.rstrip(': '), resp.status)
+                if resp.status not in _RETRY_STATUS:
+                    with self._lock:
+                        self.failures += 1
+                    raise error
+                retry_after = resp.getheader('Retry-After')
+            if attempt >= self.max_retries:
+                with self._lock:
+                    self.failures += 1
+                raise error
+            time.sleep(self._delay(attempt, retry_after))
+            attempt += 1
+            with self._lock:
+                self.retries += 1
+
+    def complete(self, messages: Messages, timeout: Optional[float] = None, **params: Any) -> str:
+        """Return the assistant message for ``messages``.  ``params``
+        override the default request fields (``model``, ``temperature``
+        …)."""
+        timeout = self.timeout if timeout is None else timeout
+        body = self._body(messages, params, stream=False)
+        with self._slot(timeout):
+            conn, resp = self._send(body, timeout, stream=False)
+            try:
+                data = json.loads(resp.read())
+            except (OSError, ValueError, http.client.HTTPException) as e:
+                conn.close()
+                with self._lock:
+                    self.failures += 1
+                raise LLMError(f'{self.base_url}: unreadable response: {e!r}') from e
+            self._checkin(conn, resp)
+        try:
+            return data['choices'][0]['message'].get('content') or ''
+        except (KeyError, IndexError, TypeError) as e:
+            raise LLMError(f'{self.base_url}: unexpected response shape') from e
+
+    def stream(self, messages: Messages, timeout: Optional[float] = None, **params: Any) -> Iterator[str]:
+        """Yield content deltas of a streamed completion.
+
+        The connection returns to the pool once the stream is read to
+        the end; abandoning the iterator early closes it instead.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        body = self._body(messages, params, stream=True)
+        with self._slot(timeout):
+            conn, resp = self._send(body, timeout, stream=True)
+            finished = False
+            try:
+                while True:
+                    line = resp.readline()
+                    if not line:
+                        finished = True
+                        break
+                    if not line.startswith(b'data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == b'[DONE]':
+                        resp.read()
+                        finished = True
+                        break
+                    try:
+                        choices = json.loads(data).get('choices') or [{}]
+                    except (ValueError, AttributeError):
+                        continue
+                    delta = (choices[0].get('delta') or {}).get('content')
+                    if delta:
+                        yield delta
+            except (OSError, http.client.HTTPException) as e:
+                with self._lock:
+                    self.failures += 1
+                raise LLMError(f'{self.base_url}: stream interrupted: {e!r}') from e
+            finally:
+                if finished:
+                    self._checkin(conn, resp)
+                else:
+                    conn.close()
+
+    # --- asyncio ---
+    def _async_state(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._aloop is not loop:
+            # Connections and the semaphore belong to one loop; a new
+            # loop (a test, a restarted server) starts afresh.
+            for _, writer in self._aidle:
+                writer.transport.abort()
+            self._aloop, self._aidle = loop, deque()
+            self._aslots = asyncio.Semaphore(self.max_connections)
+        return self._aslots
+
+    async def _aopen(self, timeout: float) -> Tuple[AsyncConnection, bool]:
+        while self._aidle:
+            reader, writer = self._aidle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return (reader, writer), True
+            writer.transport.abort()
+        with self._lock:
+            self.opened += 1
+        connection = await asyncio.wait_for(
+            asyncio.open_connection(self._host, self._port or (443 if self._https else 80), ssl=self._ssl),
+            timeout)
+        return connection, False
+
+    async def _aread_head(self, reader: asyncio.StreamReader, timeout: float) -> Tuple[int, str, Dict[str, str]]:
+        line = await asyncio.wait_for(reader.readline(), timeout)
+        if not line:
+            raise ConnectionResetError('connection closed before the response')
+        parts = line.decode('latin-1').split(' ', 2)
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise http.client.BadStatusLine(line.decode('latin-1', 'replace'))
+        headers: Dict[str, str] = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return int(parts[1]), parts[2].strip() if len(parts) > 2 else '', headers
+
+    @staticmethod
+    async def _abody(reader: asyncio.StreamReader, headers: Dict[str, str], timeout: float) -> AsyncIterator[bytes]:
+        """Yield the raw body of a response (chunked, sized or read to
+        the end of the connection)."""
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            while True:
+                size = int((await asyncio.wait_for(reader.readline(), timeout)).split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    while (await asyncio.wait_for(reader.readline(), timeout)) not in (b'\r\n', b'\n', b''):
+                        pass  # trailers
+                    return
+                data = await asyncio.wait_for(reader.readexactly(size + 2), timeout)
+                yield data[:-2]
+        elif 'content-length' in headers:
+            remaining = int(headers['content-length'])
+            while remaining > 0:
+                data = await asyncio.wait_for(reader.read(min(remaining, 65536)), timeout)
+                if not data:
+                    raise asyncio.IncompleteReadError(b'', remaining)
+                remaining -= len(data)
+                yield data
+        else:
+            while True:
+                data = await asyncio.wait_for(reader.read(65536), timeout)
+                if not data:
+                    return
+                yield data
+
+    @staticmethod
+    def _reusable(headers: Dict[str, str]) -> bool:
+        framed = 'content-length' in headers or 'chunked' in headers.get('transfer-encoding', '').lower()
+        return framed and headers.get('connection', '').lower() != 'close'
+
+    async def _asend(self, body: bytes, timeout: float) -> Tuple[AsyncConnection, Dict[str, str]]:
+        """Async counterpart of :meth:`_send` for a streamed request."""
+        with self._lock:
+            self.requests += 1
+        host = self._host if self._port is None else f'{self._host}:{self._port}'
+        head = ''.join(f'{k}: {v}\r\n' for k, v in dict(
+            self._headers, Host=host, Accept='text/event-stream', **{'Content-Length': str(len(body))}).items())
+        request = f'POST {self._path} HTTP/1.1\r\n{head}\r\n'.encode('latin-1') + body
+        attempt = 0
+        while True:
+            connection, reused = await self._aopen(timeout)
+            reader, writer = connection
+            retry_after = None
+            try:
+                writer.write(request)
+                await asyncio.wait_for(writer.drain(), timeout)
+                status, reason, headers = await self._aread_head(reader, timeout)
+            except _STALE as e:
+                writer.transport.abort()
+                if reused:
+                    continue
+                error = LLMError(f'{self.base_url}: {e!r}')
+            except (OSError, asyncio.TimeoutError, http.client.HTTPException) as e:
+                writer.transport.abort()
+                error = LLMError(f'{self.base_url}: {e!r}')
+            else:
+                if status == 200:
+                    return connection, headers
+                raw = b''
+                try:
+                    async for data in self._abody(reader, headers, timeout):
+                        raw += data
+                    detail = json.loads(raw or b'{}').get('error', {}).get('message', '')
+                except (ValueError, AttributeError, OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    detail = ''
+                if self._reusable(headers):
+                    self._aidle.append(connection)
+                else:
+                    writer.transport.abort()
+                error = LLMError(f'{self.base_url} answered {status} {reason}: {detail}'.rstrip(': '), status)
+                if status not in _RETRY_STATUS:
+                    with self._lock:
+                        self.failures += 1
+                    raise error
+                retry_after = headers.get('retry-after')
+            if attempt >= self.max_retries:
+                with self._lock:
+                    self.failures += 1
+                raise error
+            await asyncio.sleep(self._delay(attempt, retry_after))
+            attempt += 1
+            with self._lock:
+                self.retries += 1
+
+    async def astream(self, messages: Messages, timeout: Optional[float] = None, **params: Any) -> AsyncIterator[str]:
+        """Async counterpart of :meth:`stream`, awaited on the running
+        event loop.  At most ``max_connections`` async streams are open
+        at once; the connection is reused once the stream was read to
+        the end."""
+        timeout = self.timeout if timeout is None else timeout
+        body = self._body(messages, params, stream=True)
+        slots = self._async_state()
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise LLMError(f'no free connection to {self.base_url} within {timeout}s') from None
+        try:
+            connection, headers = await self._asend(body, timeout)
+            finished = False
+            buffer = b''
+            try:
+                async for data in self._abody(connection[0], headers, timeout):
+                    buffer += data
+                    *lines, buffer = buffer.split(b'\n')
+                    for line in lines:
+                        if not line.startswith(b'data:'):
+                            continue
+                        payload = line[5:].strip()
+                        if payload == b'[DONE]':
+                            continue
+                        try:
+                            choices = json.loads(payload).get('choices') or [{}]
+                        except (ValueError, AttributeError):
+                            continue
+                        delta = (choices[0].get('delta') or {}).get('content')
+                        if delta:
+                            yield delta
+                finished = True
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                with self._lock:
+                    self.failures += 1
+                raise LLMError(f'{self.base_url}: stream interrupted: {e!r}') from e
+            finally:
+                if finished and self._reusable(headers):
+                    self._aidle.append(connection)
+                else:
+                    connection[1].transport.abort()
+        finally:
+            slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            idle = len(self._idle) + len(self._aidle)
+        return {
+            'base_url': self.base_url,
+            'model': self.model,
+            'requests': self.requests,
+            'retries': self.retries,
+            'failures': self.failures,
+            'connections_opened': self.opened,
+            'idle_connections': idle,
+            'max_connections': self.max_connections,
+        }
+
+    def close(self) -> None:
+        """Close the idle connections; the client stays usable."""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            conn.close()
@@ -0,0 +1,336 @@
+"""
+Write-behind persistence helpers.
+
+``atomic_write_json`` writes a JSON document through a temporary file
+and ``os.replace`` so readers never observe a half-written file.
+
+``JournaledState`` persists a ``{"brands": {...}, "actions": [...]}``
+memory document without re-serialising it on every change.  Actions are
+appended to a JSON Lines journal and the brand state is rebuilt from a
+periodic snapshot plus the journal entries written after it.  Each
+snapshot compacts the journal, so loading costs the snapshot plus the
+actions recorded since, never the whole history; only the most recent
+``keep_actions`` actions are held in memory.  Changes are buffered in
+memory and flushed together, either after ``flush_interval`` seconds,
+once ``max_pending`` actions are waiting, on an explicit
+:meth:`JournaledState.flush` or at interpreter shutdown.  A failed
+append leaves the journal as it was and the actions pending, so the
+next flush writes them again.
+
+Several processes may share one snapshot and journal.  Appends and
+compactions hold an ``flock`` of ``<journal>.lock`` and first catch up
+with what other processes wrote: new journal lines are applied, and a
+journal replaced by another process's compaction means reloading its
+snapshot.  Compaction swaps in a new empty journal file rather than
+truncating, which is how the others notice it.
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import json
+import logging
+import os
+import threading
+import weakref
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+# Every live JournaledState, snapshotted once at interpreter shutdown
+# without keeping the instances alive.
+_instances: 'weakref.WeakSet[JournaledState]' = weakref.WeakSet()
+
+
+@atexit.register
+def _snapshot_all() -> None:
+    for state in list(_instances):
+        state.snapshot()
+
+
+def atomic_write_json(path: str, data: Any, indent: Optional[int] = 2) -> None:
+    """Write ``data`` to ``path`` via a temp file and an atomic rename."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _apply(brands: Dict[str, Any], action: Dict[str, Any]) -> None:
+    brands.setdefault(action.get('brand'), {})[action.get('key')] = action.get('value')
+
+
+class JournaledState:
+    """Snapshot + append-only journal with coalesced, delayed writes."""
+
+    def __init__(
+        self,
+        snapshot_path: str,
+        journal_path: Optional[str] = None,
+        flush_interval: float = 1.0,
+        max_pending: int = 256,
+        snapshot_every: int = 1000,
+        keep_actions: int = 1000,
+    ) -> None:
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or os.path.splitext(snapshot_path)[0] + '.actions.jsonl'
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.snapshot_every = snapshot_every
+        self.keep_actions = keep_actions
+        self._lock = threading.RLock()
+        self._pending: List[Dict[str, Any]] = []
+        self._since_snapshot = 0
+        self._timer: Optional[threading.Timer] = None
+        self._lock_fh: Any = None
+        self._lock_depth = 0
+        # Identity of the journal file this process has read and how far.
+        self._journal_ino: Optional[int] = None
+        self._offset = 0
+        self.state: Dict[str, Any] = {}
+        _instances.add(self)
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the thread lock and, where available, the journal flock."""
+        with self._lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                if self._lock_fh is None:
+                    os.makedirs(os.path.dirname(self.journal_path) or '.', exist_ok=True)
+                    self._lock_fh = open(self.journal_path + '.lock', 'a')
+                fcntl.flock(self._lock_fh.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and fcntl is not None:
+                    fcntl.flock(self._lock_fh.fileno(), fcntl.LOCK_UN)
+
+    def load(self, default_brands: Dict[str, Any]) -> Dict[str, Any]:
+        """Load the snapshot and replay the journal written after it.
+
+        ``state["actions"]`` holds the ``keep_actions`` most recent
+        actions.  A legacy snapshot that still embeds its whole
+        ``actions`` list is migrated to a fresh snapshot.
+        """
+        with self._locked():
+            self._repair_journal()
+            snapshot = self._read_snapshot()
+            if snapshot is None:
+                snapshot = {'brands': default_brands, 'journal_offset': 0}
+            brands = snapshot.get('brands', {})
+            legacy = snapshot.get('actions') if 'journal_offset' not in snapshot else None
+            if legacy and not os.path.exists(self.journal_path):
+                self.state = {'brands': brands, 'actions': self._recent(legacy)}
+                self._write_snapshot()
+                return self.state
+            self.state = {'brands': brands, 'actions': self._recent(snapshot.get('recent_actions', ()))}
+            self._journal_ino = self._stat_journal()
+            self._offset = snapshot.get('journal_offset', 0)
+            self._catch_up()
+            if self._journal_ino is None or self._since_snapshot >= self.snapshot_every:
+                self._write_snapshot()
+        return self.state
+
+    def refresh(self) -> None:
+        """Pick up actions other processes have written since the last
+        flush.  Cheap when nothing changed."""
+        with self._locked():
+            self._catch_up()
+
+    def record(self, action: Dict[str, Any]) -> None:
+        """Apply ``action`` to the in-memory state and schedule a write."""
+        with self._lock:
+            _apply(self.state.setdefault('brands', {}), action)
+            self.state.setdefault('actions', self._recent(())).append(action)
+            self._pending.append(action)
+            if len(self._pending) >= self.max_pending:
+                with self._locked():
+                    self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_later)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        """Write pending actions now, snapshotting if one is due."""
+        with self._locked():
+            self._flush_locked()
+
+    def _flush_later(self) -> None:
+        # Timer thread: nobody would see an exception, so log it and
+        # try again after another interval.
+        with self._lock:
+            self._timer = None
+            try:
+                with self._locked():
+                    self._flush_locked()
+            except OSError:
+                logger.exception('cannot write %s; %d actions still pending',
+                                 self.journal_path, len(self._pending))
+                if self._timer is None:
+                    self._timer = threading.Timer(self.flush_interval, self._flush_later)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+    def snapshot(self) -> None:
+        """Flush and write a snapshot so the journal needs no replay."""
+        with self._locked():
+            self._flush_locked()
+            self._catch_up()
+            if self._since_snapshot:
+                self._write_snapshot()
+
+    def _flush_locked(self) -> None:
+        # Called inside _locked().
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        self._catch_up()
+        self._offset = self._append_journal(self._pending)
+        self._since_snapshot += len(self._pending)
+        self._pending = []
+        if self._since_snapshot >= self.snapshot_every:
+            self._write_snapshot()
+
+    def _recent(self, actions: Iterable[Dict[str, Any]]) -> Deque[Dict[str, Any]]:
+        return deque(actions, maxlen=self.keep_actions)
+
+    def _read_snapshot(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _stat_journal(self) -> Optional[int]:
+        try:
+            return os.stat(self.journal_path).st_ino
+        except FileNotFoundError:
+            return None
+
+    def _catch_up(self) -> None:
+        """Apply what other processes wrote since this one last read.
+
+        Called inside _locked().  Pending actions of this process stay
+        the most recent ones: they are appended after everything read
+        here.
+        """
+        ino = self._stat_journal()
+        reloaded = ino != self._journal_ino
+        if reloaded:
+            # Another process compacted; its snapshot covers every line
+            # it had read, including this process's flushed actions.
+            snapshot = self._read_snapshot() or {}
+            brands = snapshot.get('brands', {})
+            actions = self._recent(snapshot.get('recent_actions', ()))
+            self._journal_ino, self._offset, self._since_snapshot = ino, 0, 0
+        new, self._offset = self._read_journal(self._offset)
+        if not (reloaded or new):
+            return
+        if not reloaded:
+            brands, actions = self.state.setdefault('brands', {}), self.state.setdefault('actions', self._recent(()))
+            for _ in range(min(len(self._pending), len(actions))):
+                actions.pop()
+        for action in new + self._pending:
+            _apply(brands, action)
+            actions.append(action)
+        self.state['brands'], self.state['actions'] = brands, actions
+        self._since_snapshot += len(new)
+
+    def _append_journal(self, actions: List[Dict[str, Any]]) -> int:
+        """Append ``actions`` and return the new end of the journal, or
+        raise OSError with the journal cut back to its previous end so
+        no partial line is left to build on."""
+        os.makedirs(os.path.dirname(self.journal_path) or '.', exist_ok=True)
+        data = memoryview(''.join(json.dumps(a, ensure_ascii=False) + '\n' for a in actions).encode('utf-8'))
+        fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            start = os.lseek(fd, 0, os.SEEK_END)
+            try:
+                while data:
+                    data = data[os.write(fd, data):]
+            except OSError:
+                try:
+                    os.ftruncate(fd, start)
+                except OSError:
+                    pass  # a torn line is dropped by _repair_journal on load
+                raise
+            return os.lseek(fd, 0, os.SEEK_CUR)
+        finally:
+            os.close(fd)
+
+    def _read_journal(self, offset: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Complete actions from ``offset`` on and the offset after them."""
+        actions: List[Dict[str, Any]] = []
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(offset)
+                for raw in f:
+                    if not raw.endswith(b'\n'):
+                        break
+                    offset += len(raw)
+                    try:
+                        action = json.loads(raw)
+                    except ValueError:
+                        continue  # a damaged line loses only itself
+                    if isinstance(action, dict):
+                        actions.append(action)
+        except FileNotFoundError:
+            pass
+        return actions, offset
+
+    def _repair_journal(self) -> None:
+        """Drop a torn final line left behind by a crash mid-append,
+        cutting back to the last newline however far away it is."""
+        try:
+            with open(self.journal_path, 'r+b') as f:
+                end = f.seek(0, os.SEEK_END)
+                if not end:
+                    return
+                f.seek(end - 1)
+                if f.read(1) == b'\n':
+                    return
+                while end:
+                    start = max(0, end - 65536)
+                    f.seek(start)
+                    cut = f.read(end - start).rfind(b'\n')
+                    if cut >= 0:
+                        f.truncate(start + cut + 1)
+                        return
+                    end = start
+                f.truncate(0)
+        except FileNotFoundError:
+            pass
+
+    def _write_snapshot(self) -> None:
+        """Snapshot the state and compact the journal it now covers.
+
+        Called inside _locked() once caught up.  The snapshot points at
+        offset 0 before a new empty journal replaces the old one; a
+        crash in between only replays actions already in the snapshot,
+        which leaves the brand state unchanged.
+        """
+        atomic_write_json(self.snapshot_path, {
+            'brands': self.state.get('brands', {}),
+            'journal_offset': 0,
+            'recent_actions': list(self.state.get('actions', ())),
+        })
+        tmp = f'{self.journal_path}.{os.getpid()}.tmp'
+        open(tmp, 'wb').close()
+        os.replace(tmp, self.journal_path)
+        self._journal_ino, self._offset = self._stat_journal(), 0
+        self._since_snapshot = 0
@@ -0,0 +1,326 @@
+"""
+Lazy plugin registry for Ajax's sub-agents.
+
+Importing every agent module up front makes startup grow with the
+number of agents, and agents scaffolded through ``POST /api/agents``
+were never loaded at all.  ``PluginRegistry`` is a read-only mapping of
+agent name to agent instance that knows where each agent comes from
+but imports it only when it is first looked up (usually the first
+delegation):
+
+* **built-ins and explicit registrations** – ``"module:Class"`` specs
+  or ready instances passed to :meth:`PluginRegistry.add`;
+* **entry points** in the ``gpt_agent_core.agents`` group, so agents can
+  ship as separately installed packages;
+* **config directories** – every ``<root>/<name>/config.json``.  The
+  directory may hold an ``agent.py`` defining a :class:`BaseAgent`
+  subclass (picked by the config's ``"class"`` or as the only one
+  there); otherwise a :class:`~core.agents.config_agent.ConfigAgent` is
+  built from the config and ``training.md``.
+
+Listing names or testing membership never imports anything.  Config
+directories are rescanned at most every ``scan_interval`` seconds, so
+new and removed agents show up without a restart.  A loaded agent
+whose source files changed is re-imported and replaced on its next
+lookup (checked at most every ``check_interval`` seconds); if the new
+code fails to load the previous instance keeps serving and the error is
+reported by :meth:`PluginRegistry.describe`.
+
+Imports run outside the registry lock, under a lock of their own per
+agent, so a slow or hanging agent only holds up lookups of that agent;
+the finished instance is swapped in under the registry lock.
+
+Usage example:
+
+    >>> registry = PluginRegistry(config_dirs=['core/agents'])
+    >>> registry.add('investor', 'core.agents.investor_agent:InvestorAgent')
+    >>> 'investor' in registry       # nothing imported yet
+    True
+    >>> registry['investor'].handle_task('Analyse TSLA')
+"""
+
+from __future__ import annotations
+
+import importlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import types
+from collections.abc import Mapping
+from importlib import metadata
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from core.agents.base_agent import BaseAgent
+
+ENTRY_POINT_GROUP = 'gpt_agent_core.agents'
+_NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+# A file's (mtime_ns, size), or None while it does not exist.
+Stamp = Optional[Tuple[int, int]]
+
+
+class PluginError(RuntimeError):
+    """An agent plugin could not be imported or instantiated."""
+
+
+def _stamp(path: str) -> Stamp:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _instantiate(obj: Any) -> BaseAgent:
+    agent = obj if isinstance(obj, BaseAgent) else obj()
+    if not isinstance(agent, BaseAgent):
+        raise TypeError(f'{obj!r} did not produce a BaseAgent')
+    return agent
+
+
+class _Plugin:
+    def __init__(self, name: str, source: str, target: Any = None, directory: Optional[str] = None) -> None:
+        self.name = name
+        self.source = source          # builtin, instance, entry_point or config
+        self.target = target          # "module:attr", an EntryPoint or an instance
+        self.directory = directory
+        self.agent: Optional[BaseAgent] = None
+        self.watch: Dict[str, Stamp] = {}
+        self.checked = 0.0
+        self.loads = 0
+        self.load_ms = 0.0
+        self.error: Optional[str] = None
+        # Serialises loads of this plugin; ``attempts`` lets a thread
+        # that waited on it see that the load already happened.
+        self.lock = threading.Lock()
+        self.attempts = 0
+
+    def changed(self) -> bool:
+        return any(_stamp(path) != stamp for path, stamp in self.watch.items())
+
+
+class PluginRegistry(Mapping):
+    """Mapping of agent name to agent, imported on first lookup."""
+
+    def __init__(
+        self,
+        config_dirs: Optional[List[str]] = None,
+        entry_point_group: Optional[str] = None,
+        on_load: Optional[Callable[[str, BaseAgent], None]] = None,
+        scan_interval: float = 2.0,
+        check_interval: float = 1.0,
+    ) -> None:
+        self.config_dirs = list(config_dirs or [])
+        self.entry_point_group = entry_point_group
+        self.on_load = on_load
+        self.scan_interval = scan_interval
+        self.check_interval = check_interval
+        self._plugins: Dict[str, _Plugin] = {}
+        self._entry_points_read = False
+        self._scanned = float('-inf')
+        self._lock = threading.RLock()
+
+    # --- sources ---
+    def add(self, name: str, target: Any) -> None:
+        """Register an agent instance, or a ``"module:Class"`` spec that
+        is imported on first lookup.  Replaces any discovered plugin of
+        the same name."""
+        with self._lock:
+            if isinstance(target, str):
+                self._plugins[name] = _Plugin(name, 'builtin', target)
+                return
+            plugin = _Plugin(name, 'instance', target)
+            plugin.agent = target
+            plugin.loads = 1
+            plugin.checked = time.monotonic()
+            self._plugins[name] = plugin
+        if self.on_load is not None:
+            self.on_load(name, target)
+
+    def remove(self, name: str) -> None:
+        with self._lock:
+            self._plugins.pop(name, None)
+
+    def _read_entry_points(self) -> None:
+        self._entry_points_read = True
+        if not self.entry_point_group:
+            return
+        try:
+            found = metadata.entry_points(group=self.entry_point_group)
+        except TypeError:  # Python < 3.10
+            found = metadata.entry_points().get(self.entry_point_group, [])
+        for ep in found:
+            if ep.name not in self._plugins and _NAME.match(ep.name):
+                self._plugins[ep.name] = _Plugin(ep.name, 'entry_point', ep)
+
+    def refresh(self) -> None:
+        """Rescan the config directories now."""
+        with self._lock:
+            if not self._entry_points_read:
+                self._read_entry_points()
+            seen = set()
+            for root in self.config_dirs:
+                try:
+                    entries = sorted(os.listdir(root))
+                except OSError:
+                    continue
+                for entry in entries:
+                    directory = os.path.join(root, entry)
+                    if not _NAME.match(entry) or not os.path.isfile(os.path.join(directory, 'config.json')):
+                        continue
+                    seen.add(entry)
+                    if entry not in self._plugins:
+                        self._plugins[entry] = _Plugin(entry, 'config', directory=directory)
+            for name in [n for n, p in self._plugins.items() if p.source == 'config' and n not in seen]:
+                del self._plugins[name]
+            self._scanned = time.monotonic()
+
+    def _maybe_scan(self) -> None:
+        if time.monotonic() - self._scanned >= self.scan_interval:
+            self.refresh()
+
+    # --- loading ---
+    def _import_target(self, plugin: _Plugin) -> Tuple[BaseAgent, List[str]]:
+        if plugin.source == 'builtin':
+            module_name, _, attr = plugin.target.partition(':')
+            module = sys.modules.get(module_name)
+            module = importlib.reload(module) if plugin.loads and module else importlib.import_module(module_name)
+            return _instantiate(getattr(module, attr)), [module.__file__]
+        if plugin.source == 'entry_point':
+            ep = plugin.target
+            module = sys.modules.get(ep.module)
+            if plugin.loads and module:
+                importlib.reload(module)
+            obj = ep.load()
+            return _instantiate(obj), [sys.modules[ep.module].__file__]
+        return self._import_directory(plugin)
+
+    @staticmethod
+    def _directory_files(directory: str) -> Tuple[str, str, str]:
+        return (os.path.join(directory, 'config.json'),
+                os.path.join(directory, 'agent.py'),
+                os.path.join(directory, 'training.md'))
+
+    def _import_directory(self, plugin: _Plugin) -> Tuple[BaseAgent, List[str]]:
+        files = self._directory_files(plugin.directory)
+        config_path, code_path, training_path = files
+        with open(config_path, encoding='utf-8') as f:
+            config = json.load(f)
+        if not isinstance(config, dict):
+            raise ValueError('config.json must hold an object')
+        if os.path.exists(code_path):
+            # Compiled from source rather than imported so a quick edit
+            # is never masked by a cached .pyc with the same mtime.
+            module_name = f'agent_plugins.{plugin.name}'
+            module = types.ModuleType(module_name)
+            module.__file__ = code_path
+            with open(code_path, encoding='utf-8') as f:
+                code = compile(f.read(), code_path, 'exec')
+            sys.modules[module_name] = module
+            exec(code, module.__dict__)
+            if config.get('class'):
+                cls = getattr(module, config['class'])
+            else:
+                classes = [obj for obj in vars(module).values()
+                           if isinstance(obj, type) and issubclass(obj, BaseAgent)
+                           and obj.__module__ == module_name and not getattr(obj, '__abstractmethods__', None)]
+                if len(classes) != 1:
+                    raise ValueError(f'{code_path} must define exactly one agent class or name it in config.json')
+                cls = classes[0]
+            return _instantiate(cls), list(files)
+        from core.agents.config_agent import ConfigAgent
+
+        training = ''
+        if os.path.exists(training_path):
+            with open(training_path, encoding='utf-8') as f:
+                training = f.read()
+        return ConfigAgent(plugin.name, config, training), list(files)
+
+    def _load(self, plugin: _Plugin) -> None:
+        """Import ``plugin`` and swap the new instance in.  Called with
+        ``plugin.lock`` held and the registry lock released."""
+        start = time.perf_counter()
+        # Config files are stamped before reading them so an edit made
+        # meanwhile triggers another reload rather than being missed.
+        before = None
+        if plugin.source == 'config':
+            before = {path: _stamp(path) for path in self._directory_files(plugin.directory)}
+        try:
+            agent, paths = self._import_target(plugin)
+            if self.on_load is not None:
+                self.on_load(plugin.name, agent)
+        except Exception as e:
+            with self._lock:
+                plugin.attempts += 1
+                plugin.error = f'{type(e).__name__}: {e}'
+                if plugin.agent is None:
+                    raise PluginError(f"agent '{plugin.name}' failed to load: {plugin.error}") from e
+                # Keep the previous version and retry once the files change again.
+                plugin.watch = before or {path: _stamp(path) for path in plugin.watch}
+            return
+        with self._lock:
+            plugin.attempts += 1
+            plugin.agent = agent
+            plugin.watch = before if before is not None else {path: _stamp(path) for path in paths if path}
+            plugin.error = None
+            plugin.loads += 1
+            plugin.load_ms = (time.perf_counter() - start) * 1000
+            plugin.checked = time.monotonic()
+
+    def __getitem__(self, name: str) -> BaseAgent:
+        with self._lock:
+            self._maybe_scan()
+            plugin = self._plugins.get(name)
+            if plugin is None:
+                raise KeyError(name)
+            load = plugin.agent is None
+            if not load and plugin.watch and time.monotonic() - plugin.checked >= self.check_interval:
+                plugin.checked = time.monotonic()
+                load = plugin.changed()
+            if not load:
+                return plugin.agent
+            attempt = plugin.attempts
+        with plugin.lock:
+            if plugin.attempts == attempt:
+                self._load(plugin)
+            elif plugin.agent is None:
+                # Another thread's load of this plugin just failed.
+                raise PluginError(f"agent '{name}' failed to load: {plugin.error}")
+        return plugin.agent
+
+    # --- mapping protocol; none of these import agents ---
+    def __contains__(self, name: object) -> bool:
+        with self._lock:
+            self._maybe_scan()
+            return name in self._plugins
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            self._maybe_scan()
+            return iter(list(self._plugins))
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._maybe_scan()
+            return len(self._plugins)
+
+    def loaded(self) -> Dict[str, BaseAgent]:
+        """Agents imported so far."""
+        with self._lock:
+            return {name: p.agent for name, p in self._plugins.items() if p.agent is not None}
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """Source, load state, load time and last error of every agent."""
+        with self._lock:
+            self._maybe_scan()
+            return [{
+                'name': name,
+                'source': p.source,
+                'loaded': p.agent is not None,
+                'loads': p.loads,
+                'load_ms': round(p.load_ms, 2),
+                'error': p.error,
+            } for name, p in self._plugins.items()]
@@ -0,0 +1,285 @@
+"""
+Cache of generated replies for Ajax and its sub-agents.
+
+Once replies come from a paid model, the same FAQ-style DM in Logan
+mode or a recurring ``/delegate`` task should not be generated twice.
+``ResponseCache`` stores finished replies under a key built from
+
+* the prompt, normalised (Unicode NFKC, case-folded, whitespace
+  collapsed, trailing punctuation dropped) so near-identical prompts
+  share an entry;
+* the mode (``ajax``/``logan``) and the agent that answered;
+* the model parameters the agent reports (model name, temperature …)
+  and, for chat replies, the earlier conversation turns sent with the
+  prompt;
+* the agent's *generation*, a counter bumped by :meth:`invalidate`
+  whenever its training material changes, so stale replies are never
+  served afterwards.  Generations are kept in memory and re-read from
+  SQLite at most every ``generation_ttl`` seconds, so building a key
+  costs no query; an invalidation in another process is seen within
+  that time.
+
+Lookups go to an in-memory LRU tier (:class:`core.cache.TTLCache`)
+first and then to an optional SQLite tier that survives restarts and is
+shared by every worker process.  Entries expire after ``ttl`` seconds.
+Hit and miss counts per tier are reported by :meth:`stats`.
+:meth:`ResponseCache.astream` wraps an async producer the same way for
+the async server.
+
+Usage example:
+
+    >>> cache = ResponseCache('memory/response_cache.db')
+    >>> reply = cache.get('What do you sell?', mode='logan', agent='ajax')
+    >>> if reply is None:
+    ...     reply = generate(...)
+    ...     cache.set('What do you sell?', reply, mode='logan', agent='ajax')
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+from core.cache import TTLCache
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    agent TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created REAL NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_agent ON responses (agent);
+CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires);
+CREATE TABLE IF NOT EXISTS generations (
+    agent TEXT PRIMARY KEY,
+    gen INTEGER NOT NULL
+);
+"""
+_SPACE = re.compile(r'\s+')
+_TRAILING = re.compile(r'[\s.!?,;:…]+$')
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Canonical form of a prompt for cache keys."""
+    text = unicodedata.normalize('NFKC', prompt).casefold()
+    return _TRAILING.sub('', _SPACE.sub(' ', text).strip())
+
+
+class ResponseCache:
+    """Two-tier (memory, SQLite) cache of generated replies."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        maxsize: int = 1024,
+        ttl: float = 24 * 60 * 60,
+        max_disk_entries: int = 100_000,
+        generation_ttl: float = 1.0,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.generation_ttl = generation_ttl
+        self.max_disk_entries = max_disk_entries
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.sets = 0
+        self.invalidations = 0
+        self._generations: Dict[str, int] = {}
+        self._generations_read = float('-inf')
+        self._local = threading.local()
+        # Guards the generation map and the counters above.
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    # --- keys and invalidation ---
+    def generation(self, agent: str) -> int:
+        """Current generation of ``agent``; replies cached under an older
+        generation are ignored."""
+        if self.path and time.monotonic() - self._generations_read >= self.generation_ttl:
+            self._refresh_generations()
+        return self._generations.get(agent, 0)
+
+    def _refresh_generations(self) -> None:
+        generations = dict(self._conn().execute('SELECT agent, gen FROM generations').fetchall())
+        with self._lock:
+            self._generations = generations
+            self._generations_read = time.monotonic()
+
+    def key(self, prompt: str, mode: str = '', agent: str = 'ajax', params: Optional[Dict[str, Any]] = None) -> str:
+        material = json.dumps(
+            [normalize_prompt(prompt), mode, agent, params or {}, self.generation(agent)],
+            sort_keys=True, ensure_ascii=False, default=str,
+        )
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def invalidate(self, agent: str) -> None:
+        """Forget every reply of ``agent``, e.g. after its training
+        files changed.  Other processes sharing the database stop using
+        their in-memory copies too, within ``generation_ttl`` seconds,
+        because the generation is part of the key."""
+        with self._lock:
+            self.invalidations += 1
+        if not self.path:
+            with self._lock:
+                self._generations[agent] = self._generations.get(agent, 0) + 1
+            return
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'INSERT INTO generations (agent, gen) VALUES (?, 1) '
+                'ON CONFLICT (agent) DO UPDATE SET gen = gen + 1', (agent,))
+            conn.execute('DELETE FROM responses WHERE agent = ?', (agent,))
+            gen = conn.execute('SELECT gen FROM generations WHERE agent = ?', (agent,)).fetchone()[0]
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        with self._lock:
+            self._generations[agent] = max(self._generations.get(agent, 0), gen)
+
+    # --- lookups ---
+    def get(self, prompt: str, mode: str = '', agent: str = 'ajax', params: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Cached reply for the prompt, or None."""
+        key = self.key(prompt, mode, agent, params)
+        reply = self.memory.get(key)
+        if reply is not None or not self.path:
+            return reply
+        now = time.time()
+        row = self._conn().execute(
+            'SELECT response, expires FROM responses WHERE key = ? AND expires > ?', (key, now)
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.disk_misses += 1
+            else:
+                self.disk_hits += 1
+        if row is None:
+            return None
+        self.memory.set(key, row[0], ttl=row[1] - now)
+        return row[0]
+
+    def set(
+        self,
+        prompt: str,
+        response: str,
+        mode: str = '',
+        agent: str = 'ajax',
+        params: Optional[Dict[str, Any]] = None,
+        ttl: Optional[float] = None,
+    ) -> None:
+        """Store a finished reply; ``ttl`` overrides the default."""
+        ttl = self.ttl if ttl is None else ttl
+        key = self.key(prompt, mode, agent, params)
+        self.memory.set(key, response, ttl=ttl)
+        with self._lock:
+            self.sets += 1
+            prune_due = self.sets % 256 == 0
+        if not self.path:
+            return
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            'INSERT OR REPLACE INTO responses (key, agent, response, created, expires) VALUES (?, ?, ?, ?, ?)',
+            (key, agent, response, now, now + ttl),
+        )
+        if prune_due:
+            self.prune()
+
+    def stream(
+        self,
+        prompt: str,
+        produce: Callable[[], Iterator[str]],
+        mode: str = '',
+        agent: str = 'ajax',
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[str]:
+        """Yield the cached reply, or the chunks of ``produce()`` while
+        caching their concatenation once the stream completes."""
+        cached = self.get(prompt, mode, agent, params)
+        if cached is not None:
+            yield cached
+            return
+        chunks = []
+        for chunk in produce():
+            chunks.append(chunk)
+            yield chunk
+        self.set(prompt, ''.join(chunks), mode, agent, params)
+
+    async def astream(
+        self,
+        prompt: str,
+        produce: Callable[[], AsyncIterator[str]],
+        mode: str = '',
+        agent: str = 'ajax',
+        params: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """Async counterpart of :meth:`stream`.  The SQLite lookup and
+        write run on the default executor; ``produce()`` is awaited on
+        the event loop."""
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, self.get, prompt, mode, agent, params)
+        if cached is not None:
+            yield cached
+            return
+        chunks = []
+        async for chunk in produce():
+            chunks.append(chunk)
+            yield chunk
+        await loop.run_in_executor(None, self.set, prompt, ''.join(chunks), mode, agent, params)
+
+    def prune(self) -> int:
+        """Drop expired disk entries and the oldest ones beyond
+        ``max_disk_entries``; returns how many were removed."""
+        if not self.path:
+            return 0
+        conn = self._conn()
+        removed = conn.execute('DELETE FROM responses WHERE expires <= ?', (time.time(),)).rowcount
+        excess = conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0] - self.max_disk_entries
+        if excess > 0:
+            removed += conn.execute(
+                'DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY created LIMIT ?)', (excess,)
+            ).rowcount
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self.memory.stats()
+        hits = memory['hits'] + self.disk_hits
+        lookups = memory['hits'] + memory['misses']
+        stats: Dict[str, Any] = {
+            'memory': memory,
+            'hits': hits,
+            'misses': lookups - hits,
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            'sets': self.sets,
+            'invalidations': self.invalidations,
+        }
+        if self.path:
+            stats['disk'] = {
+                'entries': self._conn().execute('SELECT COUNT(*) FROM responses').fetchone()[0],
+                'hits': self.disk_hits,
+                'misses': self.disk_misses,
+            }
+        return stats
@@ -0,0 +1,316 @@
+"""
+Append-only segmented JSON Lines log.
+
+Entries are written one per line to segment files under a directory.
+Each entry receives a monotonically increasing sequence number
+(``seq``) and segments are named after the first sequence number they
+hold, so locating an entry never requires reading the whole log:
+
+* ``segments.json`` lists every segment with its first sequence number
+  and creation time.  It is only rewritten when a segment rotates.
+* ``<first>.idx`` is a sparse offset index next to each segment.  Every
+  ``index_interval`` entries the byte offset of that entry is appended,
+  so a lookup scans at most ``index_interval`` lines.
+
+Appending is O(1) regardless of history size: the active segment is
+held open in append mode and a new segment is started once it exceeds
+``max_segment_bytes`` or ``max_segment_age`` seconds.
+
+Several processes may share one log directory.  Writers serialise on an
+``flock`` of ``.lock`` and pick up entries or rotations made by other
+processes from the file sizes before appending.
+
+Usage example:
+
+    >>> log = SegmentedLog('logs/tasklog')
+    >>> log.append({'task': 'hey', 'response': 'On it, boss!'})
+    1
+    >>> entries, cursor = log.page(limit=50)
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None  # type: ignore[assignment]
+
+SEGMENTS_FILE = 'segments.json'
+
+
+class SegmentedLog:
+    """Append-only log split into size/time rotated JSONL segments."""
+
+    def __init__(
+        self,
+        directory: str,
+        max_segment_bytes: int = 8 * 1024 * 1024,
+        max_segment_age: float = 24 * 60 * 60,
+        index_interval: int = 128,
+    ) -> None:
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.index_interval = index_interval
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        self._lock_fh = open(os.path.join(directory, '.lock'), 'a')
+        self._segments: List[Dict[str, Any]] = []
+        self._firsts: List[int] = []
+        self._segments_stamp: Optional[Tuple[int, int]] = None
+        self._fh = None
+        self._idx_fh = None
+        self._size = 0
+        self._next_seq = 1
+        with self._locked():
+            self._reload_segments()
+            self._open_active()
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the thread lock and, where available, the directory flock."""
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_fh.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_fh.fileno(), fcntl.LOCK_UN)
+
+    def _stat_segments(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self._segments_path())
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_ino
+
+    def _reload_segments(self) -> None:
+        self._segments = self._load_segments()
+        self._firsts = [s['first'] for s in self._segments]
+        self._segments_stamp = self._stat_segments()
+
+    def _sync(self) -> None:
+        """Catch up with entries and rotations written by other processes."""
+        if self._stat_segments() != self._segments_stamp:
+            active = self._segments[-1]['first'] if self._segments else None
+            self._reload_segments()
+            if not self._segments or self._segments[-1]['first'] != active:
+                self._close_files()
+                self._open_active()
+                return
+        size = os.fstat(self._fh.fileno()).st_size
+        if size != self._size:
+            with open(self._segment_path(self._segments[-1]['first']), 'rb') as f:
+                f.seek(self._size)
+                self._next_seq += f.read(size - self._size).count(b'\n')
+            self._size = size
+
+    def _close_files(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._idx_fh.close()
+            self._fh = self._idx_fh = None
+
+    # --- segment bookkeeping ---
+    def _segments_path(self) -> str:
+        return os.path.join(self.directory, SEGMENTS_FILE)
+
+    def _segment_path(self, first: int, suffix: str = '.jsonl') -> str:
+        return os.path.join(self.directory, f'{first:020d}{suffix}')
+
+    def _load_segments(self) -> List[Dict[str, Any]]:
+        try:
+            with open(self._segments_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+    def _save_segments(self) -> None:
+        tmp = f'{self._segments_path()}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._segments, f)
+        os.replace(tmp, self._segments_path())
+        self._segments_stamp = self._stat_segments()
+
+    def _open_active(self) -> None:
+        if not self._segments:
+            self._start_segment(1)
+            return
+        active = self._segments[-1]
+        path = self._segment_path(active['first'])
+        # Recover from a torn final write by truncating to the last newline
+        # and count the lines after the last indexed offset.
+        offset, seq = self._index_floor(active['first'], None)
+        with open(path, 'a+b') as f:
+            f.seek(offset)
+            tail = f.read()
+            if tail and not tail.endswith(b'\n'):
+                keep = tail.rfind(b'\n') + 1
+                f.truncate(offset + keep)
+                tail = tail[:keep]
+        self._next_seq = seq + tail.count(b'\n')
+        self._fh = open(path, 'ab')
+        self._idx_fh = open(self._segment_path(active['first'], '.idx'), 'a', encoding='utf-8')
+        self._size = self._fh.tell()
+
+    def _start_segment(self, first: int) -> None:
+        self._close_files()
+        self._segments.append({'first': first, 'created': time.time()})
+        self._firsts.append(first)
+        self._save_segments()
+        self._fh = open(self._segment_path(first), 'ab')
+        self._idx_fh = open(self._segment_path(first, '.idx'), 'a', encoding='utf-8')
+        self._size = 0
+        self._next_seq = first
+
+    def _should_rotate(self) -> bool:
+        if self._next_seq == self._segments[-1]['first']:
+            return False
+        if self._size >= self.max_segment_bytes:
+            return True
+        return time.time() - self._segments[-1]['created'] >= self.max_segment_age
+
+    def _index_floor(self, first: int, target: Optional[int]) -> Tuple[int, int]:
+        """Return ``(offset, seq)`` of the closest indexed entry at or
+        before ``target`` (or the last indexed entry if ``target`` is None)."""
+        offset, seq = 0, first
+        try:
+            with open(self._segment_path(first, '.idx'), 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) != 2:
+                        continue
+                    s, o = int(parts[0]), int(parts[1])
+                    if target is not None and s > target:
+                        break
+                    seq, offset = s, o
+        except FileNotFoundError:
+            pass
+        return offset, seq
+
+    # --- public API ---
+    @property
+    def first_seq(self) -> int:
+        return self._firsts[0] if self._firsts else 1
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the newest entry, or 0 when empty."""
+        return self._next_seq - 1
+
+    def __len__(self) -> int:
+        return self._next_seq - self.first_seq
+
+    def refresh(self) -> int:
+        """Pick up entries appended by other processes and return
+        :attr:`last_seq`."""
+        with self._locked():
+            self._sync()
+            return self.last_seq
+
+    def append(self, entry: Dict[str, Any]) -> int:
+        """Append ``entry`` and return its sequence number."""
+        with self._locked():
+            self._sync()
+            if self._should_rotate():
+                self._start_segment(self._next_seq)
+            seq = self._next_seq
+            record = dict(entry)
+            record['seq'] = seq
+            line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+            if (seq - self._segments[-1]['first']) % self.index_interval == 0:
+                self._idx_fh.write(f'{seq} {self._size}\n')
+                self._idx_fh.flush()
+            self._fh.write(line)
+            self._fh.flush()
+            self._size += len(line)
+            self._next_seq = seq + 1
+            return seq
+
+    def iter_from(self, start: int, count: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield up to ``count`` entries starting at sequence ``start``."""
+        with self._locked():
+            self._sync()
+            end = self._next_seq if count is None else min(self._next_seq, start + count)
+            firsts = list(self._firsts)
+        start = max(start, self.first_seq)
+        if start >= end:
+            return
+        pos = bisect.bisect_right(firsts, start) - 1
+        seq = start
+        for first in firsts[pos:]:
+            if seq >= end:
+                break
+            offset, cur = self._index_floor(first, seq)
+            with open(self._segment_path(first), 'rb') as f:
+                f.seek(offset)
+                for raw in f:
+                    if cur >= end:
+                        break
+                    if not raw.endswith(b'\n'):
+                        break
+                    if cur >= seq:
+                        yield json.loads(raw)
+                        seq = cur + 1
+                    cur += 1
+
+    def page(
+        self,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        limit: int = 100,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Return a page of entries in chronological order plus a cursor.
+
+        With ``after`` the page holds the entries following that sequence
+        number and the cursor continues forwards.  Otherwise the page holds
+        the ``limit`` entries preceding ``before`` (default: the newest
+        entries) and the cursor pages further back.  The cursor is None
+        once the end of the log has been reached.
+        """
+        limit = max(1, limit)
+        with self._locked():
+            self._sync()
+        if after is not None:
+            entries = list(self.iter_from(after + 1, limit))
+            if entries and entries[-1]['seq'] < self.last_seq:
+                return entries, entries[-1]['seq']
+            return entries, None
+        end = self._next_seq if before is None else min(before, self._next_seq)
+        start = max(self.first_seq, end - limit)
+        entries = list(self.iter_from(start, end - start))
+        return entries, (start if start > self.first_seq else None)
+
+    def import_json_list(self, path: str) -> int:
+        """One-shot migration of a legacy JSON array file into an empty log.
+
+        Returns the number of imported entries.  Nothing happens when the
+        log already holds entries or the file is missing or unreadable.
+        """
+        if len(self) or not os.path.exists(path):
+            return 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return 0
+        if not isinstance(items, list):
+            return 0
+        for item in items:
+            if isinstance(item, dict):
+                self.append(item)
+        return len(self)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_files()
+            self._lock_fh.close()
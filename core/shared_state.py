@@ -0,0 +1,121 @@
+"""
+Process-shared runtime state.
+
+Runtime values such as the live status panel, the presence flag and the
+recent chat context used to live in Python dicts inside the Flask app,
+so each worker process of a multi-process server had its own diverging
+copy.  ``SharedState`` keeps them in a small SQLite database instead:
+every worker reads and writes the same rows, and read-modify-write
+updates run inside ``BEGIN IMMEDIATE`` transactions so concurrent
+threads and processes never lose each other's changes.
+
+Values are stored as JSON under ``(namespace, key)``; one database can
+hold several namespaces.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    ns TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (ns, key)
+)
+"""
+
+
+class SharedState:
+    """JSON key/value namespace stored in SQLite."""
+
+    def __init__(self, path: str, namespace: str, defaults: Optional[Dict[str, Any]] = None) -> None:
+        self.path = path
+        self.namespace = namespace
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._conn()
+        conn.execute(_SCHEMA)
+        if defaults:
+            conn.executemany(
+                'INSERT OR IGNORE INTO state (ns, key, value) VALUES (?, ?, ?)',
+                [(namespace, k, json.dumps(v)) for k, v in defaults.items()],
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # The connection autocommits each statement; group them.
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get(self, key: str, default: Any = None) -> Any:
+        row = self._conn().execute(
+            'SELECT value FROM state WHERE ns = ? AND key = ?', (self.namespace, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key: str, value: Any) -> None:
+        self.set_many(**{key: value})
+
+    def set_many(self, **values: Any) -> None:
+        """Write several keys in one transaction."""
+        with self._transaction() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO state (ns, key, value) VALUES (?, ?, ?)',
+                [(self.namespace, k, json.dumps(v)) for k, v in values.items()],
+            )
+
+    def delete(self, *keys: str) -> None:
+        with self._transaction() as conn:
+            conn.executemany('DELETE FROM state WHERE ns = ? AND key = ?', [(self.namespace, k) for k in keys])
+
+    def update(self, key: str, fn: Callable[[Any], Any], default: Any = None) -> Any:
+        """Atomically replace ``key`` with ``fn(current)`` and return it."""
+        with self._transaction() as conn:
+            row = conn.execute(
+                'SELECT value FROM state WHERE ns = ? AND key = ?', (self.namespace, key)
+            ).fetchone()
+            value = fn(json.loads(row[0]) if row else default)
+            conn.execute(
+                'INSERT OR REPLACE INTO state (ns, key, value) VALUES (?, ?, ?)',
+                (self.namespace, key, json.dumps(value)),
+            )
+        return value
+
+    def push(self, key: str, *items: Any, keep: Optional[int] = None) -> Any:
+        """Append ``items`` to the list under ``key``, keeping only the
+        last ``keep`` entries."""
+        def append(current: Any) -> Any:
+            values = list(current or []) + list(items)
+            return values[-keep:] if keep else values
+        return self.update(key, append, [])
+
+    def all(self) -> Dict[str, Any]:
+        """Return every key in the namespace."""
+        rows = self._conn().execute('SELECT key, value FROM state WHERE ns = ?', (self.namespace,))
+        return {k: json.loads(v) for k, v in rows}
+
+    def is_empty(self) -> bool:
+        row = self._conn().execute('SELECT 1 FROM state WHERE ns = ? LIMIT 1', (self.namespace,)).fetchone()
+        return row is None
@@ -0,0 +1,357 @@
+"""
+Durable task queue and worker pool.
+
+Tasks are stored in SQLite (WAL mode) so they survive restarts and get
+unique, monotonic IDs.  Each task has a priority (``high``, ``normal``
+or ``low``) and moves through ``pending`` → ``running`` → ``done`` or
+``failed``.  Failed attempts are retried with exponential backoff until
+``max_attempts`` is reached.
+
+A claimed task is leased to its worker for ``lease`` seconds and the
+worker renews the lease while the task runs (see
+:meth:`TaskQueue.renew`).  Only a task whose lease has expired, because
+its worker died or hung, is claimed again; that counts as another
+attempt, so a task that keeps killing its worker ends up ``failed``.
+
+``QueueWorkerPool`` drains the queue on a configurable number of
+threads and hands each task to a handler callable, which in the backend
+dispatches to ``AjaxAI.delegate`` or ``AjaxAI.handle_task``.  Threads
+rather than processes are used because the agents and their state live
+in the server process.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+_PRIORITY_NAMES = {v: k for k, v in PRIORITIES.items()}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task TEXT NOT NULL,
+    agent TEXT,
+    priority INTEGER NOT NULL DEFAULT 1,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    created_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    started_at REAL,
+    lease_until REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS queue_ready ON queue (status, priority, available_at, id);
+CREATE INDEX IF NOT EXISTS queue_finished ON queue (status, finished_at);
+"""
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+class TaskQueue:
+    """Priority queue with retries persisted in SQLite."""
+
+    def __init__(self, path: str, backoff_base: float = 2.0, lease: float = 60.0) -> None:
+        self.path = path
+        self.backoff_base = backoff_base
+        self.lease = lease
+        self._local = threading.local()
+        self._ready = threading.Event()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(queue)')}
+        if 'lease_until' not in columns:
+            conn.execute('ALTER TABLE queue ADD COLUMN lease_until REAL')
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'task': row['task'],
+            'agent': row['agent'],
+            'priority': _PRIORITY_NAMES.get(row['priority'], row['priority']),
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'timestamp': _iso(row['created_at']),
+            'started_at': _iso(row['started_at']),
+            'finished_at': _iso(row['finished_at']),
+            'result': row['result'],
+            'error': row['error'],
+        }
+
+    def enqueue(self, task: str, priority: Any = 'normal', agent: Optional[str] = None,
+                max_attempts: int = 3) -> Dict[str, Any]:
+        """Add a task and return it.
+
+        Raises:
+            ValueError: If ``priority`` is not a known level.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}")
+        now = time.time()
+        cur = self._conn().execute(
+            'INSERT INTO queue (task, agent, priority, max_attempts, created_at, available_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (task, agent, PRIORITIES[priority], max_attempts, now, now),
+        )
+        self._ready.set()
+        return self.get(cur.lastrowid)
+
+    def get(self, task_id: int) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute('SELECT * FROM queue WHERE id = ?', (task_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically move the next ready task to ``running`` and return it.
+
+        Running tasks whose lease expired (their worker died) are claimed
+        again, unless that attempt was their last, in which case they
+        are marked ``failed``.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                "UPDATE queue SET status = 'failed', error = 'worker lease expired', finished_at = ? "
+                "WHERE status = 'running' AND COALESCE(lease_until, started_at) < ? "
+                'AND attempts >= max_attempts',
+                (now, now),
+            )
+            row = conn.execute(
+                "SELECT id FROM queue WHERE (status = 'pending' AND available_at <= ?) "
+                "OR (status = 'running' AND COALESCE(lease_until, started_at) < ?) "
+                'ORDER BY priority, available_at, id LIMIT 1',
+                (now, now),
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute(
+                "UPDATE queue SET status = 'running', attempts = attempts + 1, started_at = ?, "
+                'lease_until = ? WHERE id = ?',
+                (now, now + self.lease, row['id']),
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return self.get(row['id'])
+
+    def renew(self, task_id: int, attempt: int) -> bool:
+        """Extend the lease on attempt ``attempt`` of a running task.
+
+        Returns False once the task is no longer held by that attempt
+        (it finished, or its lease expired and it was claimed again).
+        """
+        cur = self._conn().execute(
+            "UPDATE queue SET lease_until = ? WHERE id = ? AND status = 'running' AND attempts = ?",
+            (time.time() + self.lease, task_id, attempt),
+        )
+        return cur.rowcount > 0
+
+    def complete(self, task_id: int, result: str) -> None:
+        self._conn().execute(
+            "UPDATE queue SET status = 'done', result = ?, error = NULL, finished_at = ? WHERE id = ?",
+            (result, time.time(), task_id),
+        )
+
+    def fail(self, task_id: int, error: str) -> Dict[str, Any]:
+        """Record a failed attempt, scheduling a retry if any remain."""
+        conn = self._conn()
+        row = conn.execute('SELECT attempts, max_attempts FROM queue WHERE id = ?', (task_id,)).fetchone()
+        now = time.time()
+        if row['attempts'] < row['max_attempts']:
+            delay = self.backoff_base * (2 ** (row['attempts'] - 1))
+            conn.execute(
+                "UPDATE queue SET status = 'pending', error = ?, available_at = ? WHERE id = ?",
+                (error, now + delay, task_id),
+            )
+        else:
+            conn.execute(
+                "UPDATE queue SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                (error, now, task_id),
+            )
+        return self.get(task_id)
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return the newest ``limit`` tasks (optionally of one status)
+        in ID order."""
+        sql = 'SELECT * FROM queue'
+        params: List[Any] = []
+        if status:
+            sql += ' WHERE status = ?'
+            params.append(status)
+        sql += ' ORDER BY id DESC LIMIT ?'
+        params.append(limit)
+        rows = self._conn().execute(sql, params).fetchall()
+        return [self._to_dict(r) for r in reversed(rows)]
+
+    def stats(self, window: float = 60.0, sample: int = 1000) -> Dict[str, Any]:
+        """Queue depth per status, throughput over the last ``window``
+        seconds and latency percentiles over the last ``sample`` tasks."""
+        conn = self._conn()
+        depth = {row['status']: row['n'] for row in conn.execute(
+            'SELECT status, COUNT(*) AS n FROM queue GROUP BY status')}
+        now = time.time()
+        finished = conn.execute(
+            "SELECT COUNT(*) FROM queue WHERE status IN ('done', 'failed') AND finished_at >= ?",
+            (now - window,),
+        ).fetchone()[0]
+        rows = conn.execute(
+            "SELECT created_at, started_at, finished_at FROM queue WHERE status = 'done' "
+            'ORDER BY finished_at DESC LIMIT ?',
+            (sample,),
+        ).fetchall()
+        total = [r['finished_at'] - r['created_at'] for r in rows]
+        run = [r['finished_at'] - r['started_at'] for r in rows]
+        return {
+            'depth': depth,
+            'throughput_per_sec': round(finished / window, 3),
+            'latency_ms': {
+                'p50': round(_percentile(total, 0.50) * 1000, 1),
+                'p99': round(_percentile(total, 0.99) * 1000, 1),
+                'run_p50': round(_percentile(run, 0.50) * 1000, 1),
+                'run_p99': round(_percentile(run, 0.99) * 1000, 1),
+            },
+        }
+
+    def wait_for_work(self, timeout: float) -> None:
+        """Block until a task is enqueued in this process or ``timeout``
+        elapses (tasks from other processes and retries are picked up by
+        polling)."""
+        self._ready.wait(timeout)
+        self._ready.clear()
+
+    def wake(self) -> None:
+        """Release any workers blocked in :meth:`wait_for_work`."""
+        self._ready.set()
+
+    def migrate_json(self, json_path: str) -> int:
+        """Import pending tasks from a legacy ``queue.json`` once and
+        rename the file to ``queue.json.migrated``."""
+        if not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return 0
+        if not entries:
+            return 0
+        imported = 0
+        for entry in entries if isinstance(entries, list) else []:
+            if isinstance(entry, dict) and entry.get('task') and entry.get('status', 'pending') == 'pending':
+                self.enqueue(entry['task'])
+                imported += 1
+        os.replace(json_path, json_path + '.migrated')
+        return imported
+
+
+class QueueWorkerPool:
+    """Threads that claim tasks and run them through ``handler``.
+
+    ``handler`` receives the task dict and returns the result string;
+    an exception counts as a failed attempt.  ``on_finish`` is called
+    with the updated task after each attempt.  A heartbeat thread renews
+    the lease on every task in progress each third of the queue's
+    ``lease``.
+    """
+
+    def __init__(
+        self,
+        queue: TaskQueue,
+        handler: Callable[[Dict[str, Any]], str],
+        workers: int = 2,
+        poll_interval: float = 1.0,
+        on_finish: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> None:
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.on_finish = on_finish
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._active: Dict[int, int] = {}
+        self._active_lock = threading.Lock()
+
+    def start(self) -> 'QueueWorkerPool':
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'queue-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name='queue-heartbeat', daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return self
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(self.queue.lease / 3):
+            with self._active_lock:
+                active = list(self._active.items())
+            for task_id, attempt in active:
+                try:
+                    self.queue.renew(task_id, attempt)
+                except sqlite3.Error:
+                    pass
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            task = self.queue.claim()
+            if task is None:
+                self.queue.wait_for_work(self.poll_interval)
+                continue
+            with self._active_lock:
+                self._active[task['id']] = task['attempts']
+            try:
+                result = self.handler(task)
+            except Exception as e:
+                updated = self.queue.fail(task['id'], str(e))
+            else:
+                self.queue.complete(task['id'], str(result))
+                updated = self.queue.get(task['id'])
+            finally:
+                with self._active_lock:
+                    self._active.pop(task['id'], None)
+            if self.on_finish is not None:
+                try:
+                    self.on_finish(updated)
+                except Exception:
+                    pass
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self.queue.wake()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
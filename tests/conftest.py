@@ -0,0 +1,33 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+AJAX_SYSTEM = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ajax_system")
+
+# ajax_system's modules, kept between tests once imported.
+_ajax_system_modules = {}
+
+
+def _core_modules():
+    return [name for name in sys.modules if name == "core" or name.startswith("core.")]
+
+
+@pytest.fixture
+def ajax_system():
+    """Import function for ajax_system modules.
+
+    ajax_system has its own top-level ``core`` package, so the backend's
+    ``core`` modules are set aside while the test runs and restored
+    afterwards, as benchmarks/bench_suite.py does with a subprocess.
+    """
+    saved = {name: sys.modules.pop(name) for name in _core_modules()}
+    sys.modules.update(_ajax_system_modules)
+    sys.path.insert(0, AJAX_SYSTEM)
+    try:
+        yield importlib.import_module
+    finally:
+        sys.path.remove(AJAX_SYSTEM)
+        _ajax_system_modules.update((name, sys.modules.pop(name)) for name in _core_modules())
+        sys.modules.update(saved)
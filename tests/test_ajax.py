@@ -50,3 +50,208 @@ def test_toggle_presence():
     assert reply_ajax != reply_logan
     assert reply_ajax.startswith(ajax.personalities["ajax"].example_phrases[0])
     assert reply_logan.startswith(ajax.personalities["logan"].example_phrases[0])
+
+
+def test_remember_is_coalesced_and_survives_reload(tmp_path):
+    from core.ajax_ai import AjaxAI
+
+    path = str(tmp_path / "agent_memory.json")
+    ajax = AjaxAI(memory_path=path)
+    for i in range(10):
+        ajax.remember("remote100k", "last_post", i)
+    assert ajax.recall("remote100k", "last_post") == 9
+    ajax.flush()
+    reloaded = AjaxAI(memory_path=path)
+    assert reloaded.recall("remote100k", "last_post") == 9
+    assert len(reloaded.memory["actions"]) == 10
+
+
+def test_journal_is_compacted_and_recent_actions_bounded(tmp_path):
+    import gc
+    import os
+
+    from core import persistence
+    from core.persistence import JournaledState
+
+    path = str(tmp_path / "agent_memory.json")
+    state = JournaledState(path, max_pending=10, snapshot_every=50, keep_actions=20)
+    state.load({})
+    for i in range(120):
+        state.record({"brand": "remote100k", "key": f"k{i % 7}", "value": i})
+    state.flush()
+    assert len(state.state["actions"]) == 20
+    # 120 actions, snapshots at 50 and 100: only the last 20 remain to replay.
+    assert sum(1 for _ in open(state.journal_path)) == 20
+
+    reloaded = JournaledState(path, snapshot_every=50, keep_actions=20)
+    memory = reloaded.load({})
+    assert memory["brands"] == state.state["brands"]
+    assert [a["value"] for a in memory["actions"]] == list(range(100, 120))
+    reloaded.snapshot()
+    assert os.path.getsize(reloaded.journal_path) == 0
+
+    del state, reloaded, memory
+    gc.collect()
+    assert not [s for s in persistence._instances if s.snapshot_path == path]
+
+
+def test_stream_response_matches_generate_response():
+    ajax = build_default_ajax()
+    for present in (True, False):
+        ajax.is_logan_present = present
+        chunks = list(ajax.stream_response("Draft  the launch post"))
+        assert len(chunks) > 1
+        assert "".join(chunks) == ajax.generate_response("Draft  the launch post")
+    assert "".join(ajax.delegate_stream("investor", "TSLA")) == ajax.delegate("investor", "TSLA")
+
+
+def test_delegate_many_runs_agents_in_parallel_with_deadlines():
+    import time
+
+    from core.agents.base_agent import BaseAgent
+    from core.ajax_ai import merge_replies, parse_delegation
+
+    class Slow(BaseAgent):
+        def __init__(self, seconds):
+            self.seconds = seconds
+
+        def handle_task(self, task):
+            time.sleep(self.seconds)
+            return f"done after {self.seconds}"
+
+    class Broken(BaseAgent):
+        def handle_task(self, task):
+            raise RuntimeError("no data")
+
+    ajax = build_default_ajax()
+    ajax.register_agent("slow_a", Slow(0.2))
+    ajax.register_agent("slow_b", Slow(0.2))
+    ajax.register_agent("stuck", Slow(2))
+    ajax.register_agent("broken", Broken())
+
+    start = time.monotonic()
+    results = ajax.delegate_many(["slow_a", "slow_b", "investor"], "launch")
+    assert time.monotonic() - start < 0.35
+    assert [r.agent for r in results] == ["slow_a", "slow_b", "investor"]
+    assert all(r.status == "ok" for r in results)
+
+    results = ajax.delegate_many(["stuck", "broken", "slow_a"], "launch", timeouts={"stuck": 0.1})
+    assert [r.status for r in results] == ["timeout", "error", "ok"]
+    merged = merge_replies(results)
+    assert "**broken**\n(failed: no data)" in merged and "done after 0.2" in merged
+    # The stuck agent's thread is still running in the background.
+    assert ajax.abandoned_delegations == 1
+
+    # Deadlines start when an agent gets a thread, not while it queues.
+    ajax.max_parallel_delegations = 1
+    results = ajax.delegate_many(["slow_a", "slow_b"], "launch", timeout=0.3)
+    assert [r.status for r in results] == ["ok", "ok"]
+    assert all(r.elapsed < 0.3 for r in results)
+    time.sleep(2)
+    assert ajax.abandoned_delegations == 0
+
+    assert parse_delegation(" growth + investor view on this launch") == (["growth", "investor"], "view on this launch")
+    assert parse_delegation(" investor") is None
+    with pytest.raises(KeyError):
+        ajax.delegate_many(["investor", "nobody"], "launch")
+
+
+def test_failed_journal_append_keeps_actions_pending(tmp_path, monkeypatch, caplog):
+    import errno
+    import os
+    import time
+
+    from core import persistence
+    from core.persistence import JournaledState
+
+    path = str(tmp_path / "agent_memory.json")
+    state = JournaledState(path, flush_interval=0.05, max_pending=100)
+    state.load({})
+    state.record({"brand": "remote100k", "key": "a", "value": 1})
+    state.flush()
+    size = os.path.getsize(state.journal_path)
+
+    real_write = os.write
+
+    def disk_full(fd, data):
+        real_write(fd, bytes(data[:5]))
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(persistence.os, "write", disk_full)
+    state.record({"brand": "remote100k", "key": "b", "value": 2})
+    with pytest.raises(OSError):
+        state.flush()
+    assert [a["key"] for a in state._pending] == ["b"]
+    assert os.path.getsize(state.journal_path) == size
+
+    # The write-behind timer logs the failure and tries again.
+    state.record({"brand": "remote100k", "key": "c", "value": 3})
+    time.sleep(0.2)
+    assert "2 actions still pending" in caplog.text
+    monkeypatch.setattr(persistence.os, "write", real_write)
+    time.sleep(0.2)
+    assert state._pending == []
+
+    reloaded = JournaledState(path).load({})
+    assert reloaded["brands"] == {"remote100k": {"a": 1, "b": 2, "c": 3}}
+
+
+def test_torn_and_damaged_journal_lines_are_dropped(tmp_path):
+    import json
+    import os
+
+    from core.persistence import JournaledState
+
+    path = str(tmp_path / "agent_memory.json")
+    state = JournaledState(path)
+    state.load({})
+    state.snapshot()
+    with open(state.journal_path, "w") as f:
+        f.write(json.dumps({"brand": "b", "key": "good", "value": 1}) + "\n")
+        f.write("{not json}\n")
+        f.write(json.dumps({"brand": "b", "key": "also", "value": 2}) + "\n")
+        # A torn final line longer than one 64 KB read-back window.
+        f.write('{"brand": "b", "key": "torn", "value": "' + "x" * 200_000)
+    good_size = os.path.getsize(state.journal_path) - 200_000 - len('{"brand": "b", "key": "torn", "value": "')
+
+    reloaded = JournaledState(path)
+    memory = reloaded.load({})
+    assert memory["brands"] == {"b": {"good": 1, "also": 2}}
+    assert os.path.getsize(reloaded.journal_path) == good_size
+    reloaded.record({"brand": "b", "key": "next", "value": 3})
+    reloaded.flush()
+    assert JournaledState(path).load({})["brands"]["b"]["next"] == 3
+
+    # No newline at all: nothing complete to keep.
+    with open(state.journal_path, "w") as f:
+        f.write("x" * 100_000)
+    JournaledState(path).load({})
+    assert os.path.getsize(state.journal_path) == 0
+
+
+def test_processes_sharing_a_journal_keep_each_others_actions(tmp_path):
+    from core.persistence import JournaledState
+
+    path = str(tmp_path / "agent_memory.json")
+    # Two instances with their own lock file handles behave like two
+    # worker processes sharing memory/.
+    a, b = JournaledState(path, snapshot_every=3), JournaledState(path, snapshot_every=3)
+    a.load({})
+    b.load({})
+    a.record({"brand": "x", "key": "a1", "value": 1})
+    a.flush()
+    b.record({"brand": "x", "key": "b1", "value": 1})
+    b.record({"brand": "x", "key": "a1", "value": "from b"})
+    b.flush()
+    # B's flush caught up with A's line first, so B's value is newest.
+    assert b.state["brands"]["x"] == {"a1": "from b", "b1": 1}
+
+    a.snapshot()  # compacts the journal B appended to
+    assert a.state["brands"]["x"] == {"a1": "from b", "b1": 1}
+    b.record({"brand": "x", "key": "b2", "value": 2})
+    b.flush()
+    a.refresh()
+    expected = {"a1": "from b", "b1": 1, "b2": 2}
+    assert a.state["brands"]["x"] == b.state["brands"]["x"] == expected
+    assert [act["key"] for act in b.state["actions"]] == ["a1", "b1", "a1", "b2"]
+    assert JournaledState(path).load({})["brands"]["x"] == expected
@@ -0,0 +1,133 @@
+import asyncio
+import base64
+import json
+import time
+
+from flask import Flask, jsonify
+
+from backend.asgi import AsyncAPI
+from core.ajax_ai import AjaxAI
+from core.llm import LLMClient
+from core.shared_state import SharedState
+from tools.fake_openai import FakeOpenAIServer
+from tools.image_jobs import ImageJobManager
+
+AUTH = [(b"authorization", b"Basic " + base64.b64encode(b"logan:pw"))]
+
+
+class SlowImageTool:
+    async def run(self, params):
+        await asyncio.sleep(0.3)
+        return f"https://images.local/{params['prompt']}.png"
+
+
+def make_app(tmp_path):
+    flask_app = Flask(__name__)
+    flask_app.config["BASIC_AUTH"] = ("logan", "pw")
+    flask_app.config["status_info"] = SharedState(str(tmp_path / "state.db"), "status")
+    flask_app.config["image_jobs"] = ImageJobManager(SlowImageTool, max_concurrency=500)
+    flask_app.config["ajax_agent"] = object()
+
+    async def astream_chat_message(message, agent, blocking, project):
+        for chunk in ("Hi ", "there"):
+            yield chunk
+
+    flask_app.config["astream_chat_message"] = astream_chat_message
+    flask_app.config["record_chat"] = lambda message, reply, project: "2025-01-01T00:00:00"
+
+    @flask_app.route("/api/status")
+    def status():
+        return jsonify({"mode": "ajax"})
+
+    # Few threads: async routes must not depend on the pool size.
+    return AsyncAPI(flask_app, threads=4)
+
+
+async def call(app, method, path, body=None, headers=AUTH):
+    sent = []
+    payload = json.dumps(body).encode() if body is not None else b""
+
+    async def receive():
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    path, _, query = path.partition("?")
+    scope = {"type": "http", "method": method, "path": path, "query_string": query.encode(), "headers": headers}
+    await app(scope, receive, send)
+    status = sent[0]["status"]
+    return status, b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def test_routes_auth_and_wsgi_fallback(tmp_path):
+    app = make_app(tmp_path)
+
+    async def scenario():
+        assert (await call(app, "POST", "/api/chat", {"message": "hey"}, headers=[]))[0] == 401
+        status, body = await call(app, "POST", "/api/chat", {"message": "hey"})
+        assert status == 200
+        assert json.loads(body) == {"response": "Hi there", "timestamp": "2025-01-01T00:00:00"}
+        status, body = await call(app, "GET", "/api/chat/stream?message=hey")
+        assert body.decode().endswith('event: done\ndata: {"response": "Hi there", "timestamp": "2025-01-01T00:00:00"}\n\n')
+        status, body = await call(app, "GET", "/api/status")
+        assert (status, json.loads(body)) == (200, {"mode": "ajax"})
+
+    asyncio.run(scenario())
+    app.close()
+
+
+def test_concurrent_image_requests_exceed_thread_pool(tmp_path):
+    app = make_app(tmp_path)
+
+    async def scenario():
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            call(app, "POST", "/api/image", {"prompt": f"p{i}"}) for i in range(200)
+        ])
+        return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(scenario())
+    app.close()
+    assert all(status == 200 for status, _ in results)
+    assert json.loads(results[7][1])["url"] == "https://images.local/p7.png"
+    # 200 requests of 0.3s each on 4 threads would take 15s if they
+    # each held a thread.
+    assert elapsed < 5
+
+
+def test_concurrent_model_chats_exceed_thread_pool(tmp_path):
+    server = FakeOpenAIServer(delay=0.3).start()
+    ajax = AjaxAI(memory_path=str(tmp_path / "memory.json"))
+    ajax.attach_llm(LLMClient(server.base_url, max_connections=100))
+    app = make_app(tmp_path)
+    app.config["astream_chat_message"] = lambda message, agent, blocking, project: ajax.astream_response(message)
+
+    async def scenario():
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            call(app, "POST", "/api/chat", {"message": f"m{i}"}) for i in range(40)
+        ])
+        return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(scenario())
+    app.close()
+    server.stop()
+    assert json.loads(results[5][1])["response"] == "Echo: m5"
+    # 40 model calls of 0.3s on 4 threads would take 3s.
+    assert elapsed < 2
+
+
+def test_image_job_wait_must_be_a_number(tmp_path):
+    app = make_app(tmp_path)
+
+    async def scenario():
+        status, body = await call(app, "POST", "/api/image", {"prompt": "p", "async": True})
+        job_id = json.loads(body)["id"]
+        for wait in ("soon", "nan", "-1"):
+            assert (await call(app, "GET", f"/api/image/{job_id}?wait={wait}"))[0] == 400
+        status, body = await call(app, "GET", f"/api/image/{job_id}?wait=inf")
+        assert (status, json.loads(body)["status"]) == (200, "done")
+
+    asyncio.run(scenario())
+    app.close()
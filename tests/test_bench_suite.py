@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from benchmarks.bench_suite import CASES, compare, run_suite, update_baselines
+
+
+def test_suite_runs_every_case():
+    pytest.importorskip("flask")
+    results = run_suite(sizes=[50], iterations=3)
+    assert sorted(results) == sorted(f"{case}@50" for case in CASES)
+    for summary in results.values():
+        assert 0 < summary["p50_ms"] <= summary["p99_ms"]
+        assert summary["ops_per_sec"] > 0
+
+
+def test_compare_applies_thresholds_and_overrides(tmp_path):
+    path = tmp_path / "baselines.json"
+    path.write_text(json.dumps({
+        "thresholds": {"p50": 0.5, "p99": 1.0, "min_ms": 0.2},
+        "cases": {"api_upload@1000": {"p50_ms": 1.0, "p99_ms": 2.0, "thresholds": {"p99": 4.0}}},
+    }))
+    update_baselines({
+        "api_upload@1000": {"p50_ms": 2.0, "p99_ms": 4.0, "ops_per_sec": 500.0},
+        "crm_list@1000": {"p50_ms": 0.01, "p99_ms": 0.02, "ops_per_sec": 9000.0},
+    }, str(path))
+    baselines = json.loads(path.read_text())
+    assert baselines["cases"]["api_upload@1000"]["thresholds"] == {"p99": 4.0}
+
+    assert compare({
+        "api_upload@1000": {"p50_ms": 2.5, "p99_ms": 19.0},  # within +50% / +400%
+        "crm_list@1000": {"p50_ms": 0.1, "p99_ms": 0.2},     # 10x, but under min_ms
+        "api_chat@1000": {"p50_ms": 99.0, "p99_ms": 99.0},   # no baseline
+    }, baselines) == []
+    regressions = compare({"api_upload@1000": {"p50_ms": 3.5, "p99_ms": 4.0}}, baselines)
+    assert len(regressions) == 1 and regressions[0].startswith("api_upload@1000: p50")
@@ -0,0 +1,39 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from core.blobstore import BlobStore
+
+
+def test_identical_uploads_are_stored_once(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    data = b"same media" * 1000
+    digest, first = store.store(io.BytesIO(data), str(tmp_path / "remote100k"), "clip.mp4")
+    _, second = store.store(io.BytesIO(data), str(tmp_path / "tradeviewai"), "promo.mp4")
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert os.path.samefile(first, second)
+    assert open(second, "rb").read() == data
+    assert store.have([digest, "0" * 64]) == [digest]
+    assert store.stats() == {"blobs": 1, "bytes": len(data), "refs": 2, "view_bytes": 2 * len(data)}
+
+
+def test_references_and_gc(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    view = str(tmp_path / "agent")
+    old, _ = store.store(io.BytesIO(b"v1"), view, "notes.txt")
+    new, path = store.store(io.BytesIO(b"v2"), view, "notes.txt")
+    assert open(path, "rb").read() == b"v2"
+    assert store.gc(min_age=0) == 1  # v1 lost its only reference
+    assert store.have([old, new]) == [new]
+
+    with pytest.raises(KeyError):
+        store.link(old, view, "again.txt")
+    with pytest.raises(ValueError):
+        store.link(new, view, "../escape.txt")
+
+    assert store.unlink(view, "notes.txt")
+    assert not os.path.exists(path)
+    assert store.gc(min_age=0) == 1
+    assert store.have([new]) == []
@@ -0,0 +1,41 @@
+import pytest
+
+from core.conversations import ConversationStore
+
+
+def test_projects_window_and_paged_history(tmp_path):
+    store = ConversationStore(str(tmp_path), window=4, max_segment_bytes=512)
+    for i in range(50):
+        store.append("remote100k", "user", f"message {i}")
+    store.append("tradeviewai", "user", "other brand")
+
+    assert [m["content"] for m in store.context("remote100k")] == [f"message {i}" for i in range(46, 50)]
+    assert [m["content"] for m in store.context("tradeviewai")] == ["other brand"]
+    assert store.projects() == ["remote100k", "tradeviewai"]
+
+    page, cursor = store.history("remote100k", limit=20)
+    assert [m["seq"] for m in page] == list(range(31, 51))
+    page, cursor = store.history("remote100k", before=cursor, limit=20)
+    assert page[0]["content"] == "message 10" and cursor == 11
+
+    # A fresh store (restart) restores the window from the log tail.
+    reopened = ConversationStore(str(tmp_path), window=4, max_segment_bytes=512)
+    assert reopened.context("remote100k", limit=2) == store.context("remote100k", limit=2)
+
+    with pytest.raises(ValueError):
+        store.append("../escape", "user", "nope")
+
+
+def test_other_writers_and_legacy_import(tmp_path):
+    first = ConversationStore(str(tmp_path), window=3)
+    second = ConversationStore(str(tmp_path), window=3)
+    first.append("general", "user", "a")
+    second.append("general", "assistant", "b")
+    first.append("general", "user", "c")
+    assert [m["content"] for m in second.context("general")] == ["a", "b", "c"]
+    assert [m["seq"] for m in first.context("general")] == [1, 2, 3]
+
+    legacy = [{"role": "user", "content": "old", "timestamp": "2025-01-01T00:00:00"}]
+    assert first.import_messages("app304", legacy) == 1
+    assert first.import_messages("app304", legacy) == 0
+    assert first.context("app304")[0]["timestamp"] == "2025-01-01T00:00:00"
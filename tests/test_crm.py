@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from core.crm import CRM
+
+
+def test_upsert_dedupes_on_natural_key(tmp_path):
+    crm = CRM(str(tmp_path / "crm.db"))
+    crm.add_remote100k_sub("Logan@Example.com", "pro", "tiktok")
+    crm.add_remote100k_sub("logan@example.com ", "", "instagram")
+    assert crm.count("remote100k") == 1
+    record = crm.find("remote100k", "LOGAN@example.com")
+    # Empty fields never overwrite stored values
+    assert record["plan"] == "pro"
+    assert record["entry_point"] == "instagram"
+    with pytest.raises(ValueError):
+        crm.add_tiktok_lead("No account", "", "dm")
+
+
+def test_paginated_filtered_listing_and_migration(tmp_path):
+    legacy = {"app_304": {"leads": [{"name": f"n{i}", "account": f"@acct{i}", "source": "dm" if i % 2 else "ad"} for i in range(7)]}}
+    legacy["app_304"]["leads"].append({"name": "no handle", "source": "dm"})
+    (tmp_path / "crm.json").write_text(json.dumps(legacy))
+    crm = CRM(str(tmp_path / "crm.db"))
+    assert (tmp_path / "crm.json.migrated").exists()
+    assert crm.migration["app_304"] == {"imported": 7, "skipped": 1}
+    assert CRM(str(tmp_path / "crm.db")).migration is None
+    page, cursor = crm.list("app_304", limit=3)
+    assert [r["account"] for r in page] == ["acct0", "acct1", "acct2"]
+    page, cursor = crm.list("app_304", cursor=cursor, limit=3)
+    assert [r["account"] for r in page] == ["acct3", "acct4", "acct5"]
+    page, cursor = crm.list("app_304", cursor=cursor, limit=3)
+    assert len(page) == 1 and cursor is None
+    dms, _ = crm.list("app_304", filters={"source": "dm"})
+    assert [r["account"] for r in dms] == ["acct1", "acct3", "acct5"]
+
+
+def test_streaming_import_reports_rejected_rows(tmp_path):
+    import io
+
+    from core.crm_import import import_stream
+
+    crm = CRM(str(tmp_path / "crm.db"))
+    data = "Email,Plan\n" + "".join(f"user{i}@example.com,pro\n" for i in range(25)) + "not-an-email,pro\n"
+    report = import_stream(crm, "remote100k", io.BytesIO(data.encode()), "csv", batch_size=10)
+    assert report.inserted == 25
+    assert report.rejected == 1
+    assert report.rejected_rows[0]["line"] == 27
+    assert crm.count("remote100k") == 25
+
+    # A row the csv module cannot parse is rejected, not fatal.
+    huge = '"' + "x" * 200_000 + '"'
+    data = "Email,Plan\n" + f"a@example.com,{huge}\n" + "b@example.com,pro\n"
+    report = import_stream(crm, "remote100k", io.BytesIO(data.encode()), "csv")
+    assert report.inserted == 1 and report.rejected == 1
+    assert report.rejected_rows[0]["error"].startswith("invalid CSV: field larger than field limit")
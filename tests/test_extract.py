@@ -0,0 +1,82 @@
+import os
+import zipfile
+import zlib
+
+import pytest
+
+DOCUMENT_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+    '<w:p><w:r><w:t>Launch plan</w:t></w:r></w:p>'
+    '<w:p><w:r><w:t>Week one:</w:t><w:tab/><w:t>teaser</w:t><w:br/><w:t>then the email</w:t></w:r></w:p>'
+    '<w:tbl><w:tr><w:tc><w:p><w:r><w:t>Budget cell</w:t></w:r></w:p></w:tc></w:tr></w:tbl>'
+    '</w:body></w:document>'
+)
+
+
+@pytest.fixture
+def extract(ajax_system):
+    return ajax_system("core.extract")
+
+
+def test_docx_paragraphs_tabs_breaks_and_tables(extract, tmp_path):
+    path = tmp_path / "plan.docx"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr("word/document.xml", DOCUMENT_XML)
+    text = "".join(extract.iter_docx(str(path)))
+    assert text == "Launch plan\nWeek one:\tteaser\nthen the email\nBudget cell\n"
+
+
+def test_html_drops_scripts_and_styles(extract, tmp_path):
+    path = tmp_path / "page.html"
+    path.write_text(
+        "<html><head><style>p { color: red }</style><script>var x = '<p>no</p>';</script></head>"
+        "<body><h1>Pricing</h1><p>Pro is &pound;20 &amp; billed monthly.</p>"
+        "<noscript>Enable JS</noscript><ul><li>One</li><li>Two</li></ul></body></html>",
+        encoding="utf-8",
+    )
+    lines = [line for line in "".join(extract.iter_html(str(path))).splitlines() if line.strip()]
+    assert lines == ["Pricing", "Pro is £20 & billed monthly.", "One", "Two"]
+
+
+def test_pdf_fallback_reads_text_operators(extract, tmp_path, monkeypatch):
+    monkeypatch.setattr(extract, "pypdf", None)
+    content = (
+        b"BT /F1 12 Tf 72 720 Td (Quarterly \\(Q3\\) report) Tj T* [(Rev) -20 (enue up)] TJ ET\n"
+        b"BT (Second line) ' ET"
+    )
+    packed = zlib.compress(content)
+    pdf = (
+        b"%PDF-1.4\n1 0 obj\n<< /Type /Page >>\nendobj\n"
+        b"2 0 obj\n<< /Subtype /Image /Length 3 >>\nstream\nBT (hidden) Tj ET\nendstream\nendobj\n"
+        + b"3 0 obj\n<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(packed)
+        + packed + b"\nendstream\nendobj\n%%EOF\n"
+    )
+    path = tmp_path / "report.pdf"
+    path.write_bytes(pdf)
+    text = "".join(extract.iter_pdf(str(path)))
+    assert "hidden" not in text
+    assert text.split() == ["Quarterly", "(Q3)", "report", "Revenue", "up", "Second", "line"]
+
+
+def test_extraction_is_cached_by_digest(extract, tmp_path, monkeypatch):
+    cache = str(tmp_path / "cache")
+    path = tmp_path / "page.html"
+    path.write_text("<p>cached once</p>", encoding="utf-8")
+    digest = extract.file_digest(str(path))
+    target = extract.extract_to_cache(str(path), digest, cache)
+    assert target == os.path.join(cache, digest[:2], digest + ".txt")
+    assert "".join(extract.iter_extracted(str(path), digest, cache)).strip() == "cached once"
+
+    def fail(path):
+        raise AssertionError("extracted again")
+
+    monkeypatch.setitem(extract.EXTRACTORS, ".html", fail)
+    assert extract.extract_to_cache(str(path), digest, cache) == target
+    assert "".join(extract.iter_extracted(str(path), digest, cache)).strip() == "cached once"
+    # Plain text is its own extracted form and never cached.
+    notes = tmp_path / "notes.md"
+    notes.write_text("plain notes", encoding="utf-8")
+    assert extract.extract_to_cache(str(notes), None, cache) is None
+    assert "".join(extract.iter_extracted(str(notes), None, cache)) == "plain notes"
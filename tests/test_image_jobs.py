@@ -0,0 +1,87 @@
+import pytest
+
+pytest.importorskip("openai")
+
+from tools.fake_openai import FakeOpenAIServer
+from tools.image_generator import ImageGeneratorTool
+from tools.image_jobs import ImageJobManager
+
+
+@pytest.fixture
+def fake_api():
+    server = FakeOpenAIServer(delay=0.05).start()
+    yield server
+    server.stop()
+
+
+def test_jobs_run_on_background_loop_and_cache_results(fake_api):
+    manager = ImageJobManager(
+        lambda: ImageGeneratorTool(api_key="sk-test", base_url=fake_api.base_url),
+        max_concurrency=2,
+    )
+    try:
+        jobs = [manager.submit(f"a red fox #{i}") for i in range(4)]
+        assert all(job["status"] in {"pending", "running"} for job in jobs)
+        done = [manager.wait(job["id"], timeout=10) for job in jobs]
+        assert all(job["status"] == "done" for job in done)
+        assert all(job["url"].startswith("https://images.local/") for job in done)
+
+        repeat = manager.submit("A  red fox #0")
+        assert repeat["status"] == "done" and repeat["cached"]
+        assert repeat["url"] == done[0]["url"]
+        assert fake_api.requests["/v1/images/generations"] == 4
+    finally:
+        manager.shutdown()
+
+
+def test_failed_job_reports_error():
+    def broken():
+        raise ValueError("OPENAI_API_KEY environment variable not set")
+
+    manager = ImageJobManager(broken)
+    try:
+        job = manager.wait(manager.submit("anything")["id"], timeout=5)
+        assert job["status"] == "failed"
+        assert "OPENAI_API_KEY" in job["error"]
+    finally:
+        manager.shutdown()
+
+
+def test_identical_prompts_share_a_job_and_evicted_jobs_are_unknown(fake_api):
+    manager = ImageJobManager(
+        lambda: ImageGeneratorTool(api_key="sk-test", base_url=fake_api.base_url),
+        max_jobs=2,
+    )
+    try:
+        first = manager.submit("a blue whale")
+        assert manager.submit("A blue  whale")["id"] == first["id"]
+        assert manager.submit("a blue whale", size="512x512")["id"] != first["id"]
+        assert manager.wait(first["id"], timeout=10)["status"] == "done"
+        assert fake_api.requests["/v1/images/generations"] == 2
+
+        frog = manager.submit("a green frog")
+        assert manager.get(first["id"]) is None
+        manager.wait(frog["id"], timeout=10)
+        assert manager.wait(first["id"], timeout=0.1) is None
+    finally:
+        manager.shutdown()
+
+
+def test_jobs_are_visible_to_other_workers_through_the_store(fake_api, tmp_path):
+    from core.shared_state import SharedState
+
+    path = str(tmp_path / "state.db")
+    factory = lambda: ImageGeneratorTool(api_key="sk-test", base_url=fake_api.base_url)
+    first, other = ImageJobManager(factory), ImageJobManager(factory)
+    first.attach_store(SharedState(path, "image_jobs"))
+    other.attach_store(SharedState(path, "image_jobs"))
+    other.poll_interval = 0.01
+    try:
+        job = first.submit("a purple owl")
+        assert other.get(job["id"])["status"] in {"pending", "running", "done"}
+        done = other.wait(job["id"], timeout=10)
+        assert done["status"] == "done" and done["url"] == first.get(job["id"])["url"]
+        assert other.wait("missing", timeout=0.1) is None
+    finally:
+        first.shutdown()
+        other.shutdown()
@@ -0,0 +1,78 @@
+import os
+
+from core.knowledge_index import KnowledgeBase, split_passages
+
+
+def test_incremental_sync_search_and_reload(tmp_path):
+    agent_dir = tmp_path / "investor"
+    agent_dir.mkdir()
+    (agent_dir / "stocks.md").write_text("Dividend growth stocks raise payouts every year.\n\nMomentum trading follows trends.")
+    (agent_dir / "crypto.txt").write_text("Bitcoin halving cuts miner rewards.")
+    (agent_dir / "image.png").write_bytes(b"\x89PNG")
+    kb = KnowledgeBase(str(tmp_path))
+    assert kb.sync("investor") == {"added": 3, "changed": 0, "removed": 0}
+    assert kb.sync("investor") == {"added": 0, "changed": 0, "removed": 0}
+    hits = kb.search("investor", "dividend payouts", k=2)
+    assert hits[0]["file"] == "stocks.md"
+
+    (agent_dir / "crypto.txt").write_text("Ethereum staking yields dividend-like rewards.")
+    os.remove(agent_dir / "image.png")
+    kb.schedule("investor")
+    assert kb.wait_idle(5)
+    assert kb.search("investor", "bitcoin") == []
+    assert kb.search("investor", "staking")[0]["file"] == "crypto.txt"
+
+    # A fresh instance loads the persisted index without re-reading files.
+    reloaded = KnowledgeBase(str(tmp_path))
+    assert reloaded.index("investor").stats() == kb.index("investor").stats()
+    assert reloaded.search("investor", "dividend", k=5) == kb.search("investor", "dividend", k=5)
+
+
+def test_split_passages_caps_length():
+    passages = split_passages(" ".join(["word"] * 250), passage_words=100)
+    assert [len(p.split()) for p in passages] == [100, 100, 50]
+
+
+def test_segments_are_written_per_file(tmp_path):
+    agent_dir = tmp_path / "investor"
+    agent_dir.mkdir()
+    for i in range(3):
+        (agent_dir / f"note{i}.md").write_text(f"Note {i} about index funds and fees.")
+    legacy = tmp_path / ".index" / "investor.json.gz"
+    legacy.parent.mkdir()
+    legacy.write_bytes(b"old")
+    kb = KnowledgeBase(str(tmp_path))
+    kb.sync("investor")
+    segment_dir = tmp_path / ".index" / "investor"
+    segments = {p.name: p.stat().st_mtime_ns for p in segment_dir.iterdir()}
+    assert len(segments) == 3 and not legacy.exists()
+
+    (agent_dir / "note1.md").write_text("Note 1 now covers bond ladders.")
+    os.remove(agent_dir / "note2.md")
+    assert kb.sync("investor") == {"added": 0, "changed": 1, "removed": 1}
+    after = {p.name: p.stat().st_mtime_ns for p in segment_dir.iterdir()}
+    assert len(after) == 2 and not [p for p in segment_dir.iterdir() if p.suffix == ".tmp"]
+    unchanged = set(after) & set(segments)
+    assert len(unchanged) == 2
+    assert sum(after[name] != segments[name] for name in unchanged) == 1
+
+    reloaded = KnowledgeBase(str(tmp_path))
+    assert reloaded.search("investor", "bond ladders")[0]["file"] == "note1.md"
+    assert reloaded.index("investor").stats() == kb.index("investor").stats()
+
+
+def test_files_are_read_in_chunks(tmp_path, monkeypatch):
+    from core import knowledge_index
+
+    page = tmp_path / "page.html"
+    body = "".join(f"<p>Fund&nbsp;{i} &amp; fees <b>low</b></p>\n\n" for i in range(200))
+    page.write_text(f"<html><body>{body}</body></html>", encoding="utf-8")
+    whole = knowledge_index.read_text(str(page))
+    monkeypatch.setattr(knowledge_index, "READ_CHUNK", 7)
+    monkeypatch.setattr(knowledge_index, "MAX_PARAGRAPH_CHARS", 50)
+    assert "".join(knowledge_index.iter_text(str(page))).split() == whole.split()
+    assert "Fund\xa0199 & fees  low" in whole
+    assert split_passages(knowledge_index.iter_text(str(page)), 20) == split_passages(whole, 20)
+    long_text = " ".join(f"w{i}" for i in range(500))
+    assert split_passages(iter([long_text[i:i + 9] for i in range(0, len(long_text), 9)]), 100) == \
+        split_passages(long_text, 100)
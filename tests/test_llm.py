@@ -0,0 +1,112 @@
+import asyncio
+import threading
+
+import pytest
+
+from core.ajax_ai import build_default_ajax
+from core.llm import LLMClient, LLMError
+from core.response_cache import ResponseCache
+from tools.fake_openai import FakeOpenAIServer
+
+
+@pytest.fixture
+def server():
+    server = FakeOpenAIServer().start()
+    yield server
+    server.stop()
+
+
+def ask(text):
+    return [{"role": "user", "content": text}]
+
+
+def test_complete_and_stream_reuse_one_connection(server):
+    llm = LLMClient(server.base_url, model="fake-1")
+    assert llm.complete(ask("hello there")) == "Echo: hello there"
+    chunks = list(llm.stream(ask("hello there")))
+    assert len(chunks) == 3 and "".join(chunks) == "Echo: hello there"
+    for _ in range(5):
+        llm.complete(ask("again"))
+    assert server.connections == 1
+    assert llm.stats()["connections_opened"] == 1
+
+    # An abandoned stream closes its connection instead of reusing it.
+    next(llm.stream(ask("one two three")))
+    assert llm.complete(ask("after")) == "Echo: after"
+
+
+def test_retries_timeouts_and_concurrency_limit(server):
+    llm = LLMClient(server.base_url, max_retries=2, backoff=0.01)
+    server.fail_next = 2
+    assert llm.complete(ask("retry")) == "Echo: retry"
+    assert llm.stats()["retries"] == 2
+    server.fail_next = 3
+    with pytest.raises(LLMError) as error:
+        llm.complete(ask("give up"))
+    assert error.value.status == 503
+
+    server.delay = 0.05
+    limited = LLMClient(server.base_url, max_connections=2)
+    threads = [threading.Thread(target=limited.complete, args=(ask("x"),)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert server.peak <= 2 and limited.stats()["connections_opened"] <= 2
+
+    server.delay = 0.3
+    with pytest.raises(LLMError):
+        LLMClient(server.base_url, max_retries=0).complete(ask("slow"), timeout=0.05)
+
+
+def test_ajax_and_agents_answer_through_the_client(server):
+    ajax = build_default_ajax()
+    llm = LLMClient(server.base_url, model="fake-1", temperature=0.2)
+    ajax.attach_llm(llm)
+    cache = ResponseCache()
+    ajax.attach_cache(cache)
+    assert ajax.generate_response("Draft the launch post") == "Echo: Draft the launch post"
+    assert "".join(ajax.delegate_stream("investor", "Analyze TSLA")) == "Echo: Analyze TSLA"
+    assert ajax.delegate("investor", "analyze tsla") == "Echo: Analyze TSLA"
+    assert ajax.agent_registry["investor"].model_params == {"model": "fake-1", "temperature": 0.2}
+
+    # Detaching the model restores the offline replies under new cache keys.
+    ajax.attach_llm(None)
+    assert "[InvestorAgent]" in ajax.delegate("investor", "Analyze TSLA")
+
+
+def test_chat_context_reaches_the_model_and_the_cache_key(server):
+    ajax = build_default_ajax()
+    ajax.attach_llm(LLMClient(server.base_url))
+    ajax.attach_cache(ResponseCache())
+    context = [
+        {"role": "user", "content": "Who is the launch for?", "seq": 1},
+        {"role": "assistant", "content": "Remote100k subscribers.", "seq": 2},
+    ]
+    messages = ajax.llm_messages("Draft it", context)
+    assert [m["role"] for m in messages] == ["system", "user", "assistant", "user"]
+    assert messages[1] == {"role": "user", "content": "Who is the launch for?"}
+
+    chat = "/v1/chat/completions"
+    assert ajax.generate_response("Draft it") == "Echo: Draft it"
+    calls = server.requests[chat]
+    assert "".join(ajax.stream_response("Draft it", context)) == "Echo: Draft it"
+    assert server.requests[chat] == calls + 1
+    assert "".join(ajax.stream_response("Draft it", context)) == "Echo: Draft it"
+    assert server.requests[chat] == calls + 1
+
+
+def test_astream_retries_and_reuses_connection(server):
+    llm = LLMClient(server.base_url, backoff=0.01)
+
+    async def collect(text):
+        return [delta async for delta in llm.astream(ask(text))]
+
+    async def scenario():
+        assert "".join(await collect("hello async")) == "Echo: hello async"
+        server.fail_next = 1
+        assert "".join(await collect("retry")) == "Echo: retry"
+
+    asyncio.run(scenario())
+    assert server.connections == 1
+    assert llm.stats()["retries"] == 1
@@ -0,0 +1,116 @@
+import json
+import os
+import sys
+
+import pytest
+
+from core.ajax_ai import AjaxAI
+from core.plugins import PluginError, PluginRegistry
+
+AGENT_CODE = """
+from core.agents.base_agent import BaseAgent
+
+
+class {name}(BaseAgent):
+    def handle_task(self, task):
+        return "{reply} " + task
+"""
+
+
+def test_spec_is_imported_on_first_lookup_and_reloaded(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module = tmp_path / "lazy_agent_mod.py"
+    module.write_text(AGENT_CODE.format(name="LazyAgent", reply="v1"))
+    loaded = []
+    registry = PluginRegistry(on_load=lambda name, agent: loaded.append(name), check_interval=0)
+    registry.add("lazy", "lazy_agent_mod:LazyAgent")
+
+    assert "lazy" in registry and list(registry) == ["lazy"]
+    assert "lazy_agent_mod" not in sys.modules and loaded == []
+    assert registry["lazy"].handle_task("x") == "v1 x"
+
+    module.write_text(AGENT_CODE.format(name="LazyAgent", reply="version2"))
+    assert registry["lazy"].handle_task("x") == "version2 x"
+    assert loaded == ["lazy", "lazy"]
+    sys.modules.pop("lazy_agent_mod", None)
+
+
+def test_config_directories_hot_reload(tmp_path):
+    registry = PluginRegistry(config_dirs=[str(tmp_path)], scan_interval=0, check_interval=0)
+    agent_dir = tmp_path / "closer"
+    agent_dir.mkdir()
+    assert "closer" not in registry
+    (agent_dir / "config.json").write_text(json.dumps({"name": "Closer", "role": "sales"}))
+    (agent_dir / "training.md").write_text("Always ask for the sale.")
+
+    agent = registry["closer"]
+    assert agent.handle_task("pitch") == "[Closer] Processing task as sales: pitch"
+    assert "Always ask for the sale." in agent.system_prompt
+
+    (agent_dir / "agent.py").write_text(AGENT_CODE.format(name="Closer", reply="custom"))
+    assert registry["closer"].handle_task("pitch") == "custom pitch"
+
+    # Broken code keeps the last good version and reports the error.
+    (agent_dir / "agent.py").write_text("def oops(:\n")
+    assert registry["closer"].handle_task("pitch") == "custom pitch"
+    assert registry.describe()[0]["error"].startswith("SyntaxError")
+
+    for path in agent_dir.iterdir():
+        path.unlink()
+    os.rmdir(agent_dir)
+    assert "closer" not in registry
+
+    broken = tmp_path / "broken"
+    broken.mkdir()
+    (broken / "config.json").write_text("[]")
+    with pytest.raises(PluginError):
+        registry["broken"]
+
+
+def test_ajax_delegates_to_discovered_agents(tmp_path):
+    agent_dir = tmp_path / "scout"
+    agent_dir.mkdir()
+    (agent_dir / "config.json").write_text(json.dumps({"name": "Scout"}))
+    ajax = AjaxAI(memory_path=str(tmp_path / "memory.json"), plugin_dirs=[str(tmp_path)])
+    ajax.register_agent("investor", "core.agents.investor_agent:InvestorAgent")
+    assert sorted(ajax.agent_registry) == ["investor", "scout"]
+    assert ajax.delegate("scout", "find leads") == "[Scout] Processing task: find leads"
+    assert list(ajax.agent_registry.loaded()) == ["scout"]
+    with pytest.raises(ValueError):
+        ajax.register_agent("scout", "core.agents.dev:DevAgent")
+
+
+def test_slow_load_does_not_block_other_agents(tmp_path, monkeypatch):
+    import threading
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+    (tmp_path / "slow_agent_mod.py").write_text(AGENT_CODE.format(name="SlowAgent", reply="slow"))
+    (tmp_path / "fast_agent_mod.py").write_text(AGENT_CODE.format(name="FastAgent", reply="fast"))
+    started, release = threading.Event(), threading.Event()
+    loaded = []
+
+    def on_load(name, agent):
+        loaded.append(name)
+        if name == "slow":
+            started.set()
+            release.wait(5)
+
+    registry = PluginRegistry(on_load=on_load)
+    registry.add("slow", "slow_agent_mod:SlowAgent")
+    registry.add("fast", "fast_agent_mod:FastAgent")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry["slow"].handle_task("x")))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    assert started.wait(5)
+    # The registry stays usable while "slow" is still loading.
+    assert "slow" in registry
+    assert registry["fast"].handle_task("x") == "fast x"
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == ["slow x"] * 3
+    assert sorted(loaded) == ["fast", "slow"]
+    for mod in ("slow_agent_mod", "fast_agent_mod"):
+        sys.modules.pop(mod, None)
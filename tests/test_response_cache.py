@@ -0,0 +1,64 @@
+import time
+
+from core.ajax_ai import build_default_ajax
+from core.response_cache import ResponseCache
+
+
+def test_tiers_normalisation_and_invalidation(tmp_path):
+    path = str(tmp_path / "responses.db")
+    cache = ResponseCache(path, generation_ttl=0.05)
+    cache.set("What do you sell?", "Courses.", mode="logan", agent="ajax")
+    assert cache.get("  what do you SELL ", mode="logan", agent="ajax") == "Courses."
+    assert cache.get("What do you sell?", mode="ajax", agent="ajax") is None
+    assert cache.get("What do you sell?", mode="logan", agent="ajax", params={"temperature": 1}) is None
+
+    # Another process (or a restart) finds the entry on disk.
+    other = ResponseCache(path)
+    assert other.get("what do you sell", mode="logan", agent="ajax") == "Courses."
+    assert other.stats()["disk"]["hits"] == 1
+
+    # Memory hits build their key without querying SQLite each time.
+    statements = []
+    cache._conn().set_trace_callback(statements.append)
+    cache.set("Analyze TSLA", "Buy.", agent="investor")
+    for _ in range(100):
+        assert cache.get("analyze tsla", agent="investor") == "Buy."
+    assert len([sql for sql in statements if "generations" in sql]) <= 1
+    cache._conn().set_trace_callback(None)
+
+    other.invalidate("investor")
+    assert other.get("Analyze TSLA", agent="investor") is None
+    time.sleep(0.06)  # cache re-reads generations after generation_ttl
+    assert cache.get("Analyze TSLA", agent="investor") is None
+    assert cache.get("what do you sell", mode="logan", agent="ajax") == "Courses."
+
+
+def test_expiry_and_stream(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.db"))
+    cache.set("short lived", "gone soon", ttl=0.05)
+    time.sleep(0.1)
+    assert cache.get("short lived") is None
+
+    calls = []
+
+    def produce():
+        calls.append(1)
+        yield from ["a", "b"]
+
+    assert list(cache.stream("hello", produce)) == ["a", "b"]
+    assert list(cache.stream("hello", produce)) == ["ab"]
+    assert len(calls) == 1
+
+
+def test_ajax_replies_and_delegation_are_cached():
+    ajax = build_default_ajax()
+    cache = ResponseCache()
+    ajax.attach_cache(cache)
+    first = ajax.generate_response("Schedule my meeting")
+    assert ajax.generate_response("schedule my meeting.") == first
+    ajax.is_logan_present = False
+    assert ajax.generate_response("Schedule my meeting") != first
+
+    reply = ajax.delegate("investor", "Analyze TSLA earnings")
+    assert "".join(ajax.delegate_stream("investor", "analyze tsla earnings")) == reply
+    assert cache.stats()["hits"] == 2
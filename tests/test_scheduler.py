@@ -0,0 +1,161 @@
+import json
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture
+def scheduler(ajax_system):
+    return ajax_system("core.scheduler")
+
+
+@pytest.fixture
+def new_york(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    if time.tzname != ("EST", "EDT"):
+        pytest.skip("time zone database not available")
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def runs(cron, start, count=3):
+    ts = datetime(*start).timestamp()
+    out = []
+    for _ in range(count):
+        ts = cron.next_after(ts)
+        out.append(datetime.fromtimestamp(ts))
+    return out
+
+
+def test_cron_fields_and_day_semantics(scheduler):
+    Cron = scheduler.Cron
+    # Weekdays only: Friday 2026-01-02 17:00 rolls over the weekend.
+    assert runs(Cron("0 9 * * 1-5"), (2026, 1, 2, 17, 0)) == [
+        datetime(2026, 1, 5, 9), datetime(2026, 1, 6, 9), datetime(2026, 1, 7, 9)]
+    # Month and year boundaries; 7 is Sunday as well as 0.
+    assert runs(Cron("*/20 23 31 12 *"), (2026, 12, 31, 23, 30)) == [
+        datetime(2026, 12, 31, 23, 40), datetime(2027, 12, 31, 23, 0), datetime(2027, 12, 31, 23, 20)]
+    assert runs(Cron("0 0 * * 7"), (2026, 1, 1, 0, 0), 1) == [datetime(2026, 1, 4)]
+    assert runs(Cron("0 0 29 2 *"), (2026, 1, 1, 0, 0), 2) == [datetime(2028, 2, 29), datetime(2032, 2, 29)]
+    # Both day fields restricted: the 13th OR any Friday.
+    assert runs(Cron("0 9 13 * 5"), (2026, 1, 1, 0, 0)) == [
+        datetime(2026, 1, 2, 9), datetime(2026, 1, 9, 9), datetime(2026, 1, 13, 9)]
+    # Only one restricted: it alone decides.
+    assert runs(Cron("0 9 13 * *"), (2026, 1, 1, 0, 0), 1) == [datetime(2026, 1, 13, 9)]
+    assert runs(Cron("0 9 */10 * 5"), (2026, 1, 1, 0, 0), 2) == [datetime(2026, 1, 2, 9), datetime(2026, 1, 9, 9)]
+
+    for bad in ("* * *", "60 * * * *", "0 0 31 2 *", "*/0 * * * *", "a * * * *"):
+        with pytest.raises(ValueError):
+            Cron(bad)
+
+
+def test_cron_across_dst_changes(scheduler, new_york):
+    Cron = scheduler.Cron
+    # 02:30 does not exist on 2026-03-08; that day's run happens at 03:30.
+    assert runs(Cron("30 2 * * *"), (2026, 3, 7, 12, 0)) == [
+        datetime(2026, 3, 8, 3, 30), datetime(2026, 3, 9, 2, 30), datetime(2026, 3, 10, 2, 30)]
+    # 01:30 happens twice on 2026-11-01; it runs once.
+    first, second = runs(Cron("30 1 * * *"), (2026, 10, 31, 12, 0), 2)
+    assert (first, second) == (datetime(2026, 11, 1, 1, 30), datetime(2026, 11, 2, 1, 30))
+    assert second.timestamp() - first.timestamp() == 25 * 3600
+    # Hourly runs keep one-hour spacing in real time across the switch.
+    hourly = [t.timestamp() for t in runs(Cron("0 * * * *"), (2026, 3, 8, 0, 30), 4)]
+    assert [b - a for a, b in zip(hourly, hourly[1:])] == [3600, 3600, 3600]
+
+
+def test_running_behaviour_is_skipped_not_doubled(scheduler, tmp_path):
+    release = threading.Event()
+    records = []
+
+    def slow():
+        release.wait(5)
+        return "slow done"
+
+    sched = scheduler.IdleScheduler(str(tmp_path / "schedule.json"), {"slow": slow},
+                                    record=lambda **entry: records.append(entry))
+    sched.reload({"slow": {"interval_minutes": 1}})
+    job = sched._jobs["slow"]
+    with sched._cond:
+        job.interval = 0.05  # due every 50 ms for the test
+        job.next_run = time.time()
+        sched._heap = [(job.next_run, next(sched._seq), "slow")]
+    sched.start()
+    try:
+        time.sleep(0.4)
+        [status] = sched.status()
+        assert status["running"] and status["runs"] == 0 and status["skipped"] >= 3
+        release.set()
+        deadline = time.time() + 2
+        while time.time() < deadline and not records:
+            time.sleep(0.01)
+    finally:
+        sched.stop()
+    assert records[0] == {"description": "slow done", "status": "done"}
+
+
+def test_next_runs_survive_a_restart(scheduler, tmp_path):
+    path = str(tmp_path / "schedule.json")
+    actions = {"sheets": lambda: "sheets", "news": lambda: "news"}
+    config = {"sheets": {"cron": "0 9 * * 1-5"}, "news": {"interval_minutes": 15}}
+    first = scheduler.IdleScheduler(path, actions, record=lambda **entry: None)
+    first.reload(config)
+    saved = {name: job.next_run for name, job in first._jobs.items()}
+
+    second = scheduler.IdleScheduler(path, actions, record=lambda **entry: None)
+    second.reload(config)
+    assert {name: job.next_run for name, job in second._jobs.items()} == saved
+
+    # A changed schedule is not restored; a missed run happens soon.
+    with open(path) as f:
+        state = json.load(f)
+    state["news"]["next_run"] = time.time() - 3600
+    with open(path, "w") as f:
+        json.dump(state, f)
+    third = scheduler.IdleScheduler(path, actions, record=lambda **entry: None)
+    before = time.time()
+    third.reload(dict(config, sheets={"cron": "0 10 * * 1-5"}))
+    assert third._jobs["sheets"].next_run != saved["sheets"]
+    assert datetime.fromtimestamp(third._jobs["sheets"].next_run).hour == 10
+    assert before <= third._jobs["news"].next_run <= time.time() + 5
+
+
+def test_pool_exists_only_while_running(scheduler, tmp_path):
+    records = []
+    sched = scheduler.IdleScheduler(str(tmp_path / "schedule.json"), {"quick": lambda: "quick"},
+                                    record=lambda **entry: records.append(entry))
+    sched.reload({"quick": {"interval_minutes": 1}, "max_workers": 2})
+    assert sched._pool is None
+    sched.start()
+    sched.stop()
+    assert sched._pool is None
+
+    # A stopped scheduler runs behaviours again once restarted.
+    with sched._cond:
+        job = sched._jobs["quick"]
+        job.next_run = time.time()
+        sched._heap = [(job.next_run, next(sched._seq), "quick")]
+    sched.start()
+    try:
+        deadline = time.time() + 2
+        while time.time() < deadline and not records:
+            time.sleep(0.01)
+    finally:
+        sched.stop()
+    assert records == [{"description": "quick", "status": "done"}]
+
+
+def test_failing_record_is_logged_not_counted_as_a_failed_run(scheduler, tmp_path, caplog):
+    def record(**entry):
+        raise OSError("disk full")
+
+    sched = scheduler.IdleScheduler(str(tmp_path / "schedule.json"), {"quick": lambda: "quick"}, record=record)
+    sched.reload({"quick": {"interval_minutes": 1}})
+    with caplog.at_level("ERROR"):
+        sched._execute(sched._jobs["quick"])
+    [status] = sched.status()
+    assert status["last_status"] == "done" and status["runs"] == 1
+    assert "cannot record idle behaviour quick" in caplog.text
@@ -0,0 +1,41 @@
+from core.shared_state import SharedState
+
+
+def test_namespaces_share_one_database(tmp_path):
+    path = str(tmp_path / "state.db")
+    status = SharedState(path, "status", defaults={"mode": "ajax", "history": []})
+    other = SharedState(path, "status", defaults={"mode": "logan"})
+    assert other.get("mode") == "ajax"
+    other.set("mode", "logan")
+    assert status.get("mode") == "logan"
+    for i in range(7):
+        status.push("history", i, keep=5)
+    assert other.get("history") == [2, 3, 4, 5, 6]
+    assert SharedState(path, "chat").is_empty()
+
+
+def test_set_many_is_seen_all_at_once(tmp_path):
+    import threading
+
+    path = str(tmp_path / "state.db")
+    writer = SharedState(path, "status")
+    writer.set_many(current_task=0, live_status=0)
+    torn = []
+    done = threading.Event()
+
+    def read():
+        reader = SharedState(path, "status")
+        while not done.is_set():
+            values = reader.all()
+            if values["current_task"] != values["live_status"]:
+                torn.append(values)
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    try:
+        for i in range(1, 300):
+            writer.set_many(current_task=i, live_status=i)
+    finally:
+        done.set()
+        thread.join()
+    assert torn == []
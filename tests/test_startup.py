@@ -0,0 +1,32 @@
+import pytest
+
+from benchmarks.bench_startup import BUDGET_RSS_MB, BUDGET_SECONDS, measure_startup
+from tools.registry import ToolRegistry
+
+
+def test_create_app_stays_within_startup_budget():
+    pytest.importorskip("flask")
+    warm = measure_startup(runs=2)[-1]
+    assert warm["heavy_modules"] == []
+    assert warm["total_s"] < BUDGET_SECONDS
+    assert warm["rss_mb"] < BUDGET_RSS_MB
+
+
+def test_tools_are_built_on_first_use_and_failures_retried():
+    attempts = []
+
+    def flaky(**kwargs):
+        attempts.append(kwargs)
+        if len(attempts) == 1:
+            raise ValueError("OPENAI_API_KEY environment variable not set")
+        return object()
+
+    tools = ToolRegistry()
+    tools.register("image", flaky, size="512x512")
+    assert "image" in tools and attempts == []
+    with pytest.raises(ValueError):
+        tools["image"]
+    assert tools.stats()[0]["error"].startswith("ValueError")
+    tool = tools.factory("image")()
+    assert tools["image"] is tool and len(attempts) == 2
+    assert tools.stats()[0]["loaded"] and tools.stats()[0]["error"] is None
@@ -0,0 +1,41 @@
+import gzip
+
+from flask import Flask
+
+from backend.static_assets import IMMUTABLE, StaticAssets, is_hashed
+
+
+def test_precompressed_hashed_assets_and_revalidation(tmp_path):
+    (tmp_path / "assets").mkdir()
+    bundle = b"console.log('hello');\n" * 200
+    (tmp_path / "assets" / "index-D0ail4gG.js").write_bytes(bundle)
+    (tmp_path / "index.html").write_text("<html></html>")
+    assets = StaticAssets(str(tmp_path))
+    app = Flask(__name__)
+
+    with app.test_request_context(headers={"Accept-Encoding": "br;q=0, gzip"}):
+        resp = assets.response("assets/index-D0ail4gG.js")
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert resp.headers["Cache-Control"] == IMMUTABLE
+    assert gzip.decompress(resp.get_data()) == bundle
+    etag = resp.headers["ETag"]
+
+    with app.test_request_context(headers={"Accept-Encoding": "gzip", "If-None-Match": etag}):
+        assert assets.response("assets/index-D0ail4gG.js").status_code == 304
+    with app.test_request_context():
+        resp = assets.response("index.html")
+        assert resp.headers["Cache-Control"] == "no-cache"
+        assert "Content-Encoding" not in resp.headers
+        assert assets.response("../secret") is None
+        # Files created after startup are picked up.
+        (tmp_path / "late.txt").write_text("late")
+        assert assets.response("late.txt").get_data() == b"late"
+
+
+def test_only_hashed_build_output_is_immutable():
+    assert is_hashed("assets/index-D0ail4gG.js")
+    assert is_hashed("assets/vendor-1a2b3c4d.css")
+    for name in ("apple-touch-icon.png", "android-chrome-192x192.png", "logo-dark-mode.svg",
+                 "favicon-12345678.png", "assets/logo-dark-mode.svg", "assets/index.js",
+                 "assets/icons/brand-D0ail4gG.svg"):
+        assert not is_hashed(name), name
@@ -0,0 +1,55 @@
+import pytest
+
+TEXT = """
+Remote100k helps people find remote jobs at growing startups. The newsletter goes out every Monday morning.
+Each issue lists fifty remote jobs picked from hundreds of startups. Subscribers can upgrade to Pro for early access to remote jobs.
+Pro members also get salary data for remote startups. The weather was nice on the day we launched the site.
+Startups pay to feature their remote jobs at the top of the newsletter. Most readers open the newsletter within an hour.
+
+Featured jobs get three times as many clicks from remote job seekers.
+"""
+
+
+@pytest.fixture
+def summarise(ajax_system):
+    return ajax_system("core.summarise")
+
+
+def matrix(summarise, text):
+    m = summarise._Matrix()
+    for span in summarise._spans([text]):
+        m.add(*span)
+    return m
+
+
+def test_numpy_and_python_rankings_agree(summarise):
+    pytest.importorskip("numpy")
+    m = matrix(summarise, TEXT)
+    assert m.n == 9
+    fast = summarise._rank_numpy(m, 50)
+    slow = summarise._rank_python(m, 50)
+    assert fast == pytest.approx(slow, abs=1e-9)
+    # The off-topic sentence shares no terms and ranks last.
+    assert min(range(m.n), key=fast.__getitem__) == 5
+
+
+def test_summary_respects_budget_and_document_order(summarise, monkeypatch):
+    sentences = [" ".join(s.split()) for s in summarise.split_sentences([TEXT])]
+    for max_words, max_sentences in ((25, None), (60, 2), (200, None)):
+        summary = summarise.summarise_text(TEXT, max_words=max_words, max_sentences=max_sentences)
+        assert 0 < len(summary.split()) <= max_words
+        chosen = [s for s in sentences if s in summary]
+        assert " ".join(chosen) == summary
+        assert max_sentences is None or len(chosen) <= max_sentences
+    assert "weather" not in summarise.summarise_text(TEXT, max_words=60)
+
+    # The pure-Python fallback picks the same sentences.
+    expected = summarise.summarise_text(TEXT, max_words=60)
+    monkeypatch.setattr(summarise, "np", None)
+    assert summarise.summarise_text(TEXT, max_words=60) == expected
+
+
+def test_run_on_text_falls_back_to_leading_words(summarise):
+    text = " ".join(f"word{i}" for i in range(120)) + "."
+    assert summarise.summarise_text(text, max_words=10) == " ".join(f"word{i}" for i in range(10)) + "..."
+    assert summarise.summarise_text("", max_words=10) == ""
@@ -0,0 +1,82 @@
+import time
+
+from core.task_queue import QueueWorkerPool, TaskQueue
+
+
+def test_priority_order_and_retry_with_backoff(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue.db"), backoff_base=0.05)
+    low = queue.enqueue("later", priority="low")
+    high = queue.enqueue("urgent", priority="high")
+    assert low["id"] < high["id"]
+    assert queue.claim()["id"] == high["id"]
+    claimed = queue.claim()
+    assert claimed["id"] == low["id"] and claimed["status"] == "running"
+    retry = queue.fail(low["id"], "boom")
+    assert retry["status"] == "pending" and retry["attempts"] == 1
+    # Backoff delays the next attempt
+    assert queue.claim() is None
+    time.sleep(0.06)
+    assert queue.claim()["attempts"] == 2
+
+
+def test_worker_pool_drains_queue_and_reports_stats(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue.db"), backoff_base=0.01)
+    calls = {}
+
+    def handler(task):
+        calls[task["id"]] = calls.get(task["id"], 0) + 1
+        if task["task"] == "flaky" and calls[task["id"]] < 2:
+            raise RuntimeError("transient")
+        if task["task"] == "broken":
+            raise RuntimeError("permanent")
+        return task["task"].upper()
+
+    ids = [queue.enqueue(t)["id"] for t in ["a", "b", "flaky", "broken"]]
+    pool = QueueWorkerPool(queue, handler, workers=3, poll_interval=0.01).start()
+    try:
+        deadline = time.time() + 5
+        while time.time() < deadline and queue.stats()["depth"].get("pending", 0) + queue.stats()["depth"].get("running", 0):
+            time.sleep(0.02)
+    finally:
+        pool.stop()
+    tasks = {t["id"]: t for t in queue.list()}
+    assert tasks[ids[0]]["result"] == "A"
+    assert tasks[ids[2]]["status"] == "done" and tasks[ids[2]]["attempts"] == 2
+    assert tasks[ids[3]]["status"] == "failed" and tasks[ids[3]]["attempts"] == 3
+    stats = queue.stats()
+    assert stats["depth"] == {"done": 3, "failed": 1}
+    assert stats["throughput_per_sec"] > 0
+
+
+def test_leases_are_renewed_and_expired_leases_count_as_attempts(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue.db"), lease=0.15)
+    slow = queue.enqueue("slow")
+    runs = []
+
+    def handler(task):
+        runs.append(task["id"])
+        time.sleep(0.6)  # four leases long, kept alive by the heartbeat
+        return "ok"
+
+    pool = QueueWorkerPool(queue, handler, workers=2, poll_interval=0.01).start()
+    try:
+        deadline = time.time() + 5
+        while time.time() < deadline and queue.get(slow["id"])["status"] != "done":
+            time.sleep(0.02)
+    finally:
+        pool.stop()
+    assert runs == [slow["id"]]
+    assert queue.get(slow["id"])["attempts"] == 1
+
+    # A worker that dies without renewing: reclaimed until max_attempts.
+    crash = queue.enqueue("crash", max_attempts=2)
+    assert queue.claim()["attempts"] == 1
+    assert queue.claim() is None
+    time.sleep(0.2)
+    claimed = queue.claim()
+    assert claimed["id"] == crash["id"] and claimed["attempts"] == 2
+    assert not queue.renew(crash["id"], 1)
+    time.sleep(0.2)
+    assert queue.claim() is None
+    failed = queue.get(crash["id"])
+    assert failed["status"] == "failed" and failed["error"] == "worker lease expired"
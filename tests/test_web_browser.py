@@ -0,0 +1,101 @@
+import contextlib
+import time
+
+import pytest
+
+from tools import web_browser
+from tools.web_browser import BrowserPool, WebBrowserTool
+
+
+class FakePage:
+    def __init__(self, browser):
+        self.browser = browser
+        self.url = None
+        self.closed = False
+
+    def goto(self, url, wait_until=None, timeout=None):
+        if "crash" in url:
+            self.browser.connected = False
+            raise RuntimeError("Target crashed")
+        self.url = url
+
+    def title(self):
+        return f"Title of {self.url}"
+
+    def inner_text(self, selector):
+        return "body"
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        if not self.browser.connected:
+            raise RuntimeError("browser gone")
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    def new_context(self):
+        return self
+
+    def new_page(self):
+        return FakePage(self)
+
+    def close(self):
+        self.connected = False
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.launches = 0
+        self.chromium = self
+
+    def launch(self, headless=True):
+        self.launches += 1
+        return FakeBrowser()
+
+
+def test_pool_reuses_browser_recovers_from_crash_and_caches(monkeypatch):
+    fake = FakePlaywright()
+    monkeypatch.setattr(web_browser, "_sync_playwright", lambda: lambda: contextlib.nullcontext(fake))
+    tool = WebBrowserTool(pool_size=1)
+    try:
+        for i in range(3):
+            assert tool.run({"url": f"http://example.test/{i}"})["title"] == f"Title of http://example.test/{i}"
+        assert fake.launches == 1
+        with pytest.raises(RuntimeError):
+            tool.run({"url": "http://example.test/crash"})
+        assert tool.run({"url": "http://example.test/after"})["cached"] is False
+        assert fake.launches == 2 and tool.pool.restarts == 1
+        assert tool.run({"url": "http://example.test/0"})["cached"] is True
+    finally:
+        tool.close()
+
+
+def test_worker_restarts_playwright_after_it_fails(monkeypatch):
+    fake = FakePlaywright()
+    starts = []
+
+    def sync_playwright():
+        starts.append(1)
+        if len(starts) == 1:
+            raise RuntimeError("driver exited")
+        return contextlib.nullcontext(fake)
+
+    monkeypatch.setattr(web_browser, "_sync_playwright", lambda: sync_playwright)
+    monkeypatch.setattr(BrowserPool, "restart_delay", 0.2)
+    pool = BrowserPool(size=1)
+    try:
+        with pytest.raises(RuntimeError, match="driver exited"):
+            pool.fetch("http://example.test/early")
+        time.sleep(0.3)  # past the restart delay
+        assert pool.fetch("http://example.test/later", timeout=1)["title"] == "Title of http://example.test/later"
+        assert len(starts) == 2
+    finally:
+        pool.close()
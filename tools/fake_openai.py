@@ -0,0 +1,193 @@
+"""
+Local stand-in for the OpenAI HTTP API.
+
+Serves just enough of the API for offline tests and benchmarks:
+
+* ``POST /v1/images/generations`` returns a deterministic URL derived
+  from the prompt.
+* ``POST /v1/chat/completions`` answers ``Echo: <last user message>``,
+  either as one JSON completion or, with ``"stream": true``, as a
+  server-sent event stream of one delta per word.
+
+Run it standalone with ``python -m tools.fake_openai --port 8100`` and
+point clients at it with ``OPENAI_BASE_URL=http://127.0.0.1:8100/v1``.
+An optional artificial ``delay`` simulates upstream latency before the
+first byte and ``token_delay`` the time between streamed words.  Setting
+``fail_next`` answers that many following requests with 503, and the
+server counts connections and the peak number of concurrent requests so
+tests can check pooling and concurrency limits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, Optional
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; with Nagle on, a
+    # keep-alive client would wait for the delayed ACK on every reply.
+    disable_nagle_algorithm = True
+    server: 'FakeOpenAIServer'
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.connected()
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - stdlib signature
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b'{}'
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            return {}
+
+    def _send_chunk(self, data: bytes) -> None:
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+
+    def _chat(self, body: Dict[str, Any]) -> None:
+        prompt = ''
+        for message in body.get('messages') or []:
+            if isinstance(message, dict) and message.get('role') == 'user':
+                prompt = str(message.get('content', ''))
+        words = f'Echo: {prompt}'.split(' ')
+        model = body.get('model', 'fake')
+        if not body.get('stream'):
+            self._send_json(200, {
+                'object': 'chat.completion',
+                'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ' '.join(words)},
+                             'finish_reason': 'stop'}],
+            })
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i, word in enumerate(words):
+            if i and self.server.token_delay:
+                time.sleep(self.server.token_delay)
+            delta = {'content': word if i == len(words) - 1 else word + ' '}
+            chunk = {'object': 'chat.completion.chunk', 'model': model,
+                     'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]}
+            self._send_chunk(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+        self._send_chunk(b'data: [DONE]\n\n')
+        self._send_chunk(b'')
+
+    def do_POST(self) -> None:
+        body = self._read_json()
+        self.server.record(self.path)
+        with self.server.in_flight():
+            self._handle_post(body)
+
+    def _handle_post(self, body: Dict[str, Any]) -> None:
+        if self.server.take_failure():
+            self._send_json(503, {'error': {'message': 'overloaded'}}, {'Retry-After': '0'})
+            return
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        if self.path.rstrip('/').endswith('/chat/completions'):
+            self._chat(body)
+            return
+        if self.path.rstrip('/').endswith('/images/generations'):
+            digest = hashlib.sha1(str(body.get('prompt', '')).encode('utf-8')).hexdigest()[:16]
+            self._send_json(200, {
+                'created': int(time.time()),
+                'data': [{'url': f'https://images.local/{digest}.png'} for _ in range(int(body.get('n', 1)))],
+            })
+            return
+        self._send_json(404, {'error': {'message': f'unknown path {self.path}'}})
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """Threaded HTTP server emulating the OpenAI endpoints above."""
+
+    daemon_threads = True
+    # Benchmarks open many connections at once; the default backlog of 5
+    # would turn that into resets and SYN retransmits.
+    request_queue_size = 128
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, delay: float = 0.0, token_delay: float = 0.0) -> None:
+        super().__init__((host, port), _Handler)
+        self.delay = delay
+        self.token_delay = token_delay
+        self.fail_next = 0
+        self.connections = 0
+        self.active = 0
+        self.peak = 0
+        self.requests: Dict[str, int] = {}
+        self._counter_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def record(self, path: str) -> None:
+        with self._counter_lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def connected(self) -> None:
+        with self._counter_lock:
+            self.connections += 1
+
+    def take_failure(self) -> bool:
+        with self._counter_lock:
+            if self.fail_next <= 0:
+                return False
+            self.fail_next -= 1
+            return True
+
+    @contextmanager
+    def in_flight(self) -> Iterator[None]:
+        with self._counter_lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            yield
+        finally:
+            with self._counter_lock:
+                self.active -= 1
+
+    def start(self) -> 'FakeOpenAIServer':
+        """Serve on a daemon thread and return self."""
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-openai', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a local fake OpenAI API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds to sleep per request')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='seconds between streamed words')
+    args = parser.parse_args()
+    server = FakeOpenAIServer(args.host, args.port, args.delay, args.token_delay)
+    print(f'Fake OpenAI API listening on {server.base_url}')
+    server.serve_forever()
@@ -1,4 +1,6 @@
 import os
+from typing import Optional
+
 from openai import AsyncOpenAI
 
 
@@ -7,14 +9,23 @@ class ImageGeneratorTool:
 
     name = "image"
 
-    def __init__(self) -> None:
-        api_key = os.getenv("OPENAI_API_KEY")
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None) -> None:
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable not set")
-        self.client = AsyncOpenAI(api_key=api_key)
+        # base_url (or OPENAI_BASE_URL) points the client at any
+        # OpenAI-compatible endpoint, e.g. tools.fake_openai in tests.
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url or os.getenv("OPENAI_BASE_URL"))
 
-    async def __call__(self, prompt: str) -> str:
+    async def __call__(self, prompt: str, size: str = "1024x1024") -> str:
         """Return an image URL for the given prompt."""
-        resp = await self.client.images.generate(prompt=prompt, n=1, size="1024x1024")
+        resp = await self.client.images.generate(prompt=prompt, n=1, size=size)
         # Response schema: {"data": [{"url": ...}]}
         return resp.data[0].url
+
+    async def run(self, params: dict) -> str:
+        """Tool interface: generate an image for ``params['prompt']``."""
+        return await self(params["prompt"], params.get("size", "1024x1024"))
+
+    async def aclose(self) -> None:
+        await self.client.close()
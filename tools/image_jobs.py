@@ -0,0 +1,248 @@
+"""
+Background job runner for image generation.
+
+Flask views run on worker threads, so calling ``asyncio.run`` per
+request built and tore down an event loop every time and pinned the
+thread for the whole OpenAI round trip.  ``ImageJobManager`` instead
+owns one long-lived event loop on a daemon thread.  Submitting a prompt
+returns a job immediately; the generation runs on the loop under a
+concurrency cap and callers poll :meth:`ImageJobManager.get`, block
+in :meth:`ImageJobManager.wait` or, from another event loop such as the
+ASGI server's, await :meth:`ImageJobManager.wait_async`.
+
+Finished URLs are cached by normalised prompt and size in an LRU+TTL
+cache, so repeating a prompt completes instantly without an API call.
+A prompt submitted again while its first job is still pending or
+running gets that job back instead of a second generation.  Only the
+newest ``max_jobs`` jobs are kept; older IDs become unknown.
+
+Under a multi-process server each worker has its own manager.  With a
+store attached (see :meth:`ImageJobManager.attach_store`) every job's
+state is also written to it, so a poll that lands on another worker
+still finds the job and waits for it by re-reading the store.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from core.cache import TTLCache
+
+
+def _cache_key(prompt: str, size: str) -> str:
+    return f"{size}:{' '.join(prompt.lower().split())}"
+
+
+class ImageJobManager:
+    """Submit image prompts as jobs executed on a persistent event loop."""
+
+    def __init__(
+        self,
+        tool_factory: Callable[[], Any],
+        max_concurrency: int = 4,
+        cache_size: int = 256,
+        cache_ttl: float = 3600.0,
+        max_jobs: int = 1000,
+    ) -> None:
+        self._tool_factory = tool_factory
+        self._tool: Any = None
+        self.max_concurrency = max_concurrency
+        self.max_jobs = max_jobs
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._events: Dict[str, threading.Event] = {}
+        self._futures: Dict[str, Future] = {}
+        # Cache key -> ID of the unfinished job generating it.
+        self._inflight: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._thread: Optional[threading.Thread] = None
+        # Optional core.shared_state.SharedState mirroring job states.
+        self._store: Any = None
+
+    #: Seconds between store reads while waiting for another worker's job.
+    poll_interval = 0.25
+
+    def attach_store(self, store: Any) -> None:
+        """Mirror job states into ``store`` (a
+        :class:`core.shared_state.SharedState`) for other processes."""
+        self._store = store
+
+    def _publish(self, job: Dict[str, Any]) -> None:
+        if self._store is not None:
+            self._store.set(job['id'], job)
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run() -> None:
+                    asyncio.set_event_loop(loop)
+                    self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                    ready.set()
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name='image-jobs', daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, prompt: str, size: str = '1024x1024') -> Dict[str, Any]:
+        """Create a job for ``prompt`` and return a snapshot of it, or
+        of the unfinished job already generating the same image."""
+        key = _cache_key(prompt, size)
+        url = self.cache.get(key)
+        job_id = uuid.uuid4().hex
+        job: Dict[str, Any] = {
+            'id': job_id,
+            'prompt': prompt,
+            'size': size,
+            'status': 'pending',
+            'url': None,
+            'error': None,
+            'cached': False,
+            'created': time.time(),
+            'finished': None,
+        }
+        event = threading.Event()
+        with self._lock:
+            if url is None:
+                running = self._jobs.get(self._inflight.get(key, ''))
+                if running is not None:
+                    return dict(running)
+                self._inflight[key] = job_id
+            self._jobs[job_id] = job
+            self._events[job_id] = event
+            evicted = []
+            while len(self._jobs) > self.max_jobs:
+                old_id, _ = self._jobs.popitem(last=False)
+                self._events.pop(old_id, None)
+                self._futures.pop(old_id, None)
+                evicted.append(old_id)
+            snapshot = dict(job)
+        if self._store is not None and evicted:
+            self._store.delete(*evicted)
+        self._publish(snapshot)
+        if url is not None:
+            self._finish(job_id, url=url, cached=True)
+        else:
+            future = asyncio.run_coroutine_threadsafe(self._run(job_id, key), self._ensure_loop())
+            with self._lock:
+                if job_id in self._jobs:
+                    self._futures[job_id] = future
+        return self.get(job_id)
+
+    async def _run(self, job_id: str, key: str) -> None:
+        url = error = None
+        async with self._semaphore:
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job['status'] = 'running'
+            if job is not None:  # else evicted while queued; nobody can poll it
+                try:
+                    if self._tool is None:
+                        self._tool = self._tool_factory()
+                    url = await self._tool.run({'prompt': job['prompt'], 'size': job['size']})
+                except Exception as e:
+                    error = str(e)
+        if url is not None:
+            self.cache.set(key, url)
+        # Later submits of the prompt now hit the cache or start afresh.
+        with self._lock:
+            if self._inflight.get(key) == job_id:
+                del self._inflight[key]
+        if job is not None:
+            self._finish(job_id, url=url, error=error)
+
+    def _finish(self, job_id: str, url: Optional[str] = None, error: Optional[str] = None, cached: bool = False) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update({
+                'status': 'failed' if error else 'done',
+                'url': url,
+                'error': error,
+                'cached': cached,
+                'finished': time.time(),
+            })
+            event = self._events.get(job_id)
+            self._futures.pop(job_id, None)
+            snapshot = dict(job)
+        self._publish(snapshot)
+        if event is not None:
+            event.set()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the job or None if it is unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        return self._store.get(job_id) if self._store is not None else None
+
+    def _remote_pending(self, job_id: str) -> bool:
+        """True for an unfinished job of another worker process."""
+        if self._store is None or job_id in self._events:
+            return False
+        job = self._store.get(job_id)
+        return job is not None and job['status'] in ('pending', 'running')
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until the job finishes or ``timeout`` elapses, then
+        return its current state."""
+        event = self._events.get(job_id)
+        if event is not None:
+            event.wait(timeout)
+        else:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while self._remote_pending(job_id) and (deadline is None or time.monotonic() < deadline):
+                time.sleep(self.poll_interval if deadline is None
+                           else min(self.poll_interval, max(0.0, deadline - time.monotonic())))
+        return self.get(job_id)
+
+    async def wait_async(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Like :meth:`wait` but awaitable from any event loop without
+        tying up a thread.  A timeout leaves the job running."""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            await asyncio.wait({asyncio.wrap_future(future)}, timeout=timeout)
+        elif self._store is not None:
+            loop = asyncio.get_running_loop()
+            deadline = None if timeout is None else loop.time() + timeout
+            # Store reads are small SQLite lookups, done inline.
+            while self._remote_pending(job_id) and (deadline is None or loop.time() < deadline):
+                await asyncio.sleep(self.poll_interval if deadline is None
+                                    else min(self.poll_interval, max(0.0, deadline - loop.time())))
+        return self.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+        return {'jobs': counts, 'cache': self.cache.stats(), 'max_concurrency': self.max_concurrency}
+
+    def shutdown(self) -> None:
+        """Stop the event loop thread, closing the tool if it supports it."""
+        loop = self._loop
+        if loop is None:
+            return
+        if self._tool is not None and hasattr(self._tool, 'aclose'):
+            asyncio.run_coroutine_threadsafe(self._tool.aclose(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._loop = None
@@ -0,0 +1,109 @@
+"""
+Registry of tools created on first use.
+
+Building every tool in ``register_api_endpoints`` meant importing
+``openai`` (most of the server's import time) and Playwright's glue on
+every start, and a tool whose constructor needs a missing credential
+could stop the whole app from booting.  ``ToolRegistry`` maps a tool
+name to a ``"module:Class"`` spec or a factory and only imports and
+constructs the tool when it is first looked up.  A failed construction
+is not cached: the error is raised to that caller and recorded, and the
+next lookup tries again (e.g. once ``OPENAI_API_KEY`` is set).
+
+:meth:`ToolRegistry.stats` reports per tool whether it is loaded and
+how long its import and construction took.
+
+Usage example:
+
+    >>> tools = ToolRegistry()
+    >>> tools.register('web', 'tools.web_browser:WebBrowserTool', pool_size=2)
+    >>> 'web' in tools                # nothing imported yet
+    True
+    >>> tools['web'].run({'url': 'https://example.com'})
+"""
+
+from __future__ import annotations
+
+import importlib
+import threading
+import time
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+
+class _Entry:
+    def __init__(self, target: Union[str, Callable[..., Any]], kwargs: Dict[str, Any]) -> None:
+        self.target = target
+        self.kwargs = kwargs
+        self.tool: Any = None
+        self.init_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self.lock = threading.Lock()
+
+
+class ToolRegistry(Mapping):
+    """Mapping of tool name to tool instance, built on first lookup."""
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, _Entry] = {}
+
+    def register(self, name: str, target: Union[str, Callable[..., Any]], **kwargs: Any) -> None:
+        """Register ``target`` (``"module:attr"`` or a callable) to be
+        called with ``kwargs`` when ``name`` is first used."""
+        self._entries[name] = _Entry(target, kwargs)
+
+    def _build(self, entry: _Entry) -> Any:
+        factory = entry.target
+        if isinstance(factory, str):
+            module_name, _, attr = factory.partition(':')
+            factory = getattr(importlib.import_module(module_name), attr)
+        return factory(**entry.kwargs)
+
+    def __getitem__(self, name: str) -> Any:
+        entry = self._entries[name]
+        if entry.tool is not None:
+            return entry.tool
+        with entry.lock:
+            if entry.tool is None:
+                start = time.perf_counter()
+                try:
+                    tool = self._build(entry)
+                except Exception as e:
+                    entry.error = f'{type(e).__name__}: {e}'
+                    raise
+                entry.init_ms = (time.perf_counter() - start) * 1000
+                entry.error = None
+                entry.tool = tool
+        return entry.tool
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def factory(self, name: str) -> Callable[[], Any]:
+        """Zero-argument callable returning the tool, for consumers that
+        take a factory (e.g. :class:`tools.image_jobs.ImageJobManager`)."""
+        return lambda: self[name]
+
+    def loaded(self) -> Dict[str, Any]:
+        """Tools constructed so far."""
+        return {name: e.tool for name, e in self._entries.items() if e.tool is not None}
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [{
+            'name': name,
+            'loaded': e.tool is not None,
+            'init_ms': None if e.init_ms is None else round(e.init_ms, 2),
+            'error': e.error,
+        } for name, e in self._entries.items()]
+
+    def close(self) -> None:
+        """Close the constructed tools that support it."""
+        for tool in self.loaded().values():
+            if hasattr(tool, 'close'):
+                tool.close()
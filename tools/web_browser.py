@@ -1,12 +1,164 @@
+import asyncio
+import atexit
+import queue
+import threading
+import time
 import urllib.parse
-from playwright.sync_api import sync_playwright
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+from core.cache import TTLCache
+
+
+def _sync_playwright() -> Any:
+    from playwright.sync_api import sync_playwright
+
+    return sync_playwright
+
+
+class BrowserPool:
+    """Pool of long-lived headless Chromium workers.
+
+    Playwright's sync API is bound to the thread that started it, so
+    each worker thread owns one browser process with a reusable context
+    and page and serves fetch jobs from a shared queue.  The number of
+    workers caps concurrency.  A crashed page is replaced, a crashed
+    browser is relaunched, and contexts are recycled every
+    ``max_uses`` fetches to keep memory in check.  If Playwright itself
+    fails, the worker fails the jobs that arrive meanwhile and starts
+    it again after a delay that doubles up to ``max_restart_delay``.
+    """
+
+    restart_delay = 0.5
+    max_restart_delay = 30.0
+
+    def __init__(self, size: int = 2, timeout: float = 15.0, max_uses: int = 100) -> None:
+        self.size = size
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self.restarts = 0
+        self._jobs: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._workers: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.size):
+                worker = threading.Thread(target=self._worker, name=f'browser-{i}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _submit(self, url: str, timeout: Optional[float]) -> tuple:
+        self._start()
+        timeout = self.timeout if timeout is None else timeout
+        future: Future = Future()
+        self._jobs.put((url, timeout, future))
+        # Allow for time spent queued behind other fetches.
+        return future, timeout * (1 + self._jobs.qsize() / self.size) + 30
+
+    def fetch(self, url: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Load ``url`` on a pooled page and return its title and text."""
+        future, wait = self._submit(url, timeout)
+        return future.result(timeout=wait)
+
+    async def fetch_async(self, url: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Awaitable :meth:`fetch`; the caller's event loop stays free
+        while a worker thread drives the browser."""
+        future, wait = self._submit(url, timeout)
+        return await asyncio.wait_for(asyncio.wrap_future(future), wait)
+
+    def _worker(self) -> None:
+        delay = self.restart_delay
+        while True:
+            started = time.monotonic()
+            try:
+                self._serve(_sync_playwright())
+                return
+            except Exception as e:
+                error = e
+            if time.monotonic() - started > self.max_restart_delay:
+                delay = self.restart_delay
+            # Fail jobs arriving before the restart instead of leaving
+            # callers waiting.
+            resume = time.monotonic() + delay
+            while True:
+                try:
+                    job = self._jobs.get(timeout=max(0.0, resume - time.monotonic()))
+                except queue.Empty:
+                    break
+                if job is None:
+                    return
+                if job[2].set_running_or_notify_cancel():
+                    job[2].set_exception(error)
+            delay = min(delay * 2, self.max_restart_delay)
+
+    def _serve(self, sync_playwright: Any) -> None:
+        with sync_playwright() as p:
+            browser = context = page = None
+            uses = 0
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                url, timeout, future = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if browser is None or not browser.is_connected():
+                        if browser is not None:
+                            self.restarts += 1
+                        browser = p.chromium.launch(headless=True)
+                        context = page = None
+                    if context is None or uses >= self.max_uses:
+                        if context is not None:
+                            context.close()
+                        context = browser.new_context()
+                        page, uses = None, 0
+                    if page is None or page.is_closed():
+                        page = context.new_page()
+                    uses += 1
+                    page.goto(url, wait_until='domcontentloaded', timeout=timeout * 1000)
+                    future.set_result({'url': url, 'title': page.title(), 'body': page.inner_text('body')})
+                except Exception as e:
+                    future.set_exception(e)
+                    # Start from a clean page on the next job; a dead
+                    # browser is detected and relaunched above.
+                    try:
+                        if page is not None:
+                            page.close()
+                    except Exception:
+                        pass
+                    page = None
+            if browser is not None and browser.is_connected():
+                browser.close()
+
+    def close(self) -> None:
+        """Stop all workers and their browsers."""
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for _ in workers:
+            self._jobs.put(None)
+        for worker in workers:
+            worker.join(timeout=10)
 
 
 class WebBrowserTool:
-    """Simple headless browser using Playwright."""
+    """Simple headless browser using Playwright.
 
-    def run(self, params: dict) -> dict:
-        """Visit a URL or search query and return the title and body text."""
+    Pages are fetched through a shared :class:`BrowserPool` instead of
+    launching Chromium per call, and results are cached per URL for
+    ``cache_ttl`` seconds.
+    """
+
+    def __init__(self, pool_size: int = 2, timeout: float = 15.0, cache_ttl: float = 300.0) -> None:
+        self.pool = BrowserPool(size=pool_size, timeout=timeout)
+        self.cache = TTLCache(maxsize=512, ttl=cache_ttl)
+
+    @staticmethod
+    def _resolve_url(params: dict) -> str:
         query = params.get("query", "")
         url = params.get("url")
         if not url:
@@ -14,13 +166,40 @@ class WebBrowserTool:
                 url = query
             else:
                 url = "https://www.google.com/search?q=" + urllib.parse.quote(query)
+        return url
 
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            page.goto(url, wait_until="domcontentloaded")
-            title = page.title()
-            body = page.inner_text("body")
-            browser.close()
-
-        return {"url": url, "title": title, "body": body}
+    def _cached(self, url: str, params: dict) -> Optional[dict]:
+        if params.get("fresh"):
+            return None
+        cached = self.cache.get(url)
+        return dict(cached, cached=True) if cached is not None else None
+
+    def _store(self, url: str, result: dict, start: float) -> dict:
+        result["elapsed"] = round(time.perf_counter() - start, 3)
+        self.cache.set(url, result)
+        return dict(result, cached=False)
+
+    def run(self, params: dict) -> dict:
+        """Visit a URL or search query and return the title and body text.
+
+        Pass ``fresh=True`` to bypass the cache and ``timeout`` (seconds)
+        to override the page load timeout.
+        """
+        url = self._resolve_url(params)
+        cached = self._cached(url, params)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        return self._store(url, self.pool.fetch(url, params.get("timeout")), start)
+
+    async def arun(self, params: dict) -> dict:
+        """Coroutine version of :meth:`run` for async servers."""
+        url = self._resolve_url(params)
+        cached = self._cached(url, params)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        return self._store(url, await self.pool.fetch_async(url, params.get("timeout")), start)
+
+    def close(self) -> None:
+        self.pool.close()